@@ -1,6 +1,7 @@
 from __future__ import absolute_import
 import os
 from celery import Celery
+from celery.signals import worker_init, worker_process_init
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
@@ -14,4 +15,17 @@ app.conf.update(
     worker_log_format='[%(asctime)s: %(levelname)s/%(processName)s] %(message)s',
     worker_task_log_format='[%(asctime)s: %(levelname)s/%(processName)s][%(task_name)s(%(task_id)s)] %(message)s',
     worker_log_level='INFO'
-)
\ No newline at end of file
+)
+
+
+# the main process loads the embedding model before forking the pool, each child then warms it up
+@worker_init.connect
+def preload_embedding_model(**kwargs):
+    from services.embedding import warm_up_model
+    warm_up_model(encode=False)
+
+
+@worker_process_init.connect
+def warm_up_embedding_model(**kwargs):
+    from services.embedding import warm_up_model
+    warm_up_model()
@@ -15,6 +15,7 @@ from datetime import timedelta
 import os
 from dotenv import load_dotenv
 import sys
+import tempfile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -216,6 +217,107 @@ CELERY_TIMEZONE = 'UTC'
 CELERY_TASK_ALWAYS_EAGER = True
 # CELERY_TASK_EAGER_PROPAGATES = True
 
+# PDF ingestion
+# materials of a quiz are downloaded concurrently, each download is limited to PDF_FETCH_TIMEOUT seconds
+PDF_FETCH_MAX_WORKERS = int(os.getenv("PDF_FETCH_MAX_WORKERS", 8))
+PDF_FETCH_TIMEOUT = int(os.getenv("PDF_FETCH_TIMEOUT", 30))
+# downloaded materials are kept on local disk, least recently used files are evicted past the limit (0 disables)
+MATERIAL_FILE_CACHE_DIR = os.getenv("MATERIAL_FILE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "pamahres-materials"))
+MATERIAL_FILE_CACHE_MAX_BYTES = int(os.getenv("MATERIAL_FILE_CACHE_MAX_BYTES", 1024 * 1024 * 1024))
+# number of processes used to extract pages of large pdfs in parallel, 1 disables the pool
+PDF_EXTRACTION_WORKERS = int(os.getenv("PDF_EXTRACTION_WORKERS", min(4, os.cpu_count() or 1)))
+# documents with fewer pages than this are extracted serially, the pool overhead is not worth it
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 24))
+# pages are handed to the pool in batches, extraction stops once the chunk budget is filled
+PDF_EXTRACTION_BATCH_PAGES = int(os.getenv("PDF_EXTRACTION_BATCH_PAGES", 8))
+# most pages read from a single pdf, whatever the page selection of the quiz
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", 100))
+# pages sampled across the document for a "spread" page selection
+PDF_SPREAD_PAGES = int(os.getenv("PDF_SPREAD_PAGES", 16))
+# extracted text and chunks are cached by the sha256 of the pdf, entries expire after a week.
+# redis should run with a volatile-lru maxmemory policy so these entries get evicted before the celery queues
+EXTRACTION_CACHE_TIMEOUT = int(os.getenv("EXTRACTION_CACHE_TIMEOUT", 60 * 60 * 24 * 7))
+# LLM prompts
+# model used to generate quiz questions
+LLM_QUIZ_MODEL = "meta-llama/llama-4-scout-17b-16e-instruct"
+# tiktoken encoding used to count prompt tokens
+LLM_TOKENIZER_ENCODING = os.getenv("LLM_TOKENIZER_ENCODING", "o200k_base")
+# tokens of material per generation prompt, per model. each prompt adds ~350 tokens of instructions
+# and the completion takes ~80 tokens per question, so these stay far below the context windows
+# while keeping each request under the per-minute token limits
+LLM_CHUNK_TOKEN_BUDGETS = {
+    "meta-llama/llama-4-scout-17b-16e-instruct": 1000,
+}
+LLM_DEFAULT_CHUNK_TOKENS = 750
+# tokens repeated from the end of a chunk at the start of the next one
+LLM_CHUNK_OVERLAP_TOKENS = int(os.getenv("LLM_CHUNK_OVERLAP_TOKENS", 0))
+# material is split into at most this many chunks, one generation request each
+LLM_MAX_CHUNKS = 4
+# stream generation responses and save each question as soon as it is complete
+LLM_STREAM_QUESTIONS = os.getenv("LLM_STREAM_QUESTIONS", "true") == "true"
+# groq's per minute limits, shared by every worker through redis. requests wait for capacity for
+# up to LLM_RATE_LIMIT_MAX_WAIT seconds, polling at most every LLM_RATE_LIMIT_POLL_SECONDS
+LLM_DEFAULT_RATE_LIMITS = {
+    "requests_per_minute": int(os.getenv("LLM_REQUESTS_PER_MINUTE", 30)),
+    "tokens_per_minute": int(os.getenv("LLM_TOKENS_PER_MINUTE", 6000)),
+    "max_concurrency": int(os.getenv("LLM_MAX_CONCURRENCY", 4)),
+}
+# per model overrides of the defaults above
+LLM_RATE_LIMITS = {
+    "meta-llama/llama-4-scout-17b-16e-instruct": {"tokens_per_minute": 30000},
+}
+# completion tokens reserved per requested question
+LLM_COMPLETION_TOKENS_PER_QUESTION = 80
+LLM_RATE_LIMIT_MAX_WAIT = int(os.getenv("LLM_RATE_LIMIT_MAX_WAIT", 120))
+LLM_RATE_LIMIT_POLL_SECONDS = float(os.getenv("LLM_RATE_LIMIT_POLL_SECONDS", 2))
+# connection pool of each groq client, per process. idle connections are reused for the keepalive
+# expiry so back to back requests skip the tls handshake. http2 needs the http2 extra
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", 20))
+LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS", 10))
+LLM_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", 60))
+LLM_HTTP_CONNECT_TIMEOUT = float(os.getenv("LLM_HTTP_CONNECT_TIMEOUT", 5))
+# seconds between bytes read, streamed chat responses only need the next token within it
+LLM_HTTP_READ_TIMEOUT = float(os.getenv("LLM_HTTP_READ_TIMEOUT", 60))
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "false") == "true"
+
+# Embedding model
+# loaded before gunicorn and celery fork their workers, so the first chat message does not load it
+EMBEDDING_PRELOAD = os.getenv("EMBEDDING_PRELOAD", "true") == "true"
+# "torch" or "onnx", the int8 quantized export of the same model (install the onnx extra).
+# the avx2 file runs on any x86 box, model_qint8_avx512_vnni.onnx is faster where supported
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model_quint8_avx2.onnx")
+
+# Vector store
+# "pinecone" (shared serverless index) or "faiss" (one index file per course, searched in process).
+# with faiss every web and celery container must mount the same FAISS_INDEX_DIR
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "pinecone")
+FAISS_INDEX_DIR = os.getenv("FAISS_INDEX_DIR", str(BASE_DIR / "faiss_indexes"))
+# pinecone upserts are split into batches of at most this many vectors and bytes (the api caps
+# requests at 1000 vectors and 2MB), sent VECTOR_UPSERT_CONCURRENCY at a time, each retried on failure
+VECTOR_UPSERT_BATCH_SIZE = int(os.getenv("VECTOR_UPSERT_BATCH_SIZE", 100))
+VECTOR_UPSERT_MAX_BYTES = int(os.getenv("VECTOR_UPSERT_MAX_BYTES", 1_500_000))
+VECTOR_UPSERT_CONCURRENCY = int(os.getenv("VECTOR_UPSERT_CONCURRENCY", 4))
+VECTOR_UPSERT_RETRIES = int(os.getenv("VECTOR_UPSERT_RETRIES", 3))
+# chunk embeddings are cached by model and sha256 of the text, entries expire after 30 days
+EMBEDDING_CACHE_TIMEOUT = int(os.getenv("EMBEDDING_CACHE_TIMEOUT", 60 * 60 * 24 * 30))
+# chat question embeddings are kept per process, least recently used ones are dropped past the size
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 1024))
+QUERY_EMBEDDING_CACHE_TTL = int(os.getenv("QUERY_EMBEDDING_CACHE_TTL", 60 * 60))
+# chunks retrieved for a question are cached until the course's vectors change (0 disables)
+QUERY_RESULT_CACHE_TIMEOUT = int(os.getenv("QUERY_RESULT_CACHE_TIMEOUT", 60 * 10))
+# "hybrid" fuses the vector results with bm25 over the course's chunk texts by reciprocal rank,
+# "dense" only asks the vector store. each retriever contributes this many candidates to the fusion
+CHAT_RETRIEVAL_MODE = os.getenv("CHAT_RETRIEVAL_MODE", "hybrid")
+HYBRID_RETRIEVAL_CANDIDATES = int(os.getenv("HYBRID_RETRIEVAL_CANDIDATES", 10))
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", 60))
+# bm25 indexes kept per process, one per recently chatted course
+LEXICAL_INDEX_CACHE_SIZE = int(os.getenv("LEXICAL_INDEX_CACHE_SIZE", 256))
+# parsed quiz generations are cached by model, prompt version, material hash and item count for a
+# week (0 disables), responses larger than the byte cap are not stored
+LLM_RESPONSE_CACHE_TIMEOUT = int(os.getenv("LLM_RESPONSE_CACHE_TIMEOUT", 60 * 60 * 24 * 7))
+LLM_RESPONSE_CACHE_MAX_BYTES = int(os.getenv("LLM_RESPONSE_CACHE_MAX_BYTES", 64_000))
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
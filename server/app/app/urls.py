@@ -19,9 +19,12 @@ from django.urls import include, path
 
 import os
 
+from .views import MetricsView
+
 urlpatterns = [
     path(os.getenv("DJANGO_ADMIN_URL", 'admin/'), admin.site.urls),
     path('api/user/', include('user.urls')),
     path('api/courses/', include('courses.urls')),
     path('api/quiz/', include('quiz.quick_create_urls')),
+    path('api/metrics/', MetricsView.as_view(), name='metrics'),
 ]
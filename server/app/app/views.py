@@ -0,0 +1,13 @@
+from django.http import HttpResponse
+from rest_framework.permissions import IsAdminUser
+from rest_framework.views import APIView
+
+from utils.metrics import get_metrics, render_prometheus
+
+
+# scrape target for prometheus, staff users only (basic auth works for scrapers)
+class MetricsView(APIView):
+  permission_classes = [IsAdminUser]
+
+  def get(self, request, *args, **kwargs):
+    return HttpResponse(render_prometheus(get_metrics()), content_type="text/plain; version=0.0.4")
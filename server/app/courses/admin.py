@@ -1,8 +1,10 @@
 from django.contrib import admin
-from .models import Course, CourseMaterial, ChatHistory, Message
+from .models import Course, CourseMaterial, ChatHistory, Message, ProcessedMaterial, CourseChunk
 
 # Register your models here.
 admin.site.register(Course)
 admin.site.register(CourseMaterial)
 admin.site.register(Message)
-admin.site.register(ChatHistory)
\ No newline at end of file
+admin.site.register(ChatHistory)
+admin.site.register(ProcessedMaterial)
+admin.site.register(CourseChunk)
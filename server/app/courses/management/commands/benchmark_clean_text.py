@@ -0,0 +1,78 @@
+import json
+import re
+import time
+import unicodedata
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.pdf_processor import clean_text, extract_pages
+
+
+def legacy_clean_text(text: str) -> str:
+  """
+  The regex pipeline clean_text replaced, kept as the reference for output and speed.
+  """
+  if not text:
+      return ""
+  text = unicodedata.normalize("NFKC", text)
+  text = re.sub(r"[^\x20-\x7E\n]", "", text)
+  text = re.sub(r"\n\s*\n+", "\n\n", text)
+  text = re.sub(r"[ \t]+", " ", text)
+  text = "\n".join(line.strip() for line in text.splitlines())
+  return text.strip()
+
+
+def _best_time(function, text: str, repeat: int) -> float:
+  best = float("inf")
+  for _ in range(repeat):
+    start = time.perf_counter()
+    function(text)
+    best = min(best, time.perf_counter() - start)
+  return best
+
+
+class Command(BaseCommand):
+  help = "Compares clean_text against the previous regex pipeline on real pdfs, reporting MB/s and output parity."
+
+  def add_arguments(self, parser):
+    parser.add_argument("paths", nargs="*", help="PDF files or directories of PDFs. Defaults to test_content.pdf.")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per document, the fastest one is reported.")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+
+  def handle(self, *args, **options):
+    paths = [Path(path) for path in options["paths"]] or [Path(settings.BASE_DIR).parent / "test_content.pdf"]
+    pdf_paths = []
+    for path in paths:
+      if path.is_dir():
+        pdf_paths.extend(sorted(path.glob("*.pdf")))
+      elif path.exists():
+        pdf_paths.append(path)
+      else:
+        raise CommandError(f"No such file or directory: {path}")
+
+    results = []
+    for pdf_path in pdf_paths:
+      # the raw page text, exactly what the cleaner receives during extraction
+      text = "\n\n".join(extract_pages(pdf_path.read_bytes(), workers=1))
+      size_mb = len(text.encode()) / 1_000_000
+      legacy_seconds = _best_time(legacy_clean_text, text, options["repeat"])
+      seconds = _best_time(clean_text, text, options["repeat"])
+      results.append({
+        "file": pdf_path.name,
+        "size_mb": round(size_mb, 4),
+        "legacy_mb_per_s": round(size_mb / legacy_seconds, 2) if legacy_seconds else None,
+        "mb_per_s": round(size_mb / seconds, 2) if seconds else None,
+        "speedup": round(legacy_seconds / seconds, 2) if seconds else None,
+        "identical_output": clean_text(text) == legacy_clean_text(text),
+      })
+
+    if options["json"]:
+      self.stdout.write(json.dumps(results, indent=2))
+      return
+    for result in results:
+      self.stdout.write(
+        f"{result['file']}: {result['size_mb']} MB, legacy {result['legacy_mb_per_s']} MB/s, "
+        f"clean_text {result['mb_per_s']} MB/s ({result['speedup']}x), identical output: {result['identical_output']}"
+      )
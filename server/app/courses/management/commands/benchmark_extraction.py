@@ -0,0 +1,220 @@
+import json
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+import pymupdf
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from utils import pdf_processor
+from utils.pdf_processor import (
+  MIN_BLOCK_CHARS, chunk_paragraphs, extract_budgeted_paragraphs, extract_pages, fetch_pdf, iter_paragraphs,
+)
+from utils.tokens import get_chunk_options
+
+STAGES = ["fetch", "extract", "clean", "chunk", "budgeted"]
+
+
+class LocalStorage:
+  """
+  Stand-in for the supabase client, serving storage.from_(bucket).download(path) from a local directory.
+  """
+  def __init__(self, root: Path):
+    self.root = root
+    self.storage = self
+
+  def from_(self, bucket: str):
+    return self
+
+  def download(self, path: str) -> bytes:
+    return (self.root / path).read_bytes()
+
+
+def make_textbook(page_count: int) -> bytes:
+  """
+  A synthetic textbook: headings, body paragraphs and page numbers (dropped by the block filter) on every page.
+  """
+  doc = pymupdf.open()
+  for i in range(page_count):
+    page = doc.new_page()
+    page.insert_text((72, 60), f"Chapter {i // 20 + 1}: Section {i % 20 + 1} of the sample textbook")
+    for j in range(6):
+      sentences = " ".join(f"Sentence {k} of paragraph {j} on page {i} explains a concept." for k in range(3))
+      page.insert_textbox(pymupdf.Rect(72, 90 + j * 110, 540, 190 + j * 110), sentences, fontsize=10)
+    page.insert_text((300, 800), str(i + 1))
+  data = doc.tobytes()
+  doc.close()
+  return data
+
+
+def _measure(function, repeat: int) -> tuple:
+  """
+  Returns the result of function, its fastest run in seconds and the peak python heap of one
+  traced run in MB. Allocations made inside pymupdf are not traced, see peak_rss_mb for those.
+  """
+  tracemalloc.start()
+  try:
+    result = function()
+    peak = tracemalloc.get_traced_memory()[1]
+  finally:
+    tracemalloc.stop()
+
+  best = float("inf")
+  for _ in range(repeat):
+    start = time.perf_counter()
+    function()
+    best = min(best, time.perf_counter() - start)
+  return result, {"seconds": round(best, 6), "peak_mb": round(peak / 1_000_000, 3)}
+
+
+def _block_stats(pdf_data: bytes) -> dict:
+  # what the block filter keeps and drops, independent of the timed extraction
+  total = kept = kept_chars = 0
+  with pymupdf.open(stream=pdf_data, filetype="pdf") as doc:
+    page_count = doc.page_count
+    for page in doc:
+      for block in page.get_text("blocks"):
+        total += 1
+        if len(block[4].strip()) > MIN_BLOCK_CHARS:
+          kept += 1
+          kept_chars += len(block[4])
+  return {"pages": page_count, "blocks": total, "blocks_kept": kept, "kept_block_chars": kept_chars}
+
+
+def _git_commit() -> str | None:
+  try:
+    return subprocess.run(
+      ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, cwd=settings.BASE_DIR,
+    ).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+class Command(BaseCommand):
+  help = (
+    "Benchmarks the ingestion path (fetch from a local storage stand-in, block extraction, cleaning, chunking) "
+    "over sample pdfs, reporting per-stage timing, peak memory and chunk counts as JSON."
+  )
+
+  def add_arguments(self, parser):
+    parser.add_argument("paths", nargs="*", help="PDF files or directories of PDFs. Defaults to test_content.pdf.")
+    parser.add_argument("--synthetic-pages", type=int, nargs="*", default=[], help="Also benchmark generated textbooks with these page counts.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per stage, the fastest one is reported.")
+    parser.add_argument("--workers", type=int, default=None, help="Extraction workers. Defaults to PDF_EXTRACTION_WORKERS.")
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="A previous --output file to compare the timings and chunk counts against.")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+
+  def handle(self, *args, **options):
+    paths = [Path(path) for path in options["paths"]]
+    if not paths and not options["synthetic_pages"]:
+      paths = [Path(settings.BASE_DIR).parent / "test_content.pdf"]
+    pdf_paths = []
+    for path in paths:
+      if path.is_dir():
+        pdf_paths.extend(sorted(path.glob("*.pdf")))
+      elif path.exists():
+        pdf_paths.append(path)
+      else:
+        raise CommandError(f"No such file or directory: {path}")
+
+    baseline = None
+    if options["compare"]:
+      baseline = {result["file"]: result for result in json.loads(Path(options["compare"]).read_text())["results"]}
+
+    chunk_options = get_chunk_options(settings.LLM_QUIZ_MODEL)
+    workers = settings.PDF_EXTRACTION_WORKERS if options["workers"] is None else options["workers"]
+    with tempfile.TemporaryDirectory() as storage_dir:
+      storage_root = Path(storage_dir)
+      for pdf_path in pdf_paths:
+        (storage_root / pdf_path.name).write_bytes(pdf_path.read_bytes())
+      for page_count in options["synthetic_pages"]:
+        (storage_root / f"synthetic-{page_count}.pdf").write_bytes(make_textbook(page_count))
+
+      # every fetch goes to the stand-in, the disk cache would turn them into mmap hits
+      with mock.patch.object(pdf_processor, "supabase", LocalStorage(storage_root)), \
+          override_settings(MATERIAL_FILE_CACHE_MAX_BYTES=0):
+        names = [pdf_path.name for pdf_path in pdf_paths] + [f"synthetic-{n}.pdf" for n in options["synthetic_pages"]]
+        results = [self.benchmark(storage_root / name, chunk_options, workers, options["repeat"]) for name in names]
+
+    report = {
+      "commit": _git_commit(),
+      "created_at": datetime.now(timezone.utc).isoformat(),
+      "python": platform.python_version(),
+      "pymupdf": pymupdf.VersionBind,
+      "workers": workers,
+      "chunk_options": chunk_options,
+      "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1000, 1),
+      "results": results,
+    }
+    if options["output"]:
+      Path(options["output"]).write_text(json.dumps(report, indent=2))
+
+    if options["json"]:
+      self.stdout.write(json.dumps(report, indent=2))
+    else:
+      for result in results:
+        stages = ", ".join(
+          f"{stage} {result['stages'][stage]['seconds'] * 1000:.1f}ms/{result['stages'][stage]['peak_mb']}MB" for stage in STAGES
+        )
+        self.stdout.write(
+          f"{result['file']}: {result['pages']} pages, {result['blocks_kept']}/{result['blocks']} blocks kept, "
+          f"{result['paragraphs']} paragraphs, {result['chunks']} chunks | {stages}"
+        )
+    if baseline is not None:
+      self.compare(baseline, results)
+
+  def benchmark(self, path: Path, chunk_options: dict, workers: int, repeat: int) -> dict:
+    material = SimpleNamespace(material_file_url=path.name, file_size=path.stat().st_size)
+    stages = {}
+    [pdf_data], stages["fetch"] = _measure(lambda: fetch_pdf([material]), repeat)
+    pages, stages["extract"] = _measure(lambda: extract_pages(pdf_data, workers=workers), repeat)
+    paragraphs, stages["clean"] = _measure(lambda: list(iter_paragraphs(pages)), repeat)
+    chunks, stages["chunk"] = _measure(lambda: chunk_paragraphs(paragraphs, **chunk_options), repeat)
+    # the path quizzes take: extraction stops once the chunk budget is filled
+    budgeted, stages["budgeted"] = _measure(
+      lambda: chunk_paragraphs(extract_budgeted_paragraphs(pdf_data, **chunk_options), **chunk_options), repeat,
+    )
+
+    cleaned_chars = len("\n\n".join(paragraphs))
+    chunk_chars = [len(chunk) for chunk in chunks]
+    return {
+      "file": path.name,
+      "size_bytes": len(pdf_data),
+      **_block_stats(pdf_data),
+      "raw_chars": sum(len(page_text) for page_text in pages),
+      "cleaned_chars": cleaned_chars,
+      "paragraphs": len(paragraphs),
+      "chunks": len(chunks),
+      "chunk_chars": chunk_chars,
+      # share of the cleaned document that makes it into the prompt
+      "coverage": round(sum(chunk_chars) / cleaned_chars, 4) if cleaned_chars else 0,
+      "budgeted_matches_full": budgeted == chunks,
+      "stages": stages,
+    }
+
+  def compare(self, baseline: dict, results: list[dict]) -> None:
+    for result in results:
+      previous = baseline.get(result["file"])
+      if previous is None:
+        self.stdout.write(f"{result['file']}: not in the baseline")
+        continue
+      changes = []
+      for stage in STAGES:
+        before = previous["stages"].get(stage, {}).get("seconds")
+        after = result["stages"][stage]["seconds"]
+        if before:
+          changes.append(f"{stage} {(after - before) / before * 100:+.1f}%")
+      for field in ("blocks_kept", "paragraphs", "chunks", "cleaned_chars"):
+        if previous.get(field) != result[field]:
+          changes.append(f"{field} {previous.get(field)} -> {result[field]}")
+      self.stdout.write(f"{result['file']} vs baseline: {', '.join(changes)}")
@@ -0,0 +1,90 @@
+import json
+import re
+import time
+
+from django.core.management.base import BaseCommand
+
+from utils.utils import parse_llm_response
+
+
+def legacy_parse_llm_response(raw_text: str):
+  """
+  The regex parser parse_llm_response replaced, kept as the reference for speed and recovery.
+  """
+  match = re.search(r"\[\s*{.*?}\s*]", raw_text, re.DOTALL)
+  if match:
+    try:
+      return json.loads(match.group(0))
+    except json.JSONDecodeError as e:
+      raise ValueError(f"Failed to parse extracted JSON: {e}")
+  else:
+    raise ValueError("No JSON array found in response.")
+
+
+def make_response(count: int) -> str:
+  questions = []
+  for i in range(count):
+    if i % 2:
+      questions.append({"question": f"Question {i} about {{braces}} and [brackets]?", "type": "TF", "answer": "true"})
+    else:
+      options = [f"Option {letter} of question {i}" for letter in "ABCD"]
+      questions.append({"question": f"Question {i}, which option?", "type": "MCQ", "options": options, "answer": "a"})
+  return "Here are your questions:\n```json\n" + json.dumps(questions, indent=2) + "\n```"
+
+
+def _best_time(function, text: str, repeat: int) -> tuple[float, int | None]:
+  best, parsed = float("inf"), None
+  for _ in range(repeat):
+    start = time.perf_counter()
+    try:
+      parsed = len(function(text))
+    except ValueError:
+      parsed = None
+    best = min(best, time.perf_counter() - start)
+  return best, parsed
+
+
+class Command(BaseCommand):
+  help = (
+    "Compares parse_llm_response against the previous regex parser on generated quiz responses, "
+    "well formed, with trailing commas and cut off mid object, reporting MB/s and questions recovered."
+  )
+
+  def add_arguments(self, parser):
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 50, 500], help="Questions per response.")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per response, the fastest one is reported.")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+
+  def handle(self, *args, **options):
+    results = []
+    for size in options["sizes"]:
+      response = make_response(size)
+      cases = {
+        "well_formed": response,
+        "trailing_commas": response.replace('"\n  }', '",\n  }'),
+        "truncated": response[:int(len(response) * 0.9)],
+      }
+      for case, text in cases.items():
+        size_mb = len(text.encode()) / 1_000_000
+        legacy_seconds, legacy_parsed = _best_time(legacy_parse_llm_response, text, options["repeat"])
+        seconds, parsed = _best_time(parse_llm_response, text, options["repeat"])
+        results.append({
+          "case": case,
+          "questions": size,
+          "size_mb": round(size_mb, 4),
+          "legacy_mb_per_s": round(size_mb / legacy_seconds, 2) if legacy_seconds else None,
+          "mb_per_s": round(size_mb / seconds, 2) if seconds else None,
+          "speedup": round(legacy_seconds / seconds, 2) if seconds else None,
+          "legacy_recovered": legacy_parsed or 0,
+          "recovered": parsed or 0,
+        })
+
+    if options["json"]:
+      self.stdout.write(json.dumps(results, indent=2))
+      return
+    for result in results:
+      self.stdout.write(
+        f"{result['case']} ({result['questions']} questions, {result['size_mb']} MB): "
+        f"legacy {result['legacy_mb_per_s']} MB/s, {result['legacy_recovered']} recovered | "
+        f"parse_llm_response {result['mb_per_s']} MB/s ({result['speedup']}x), {result['recovered']} recovered"
+      )
@@ -0,0 +1,190 @@
+import json
+import platform
+import resource
+import statistics
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from courses.management.commands.benchmark_extraction import _git_commit
+from courses.management.commands.evaluate_retrieval import DEFAULT_DATASET
+from courses.services.retrieval import hybrid_rank
+from services import embedding
+from services.bm25 import BM25Index
+from services.vector_store import FaissVectorStore, PineconeVectorStore
+
+BACKENDS = ["faiss", "pinecone"]
+MODELS = ["torch", "onnx"]
+COURSE_ID = "benchmark"
+
+
+class LocalPineconeIndex:
+  """
+  Stand-in for a Pinecone index: upsert/query/delete by namespace with brute force cosine search,
+  so the PineconeVectorStore code path is measured without the network round trip.
+  """
+  def __init__(self):
+    self.namespaces: dict[str, dict[str, tuple[np.ndarray, dict]]] = {}
+
+  def upsert(self, vectors, namespace=""):
+    stored = self.namespaces.setdefault(namespace, {})
+    for vector_id, values, metadata in vectors:
+      values = np.asarray(values, dtype=np.float32)
+      stored[vector_id] = (values / (np.linalg.norm(values) or 1), metadata)
+
+  def query(self, vector, top_k, include_metadata=True, namespace=""):
+    stored = self.namespaces.get(namespace, {})
+    if not stored:
+      return {"matches": []}
+    ids = list(stored)
+    matrix = np.stack([stored[vector_id][0] for vector_id in ids])
+    query = np.asarray(vector, dtype=np.float32)
+    scores = matrix @ (query / (np.linalg.norm(query) or 1))
+    best = np.argsort(-scores)[:top_k]
+    return {"matches": [{"id": ids[i], "score": float(scores[i]), "metadata": stored[ids[i]][1]} for i in best]}
+
+  def delete(self, ids=None, delete_all=False, namespace=""):
+    if delete_all:
+      self.namespaces.pop(namespace, None)
+    else:
+      for vector_id in ids:
+        self.namespaces.get(namespace, {}).pop(vector_id, None)
+
+
+def _percentile(values: list[float], percent: int) -> float:
+  ordered = sorted(values)
+  return ordered[min(len(ordered) - 1, round(percent / 100 * (len(ordered) - 1)))]
+
+
+def _ms(seconds: float) -> float:
+  return round(seconds * 1000, 3)
+
+
+def _rss_mb() -> float:
+  return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1000, 1)
+
+
+class Command(BaseCommand):
+  help = (
+    "Benchmarks query_course's retrieval on a labeled question set for each vector store backend and embedding model, "
+    "reporting recall@k, p50/p95 encode and search time and memory use."
+  )
+
+  def add_arguments(self, parser):
+    parser.add_argument("dataset", nargs="?", default=str(DEFAULT_DATASET), help="JSON file of chunks and labeled questions.")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS, help="Vector stores to benchmark, pinecone uses a local stand-in index.")
+    parser.add_argument("--models", nargs="+", choices=MODELS, default=["torch"], help="Embedding backends to benchmark, onnx needs the onnx extra.")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 10], help="Cut-offs to report recall at.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per question, the fastest one is kept.")
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+
+  def handle(self, *args, **options):
+    path = Path(options["dataset"])
+    if not path.exists():
+      raise CommandError(f"No such file: {path}")
+    dataset = json.loads(path.read_text())
+    if not dataset["questions"]:
+      raise CommandError(f"{path} has no questions")
+
+    results = []
+    for model_backend in options["models"]:
+      with override_settings(EMBEDDING_BACKEND=model_backend):
+        embedding._model = None
+        rss_before = _rss_mb()
+        start = time.perf_counter()
+        try:
+          model = embedding.get_model()
+        except Exception as e:
+          raise CommandError(f"Could not load the {model_backend} embedding model: {str(e)}")
+        load_seconds = time.perf_counter() - start
+        model_info = {"model": embedding.get_embedding_model_id(), "load_ms": _ms(load_seconds), "model_rss_mb": round(_rss_mb() - rss_before, 1)}
+        for backend in options["backends"]:
+          results.append({"backend": backend, **model_info, **self.benchmark(dataset, model, backend, options["k"], options["repeat"])})
+      embedding._model = None
+
+    report = {
+      "commit": _git_commit(),
+      "created_at": datetime.now(timezone.utc).isoformat(),
+      "python": platform.python_version(),
+      "dataset": path.name,
+      "chunks": len(dataset["chunks"]),
+      "questions": len(dataset["questions"]),
+      "peak_rss_mb": _rss_mb(),
+      "results": results,
+    }
+    if options["output"]:
+      Path(options["output"]).write_text(json.dumps(report, indent=2))
+
+    if options["json"]:
+      self.stdout.write(json.dumps(report, indent=2))
+      return
+    self.stdout.write(f"{path.name}: {report['chunks']} chunks, {report['questions']} questions")
+    for result in results:
+      recall = ", ".join(f"@{k} {value}" for k, value in result["recall"].items())
+      hybrid = ", ".join(f"@{k} {value}" for k, value in result["hybrid_recall"].items())
+      self.stdout.write(
+        f"{result['backend']} / {result['model']}: recall {recall} (hybrid {hybrid}) | "
+        f"encode p50 {result['encode_ms']['p50']} ms, p95 {result['encode_ms']['p95']} ms | "
+        f"search p50 {result['search_ms']['p50']} ms, p95 {result['search_ms']['p95']} ms | "
+        f"index {result['index_peak_mb']} MB, model {result['model_rss_mb']} MB rss"
+      )
+
+  def benchmark(self, dataset: dict, model, backend: str, cutoffs: list[int], repeat: int) -> dict:
+    chunk_ids = {chunk["text"]: chunk["id"] for chunk in dataset["chunks"]}
+    texts = list(chunk_ids)
+    depth = max(cutoffs)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      if backend == "faiss":
+        store = FaissVectorStore(tmp_dir)
+      else:
+        store = PineconeVectorStore()
+        store._index = LocalPineconeIndex()
+
+      # the python heap of encoding and indexing the corpus, faiss allocations are not traced
+      tracemalloc.start()
+      start = time.perf_counter()
+      try:
+        store.upsert(COURSE_ID, list(chunk_ids.values()), model.encode(texts, convert_to_numpy=True).tolist(), texts)
+        index_peak = tracemalloc.get_traced_memory()[1]
+      finally:
+        tracemalloc.stop()
+      index_seconds = time.perf_counter() - start
+
+      lexical_index = BM25Index(texts)
+      encode_times, search_times = [], []
+      hits = {k: 0 for k in cutoffs}
+      hybrid_hits = {k: 0 for k in cutoffs}
+      for labeled in dataset["questions"]:
+        question = labeled["question"]
+        encode_best = search_best = float("inf")
+        for _ in range(max(1, repeat)):
+          start = time.perf_counter()
+          query_embedding = model.encode([question], convert_to_numpy=True).tolist()[0]
+          encode_best = min(encode_best, time.perf_counter() - start)
+          start = time.perf_counter()
+          ranked = store.query(COURSE_ID, query_embedding, depth)
+          search_best = min(search_best, time.perf_counter() - start)
+        encode_times.append(encode_best)
+        search_times.append(search_best)
+
+        ranked_ids = [chunk_ids[text] for text in ranked]
+        for k in cutoffs:
+          hits[k] += labeled["chunk"] in ranked_ids[:k]
+          hybrid_hits[k] += labeled["chunk"] in {chunk_ids[text] for text in hybrid_rank(question, ranked, lexical_index, k)}
+
+    total = len(dataset["questions"])
+    return {
+      "recall": {k: round(hits[k] / total, 3) for k in cutoffs},
+      "hybrid_recall": {k: round(hybrid_hits[k] / total, 3) for k in cutoffs},
+      "encode_ms": {"p50": _ms(statistics.median(encode_times)), "p95": _ms(_percentile(encode_times, 95))},
+      "search_ms": {"p50": _ms(statistics.median(search_times)), "p95": _ms(_percentile(search_times, 95))},
+      "index_ms": _ms(index_seconds),
+      "index_peak_mb": round(index_peak / 1_000_000, 3),
+    }
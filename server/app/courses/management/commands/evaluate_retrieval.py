@@ -0,0 +1,79 @@
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.services.retrieval import hybrid_rank
+from services.bm25 import BM25Index
+from services.embedding import get_model
+from services.vector_store import FaissVectorStore
+
+DEFAULT_DATASET = Path(__file__).parent / "data" / "retrieval_corpus.json"
+MODES = ["dense", "bm25", "hybrid"]
+
+
+class Command(BaseCommand):
+  help = "Measures the hit rate and latency of dense, bm25 and hybrid chat retrieval on a labeled question set, offline."
+
+  def add_arguments(self, parser):
+    parser.add_argument("dataset", nargs="?", default=str(DEFAULT_DATASET), help="JSON file of chunks and labeled questions.")
+    parser.add_argument("--top-k", type=int, default=3, help="Chunks returned per question, a hit is the labeled chunk among them.")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+
+  def handle(self, *args, **options):
+    path = Path(options["dataset"])
+    if not path.exists():
+      raise CommandError(f"No such file: {path}")
+    dataset = json.loads(path.read_text())
+    chunk_ids = {chunk["text"]: chunk["id"] for chunk in dataset["chunks"]}
+    texts = list(chunk_ids)
+    top_k = options["top_k"]
+    candidates = max(top_k, settings.HYBRID_RETRIEVAL_CANDIDATES)
+
+    model = get_model()
+    lexical_index = BM25Index(texts)
+    hits = {mode: 0 for mode in MODES}
+    latencies = {mode: [] for mode in MODES}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      # the faiss store keeps the whole evaluation in process, no network round trip is measured
+      store = FaissVectorStore(tmp_dir)
+      store.upsert("eval", list(chunk_ids.values()), model.encode(texts, convert_to_numpy=True).tolist(), texts)
+      for labeled in dataset["questions"]:
+        question = labeled["question"]
+        start = time.perf_counter()
+        embedding = model.encode([question], convert_to_numpy=True).tolist()[0]
+        dense = store.query("eval", embedding, candidates)
+        dense_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        lexical = [texts[position] for position, _ in lexical_index.search(question, top_k)]
+        bm25_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        hybrid = hybrid_rank(question, dense, lexical_index, top_k)
+        hybrid_seconds = dense_seconds + time.perf_counter() - start
+
+        for mode, results, seconds in (("dense", dense[:top_k], dense_seconds), ("bm25", lexical, bm25_seconds), ("hybrid", hybrid, hybrid_seconds)):
+          hits[mode] += labeled["chunk"] in {chunk_ids[text] for text in results}
+          latencies[mode].append(seconds * 1000)
+
+    total = len(dataset["questions"])
+    results = [
+      {
+        "mode": mode,
+        "hit_rate": round(hits[mode] / total, 3) if total else None,
+        "mean_ms": round(statistics.mean(latencies[mode]), 3) if total else None,
+        "max_ms": round(max(latencies[mode]), 3) if total else None,
+      }
+      for mode in MODES
+    ]
+    if options["json"]:
+      self.stdout.write(json.dumps({"dataset": path.name, "questions": total, "top_k": top_k, "results": results}, indent=2))
+      return
+    self.stdout.write(f"{path.name}: {total} questions, top_k {top_k}")
+    for result in results:
+      self.stdout.write(f"{result['mode']}: hit rate {result['hit_rate']}, mean {result['mean_ms']} ms, max {result['max_ms']} ms")
@@ -0,0 +1,55 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from services.vector_store import PineconeVectorStore, course_namespace, get_vector_store
+
+# vectors written before per-course namespaces sit in the default namespace
+LEGACY_NAMESPACE = ""
+
+
+def _batches(items: list, size: int):
+  for start in range(0, len(items), size):
+    yield items[start:start + size]
+
+
+class Command(BaseCommand):
+  help = "Moves vectors from the default namespace of the shared Pinecone index into one namespace per course."
+
+  def add_arguments(self, parser):
+    parser.add_argument("--batch-size", type=int, default=100, help="Vectors fetched, upserted and deleted per request.")
+    parser.add_argument("--dry-run", action="store_true", help="Only report how many vectors each course would move.")
+    parser.add_argument("--keep-source", action="store_true", help="Copy the vectors without deleting them from the default namespace.")
+
+  def handle(self, *args, **options):
+    store = get_vector_store()
+    if not isinstance(store, PineconeVectorStore):
+      raise CommandError("Namespaces only apply to the pinecone vector store, the faiss store is already per course.")
+    index = store.get_index()
+    batch_size = options["batch_size"]
+
+    ids = [vector_id for page in index.list(namespace=LEGACY_NAMESPACE) for vector_id in page]
+    moved = defaultdict(int)
+    skipped = 0
+    for batch in _batches(ids, batch_size):
+      vectors = index.fetch(ids=batch, namespace=LEGACY_NAMESPACE).vectors
+      by_course = defaultdict(list)
+      for vector_id, vector in vectors.items():
+        metadata = vector.metadata or {}
+        if "course_id" not in metadata:
+          skipped += 1
+          continue
+        by_course[metadata["course_id"]].append((vector_id, vector.values, metadata))
+
+      for course_id, course_vectors in by_course.items():
+        moved[course_id] += len(course_vectors)
+        if options["dry_run"]:
+          continue
+        index.upsert(course_vectors, namespace=course_namespace(course_id))
+        if not options["keep_source"]:
+          index.delete(ids=[vector_id for vector_id, _, _ in course_vectors], namespace=LEGACY_NAMESPACE)
+
+    verb = "Would move" if options["dry_run"] else "Moved"
+    for course_id, count in sorted(moved.items()):
+      self.stdout.write(f"{verb} {count} vectors to namespace {course_namespace(course_id)}")
+    self.stdout.write(f"{verb} {sum(moved.values())} vectors for {len(moved)} courses, skipped {skipped} without a course_id")
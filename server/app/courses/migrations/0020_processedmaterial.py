@@ -0,0 +1,27 @@
+# Generated by Django 5.2.9 on 2026-10-17 16:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0019_coursematerial_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessedMaterial',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True)),
+                ('chunk_options', models.JSONField(blank=True, default=dict)),
+                ('chunks', models.JSONField(blank=True, default=list)),
+                ('embedding_model', models.CharField(blank=True, default='', max_length=100)),
+                ('embeddings', models.JSONField(blank=True, default=list)),
+                ('questions', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
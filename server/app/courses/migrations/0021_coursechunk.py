@@ -0,0 +1,24 @@
+# Generated by Django 5.2.9 on 2026-10-17 18:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0020_processedmaterial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vector_id', models.CharField(max_length=100, unique=True)),
+                ('text', models.TextField()),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='courses.course')),
+                ('material', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='courses.coursematerial')),
+            ],
+        ),
+    ]
@@ -29,6 +29,8 @@ class CourseMaterial(models.Model):
   file_size = models.PositiveIntegerField()
   file_type = models.CharField(max_length=50)
   uploaded_at = models.DateTimeField(auto_now_add=True)
+  # sha256 of the file bytes, filled in the first time the file is downloaded for extraction
+  content_hash = models.CharField(max_length=64, blank=True, default="")
 
   # database index for 'course' and 'uploaded_at'
   # querying performence
@@ -45,6 +47,38 @@ class CourseMaterial(models.Model):
   #       # Generate the public URL if needed
   #       return f"https://<your-project>.supabase.co/storage/v1/object/public/materials-all/{self.file_path}"
 
+
+# processed output of a file, shared by every CourseMaterial with the same content_hash
+# (e.g. a whole class uploading the same syllabus) so it is only chunked, embedded and
+# sent to the llm once
+class ProcessedMaterial(models.Model):
+  content_hash = models.CharField(max_length=64, unique=True)
+  # options the chunks were built with, the chunks are stale when these change
+  chunk_options = models.JSONField(default=dict, blank=True)
+  chunks = models.JSONField(default=list, blank=True)
+  # embeddings of the chunks, in the same order
+  embedding_model = models.CharField(max_length=100, blank=True, default="")
+  embeddings = models.JSONField(default=list, blank=True)
+  # snapshot of a pregenerated question pool, in the llm output format
+  questions = models.JSONField(default=list, blank=True)
+  created_at = models.DateTimeField(auto_now_add=True)
+  updated_at = models.DateTimeField(auto_now=True)
+
+  def __str__(self):
+    return self.content_hash
+
+# text of every chunk upserted to the vector store, the corpus of the lexical (bm25) side of
+# chat retrieval. rows go away with their material or course, like the vectors do
+class CourseChunk(models.Model):
+  course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='chunks')
+  material = models.ForeignKey(CourseMaterial, on_delete=models.CASCADE, related_name='chunks')
+  # id of the chunk's vector in the vector store
+  vector_id = models.CharField(max_length=100, unique=True)
+  text = models.TextField()
+
+  def __str__(self):
+    return self.vector_id
+
 # make new model for messages to allow pagination
 # currently, it will be very expensive to store all messages in a single field especially if convo gets too large
 class ChatHistory(models.Model):
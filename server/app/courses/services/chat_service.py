@@ -1,5 +1,5 @@
 from courses.models import ChatHistory, Message
-from services.embedding import query_course
+from courses.services.retrieval import retrieve_course_chunks
 
 def add_to_chat_history(name_filter: str, new_message: str, sender: str, course) -> None:
   chat_history, created = ChatHistory.objects.get_or_create(
@@ -16,7 +16,7 @@ def add_to_chat_history(name_filter: str, new_message: str, sender: str, course)
 def build_chat_prompt(first_name: str, course_name: str, course_id: str, new_message: str) -> str:
     user_name = first_name
     course_name = course_name
-    relevant_chunks = query_course(new_message, course_id)
+    relevant_chunks = retrieve_course_chunks(new_message, course_id)
     # build the context for the LLM(man tgey stupid)
     context = (
         f"You are a helpful assistant for the course '{course_name}'. Your answers are brief and to the point. Strictly 4 sentences maximum."
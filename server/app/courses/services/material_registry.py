@@ -0,0 +1,115 @@
+# registry of processed materials keyed by the sha256 of the file bytes.
+# every CourseMaterial with the same content_hash shares one ProcessedMaterial, so chunks,
+# embeddings and pregenerated questions of a popular file are only computed once
+from django.db.models import Count
+
+from courses.models import ProcessedMaterial
+from quiz.models import QuizModel
+from utils.question_generator import create_questions_and_options
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+PREGENERATED_QUIZ_PREFIX = "pregenerated-quiz-"
+
+
+def get_processed_material(content_hash: str) -> ProcessedMaterial | None:
+    if not content_hash:
+        return None
+    return ProcessedMaterial.objects.filter(content_hash=content_hash).first()
+
+
+def get_registered_chunks(content_hash: str, chunk_options: dict) -> list[str] | None:
+    """
+    Returns the registered chunks of a file, or None when the file has not been processed
+    yet or its chunks were built with different chunk options.
+    """
+    processed = get_processed_material(content_hash)
+    if processed is None or not processed.chunks or processed.chunk_options != chunk_options:
+        return None
+    logger.info(f"Reusing registered chunks of {content_hash}")
+    return processed.chunks
+
+
+def register_chunks(content_hash: str, chunks: list[str], chunk_options: dict) -> ProcessedMaterial:
+    """
+    Stores the chunks of a file. Replacing the chunks drops the embeddings since they
+    no longer line up, the question snapshot is kept because it is still about the same file.
+    """
+    processed, created = ProcessedMaterial.objects.get_or_create(
+        content_hash=content_hash,
+        defaults={"chunks": chunks, "chunk_options": chunk_options},
+    )
+    if not created and (processed.chunks != chunks or processed.chunk_options != chunk_options):
+        processed.chunks = chunks
+        processed.chunk_options = chunk_options
+        processed.embeddings = []
+        processed.embedding_model = ""
+        processed.save(update_fields=["chunks", "chunk_options", "embeddings", "embedding_model", "updated_at"])
+    return processed
+
+
+def get_registered_embeddings(processed: ProcessedMaterial, model_name: str, chunks: list[str]) -> list[list[float]] | None:
+    # only usable if they were computed by the same model for exactly these chunks
+    if processed.embedding_model != model_name or processed.chunks != chunks or len(processed.embeddings) != len(chunks):
+        return None
+    return processed.embeddings
+
+
+def register_embeddings(processed: ProcessedMaterial, model_name: str, embeddings: list[list[float]]) -> None:
+    processed.embedding_model = model_name
+    processed.embeddings = embeddings
+    processed.save(update_fields=["embedding_model", "embeddings", "updated_at"])
+
+
+def _snapshot_question(question) -> dict:
+    # same shape as the llm output so create_questions_and_options can rebuild it
+    options = [] if question.question_type == "TF" else [option.text for option in question.options.all()]
+    return {
+        "question": question.question,
+        "type": question.question_type,
+        "answer": question.correct_answer,
+        "options": options,
+    }
+
+
+def snapshot_question_pool(processed: ProcessedMaterial, exclude_quiz_id: int | None = None) -> list[dict]:
+    """
+    Returns the question snapshot of a file, refreshing it from the largest pregenerated pool of
+    another material with the same content_hash. Pools are drained when users generate quizzes,
+    so the snapshot outlives the pool it was taken from.
+    """
+    donor = (
+        QuizModel.objects
+        .filter(
+            is_generated=True,
+            quiz_title__startswith=PREGENERATED_QUIZ_PREFIX,
+            material_list__content_hash=processed.content_hash,
+        )
+        .exclude(id=exclude_quiz_id)
+        .annotate(question_count=Count("questions", distinct=True))
+        .filter(question_count__gt=len(processed.questions))
+        .order_by("-question_count")
+        .first()
+    )
+    if donor is not None:
+        questions = donor.questions.prefetch_related("options")
+        processed.questions = [_snapshot_question(question) for question in questions]
+        processed.save(update_fields=["questions", "updated_at"])
+    return processed.questions
+
+
+def clone_question_pool(processed: ProcessedMaterial, quiz: QuizModel, count: int) -> int:
+    """
+    Copies up to count questions of the file's snapshot into quiz.
+
+    Returns:
+        int: The number of questions copied, the rest still has to be generated.
+    """
+    questions = snapshot_question_pool(processed, exclude_quiz_id=quiz.id)[:count]
+    if not questions:
+        return 0
+    create_questions_and_options(quiz, questions)
+    logger.info(f"Copied {len(questions)} pregenerated questions of {processed.content_hash} into quiz {quiz.id}")
+    return len(questions)
@@ -2,14 +2,21 @@
 # different quiz_generator for each material, so that the quiz_title is unique and each request to 
 # generate questions based on that material will have a separate quiz object they can steal from
 from utils.helpers import get_content_from_quizId, generate_questions_by_chunks
-from services.embedding import embed_and_upsert_chunks
+from services.embedding import get_embedding_model_id
+from courses.services.material_registry import (
+    PREGENERATED_QUIZ_PREFIX,
+    get_processed_material,
+    clone_question_pool,
+    get_registered_embeddings,
+)
+from courses.tasks import embed_material_chunks
 from quiz.models import QuizModel
 from celery import shared_task
 
 @shared_task(bind=True, max_retries=3, default_retry_delay=5)
-def handle_quiz_pregeneration(material, course, course_id):
+def handle_quiz_pregeneration(self, material, course, course_id):
     quiz = QuizModel.objects.create(
-      quiz_title=f"pregenerated-quiz-{material.id}",
+      quiz_title=f"{PREGENERATED_QUIZ_PREFIX}{material.id}",
       course=course, 
       is_generated=True,
       number_of_questions=20
@@ -17,7 +24,23 @@ def handle_quiz_pregeneration(material, course, course_id):
     quiz.material_list.add(material)
     try:
       current_material_contents: list[str] = get_content_from_quizId(quiz.id)
-      generate_questions_by_chunks(current_material_contents, quiz, 20) # default to 20 questions for pregenerated quizzes
-      embed_and_upsert_chunks(chunks=current_material_contents, course_id=course_id)  
+      # the extraction fills in the content_hash, other uploads of the same file share their work
+      material.refresh_from_db(fields=['content_hash'])
+      processed = get_processed_material(material.content_hash)
+
+      # default to 20 questions for pregenerated quizzes, only the ones the registry lacks hit the llm
+      reused = clone_question_pool(processed, quiz, 20) if processed else 0
+      if reused < 20:
+        generate_questions_by_chunks(current_material_contents, quiz, 20 - reused)
+
+      embeddings = get_registered_embeddings(processed, get_embedding_model_id(), current_material_contents) if processed else None
+      # embedding and upserting runs on a worker, outside of the upload request
+      embed_material_chunks.delay(
+        chunks=current_material_contents,
+        course_id=str(course_id),
+        material_id=material.id,
+        embeddings=embeddings,
+        register_hash=processed.content_hash if processed and embeddings is None else None,
+      )
     except Exception as e:
       raise Exception(f"Error generating questions: {str(e)}")
\ No newline at end of file
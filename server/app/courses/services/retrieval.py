@@ -0,0 +1,42 @@
+# hybrid retrieval for course chat: dense results from the vector store fused by reciprocal rank
+# with bm25 over the course's stored chunk texts, so keyword and acronym questions ("what is
+# TCP SYN") still find the chunk that literally mentions them
+from django.conf import settings
+
+from courses.models import CourseChunk
+from services.bm25 import BM25Index, reciprocal_rank_fusion
+from services.embedding import query_course
+from services.query_cache import ExpiringLRUCache, get_results_version
+
+_lexical_indexes = None
+
+
+def get_lexical_index(course_id: str) -> BM25Index:
+    """
+    Returns the bm25 index of the course's chunks, rebuilt in each process whenever the course's
+    vector version changes (every upsert and delete of its vectors).
+    """
+    global _lexical_indexes
+    if _lexical_indexes is None:
+        # no expiry, an index goes stale only with a new vector version, which is a new key
+        _lexical_indexes = ExpiringLRUCache(settings.LEXICAL_INDEX_CACHE_SIZE, float("inf"))
+    key = f"{course_id}:{get_results_version(course_id)}"
+    index = _lexical_indexes.get(key)
+    if index is None:
+        texts = CourseChunk.objects.filter(course_id=course_id).order_by('id').values_list('text', flat=True)
+        index = BM25Index(list(texts))
+        _lexical_indexes.set(key, index)
+    return index
+
+
+def hybrid_rank(question: str, dense_chunks: list[str], lexical_index: BM25Index, top_k: int) -> list[str]:
+    lexical_chunks = [lexical_index.documents[position] for position, _ in lexical_index.search(question, len(dense_chunks) or top_k)]
+    return reciprocal_rank_fusion([dense_chunks, lexical_chunks], k=settings.HYBRID_RRF_K)[:top_k]
+
+
+def retrieve_course_chunks(question: str, course_id: str, top_k: int = 3) -> list[str]:
+    if settings.CHAT_RETRIEVAL_MODE == "dense":
+        return query_course(question, course_id, top_k=top_k)
+    # both retrievers return a deeper candidate list than top_k, so the fusion has something to reorder
+    dense_chunks = query_course(question, course_id, top_k=max(top_k, settings.HYBRID_RETRIEVAL_CANDIDATES))
+    return hybrid_rank(question, dense_chunks, get_lexical_index(course_id), top_k)
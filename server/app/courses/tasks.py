@@ -0,0 +1,37 @@
+from celery import shared_task
+import logging
+from django.db import transaction
+
+from courses.models import CourseChunk, CourseMaterial
+from courses.services.material_registry import get_processed_material, register_embeddings
+from services.embedding import embed_and_upsert_chunks, get_embedding_model_id, material_vector_ids
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, max_retries=5, default_retry_delay=10)
+def embed_material_chunks(self, chunks: list[str], course_id: str, material_id: int, embeddings: list[list[float]] | None = None, register_hash: str | None = None):
+    material = CourseMaterial.objects.filter(id=material_id).first()
+    if material is None:
+        logger.info(f"Material {material_id} was deleted before its chunks were embedded")
+        return
+
+    # the chunk texts are stored first, the upsert then invalidates the course's cached lexical index
+    with transaction.atomic():
+        CourseChunk.objects.filter(material=material).delete()
+        CourseChunk.objects.bulk_create([
+            CourseChunk(course_id=material.course_id, material=material, vector_id=vector_id, text=chunk)
+            for vector_id, chunk in zip(material_vector_ids(course_id, material_id, len(chunks)), chunks)
+        ])
+
+    # retrying is safe, the vector ids only depend on the course, material and chunk position
+    try:
+        upserted = embed_and_upsert_chunks(chunks=chunks, course_id=course_id, material_id=material_id, embeddings=embeddings)
+    except Exception as e:
+        logger.error(f"Error upserting chunks for course {course_id}: {str(e)}")
+        raise self.retry(exc=e)
+
+    # register the embeddings for the next upload of the same file, unless its chunks changed meanwhile
+    processed = get_processed_material(register_hash) if register_hash else None
+    if processed and processed.chunks == chunks:
+        register_embeddings(processed, get_embedding_model_id(), upserted)
@@ -112,12 +112,14 @@ class CourseMaterialTests(APITestCase):
     self.assertEqual(response.data['file_size'], 2048)
 
 
-  def test_delete_material(self):
+  @patch('courses.views.delete_material_chunks.delay')
+  def test_delete_material(self, mock_delete_chunks):
     material = CourseMaterial.objects.create(course=self.course, file_name='Lecture 1', file_size=2048, file_type='application/pdf', material_file_url='http://example.com/lecture1.pdf')
     url = reverse('course-material-detail', kwargs={'course_id': self.course.id, 'material_id': material.id})
     response = self.client.delete(url, format='json')
     self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
     self.assertFalse(CourseMaterial.objects.filter(id=material.id).exists())
+    mock_delete_chunks.assert_called_once_with(str(self.course.id), material.id)
   
 
 class ChatHistoryTests(APITestCase):
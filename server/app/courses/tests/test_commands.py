@@ -0,0 +1,149 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, override_settings
+
+from services.vector_store import FaissVectorStore, PineconeVectorStore
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+@patch('courses.management.commands.benchmark_extraction.get_chunk_options', return_value={'chunk_size': 400, 'max_chunks': 2})
+class BenchmarkExtractionCommandTest(SimpleTestCase):
+  def test_writes_stage_results_as_json(self, mock_chunk_options):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      output = Path(tmp_dir) / 'results.json'
+      call_command('benchmark_extraction', '--synthetic-pages', '3', '--repeat', '1', '--workers', '1', '--output', str(output), stdout=StringIO())
+      report = json.loads(output.read_text())
+
+      [result] = report['results']
+      self.assertEqual(result['file'], 'synthetic-3.pdf')
+      self.assertEqual(result['pages'], 3)
+      # the page numbers are dropped by the block filter
+      self.assertEqual(result['blocks'] - result['blocks_kept'], 3)
+      self.assertEqual(result['chunks'], 2)
+      self.assertTrue(result['budgeted_matches_full'])
+      self.assertEqual(set(result['stages']), {'fetch', 'extract', 'clean', 'chunk', 'budgeted'})
+
+      stdout = StringIO()
+      call_command('benchmark_extraction', '--synthetic-pages', '3', '--repeat', '1', '--workers', '1', '--compare', str(output), stdout=stdout)
+      self.assertIn('synthetic-3.pdf vs baseline', stdout.getvalue())
+
+
+class FakeIndex:
+  """
+  In-memory stand-in for a Pinecone index: {namespace: {id: (values, metadata)}}.
+  """
+  def __init__(self, vectors):
+    self.namespaces = {"": dict(vectors)}
+
+  def list(self, namespace):
+    ids = list(self.namespaces.get(namespace, {}))
+    # pages of two ids, like the paginated listing
+    for start in range(0, len(ids), 2):
+      yield ids[start:start + 2]
+
+  def fetch(self, ids, namespace):
+    vectors = self.namespaces[namespace]
+    return SimpleNamespace(vectors={
+      vector_id: SimpleNamespace(values=vectors[vector_id][0], metadata=vectors[vector_id][1])
+      for vector_id in ids if vector_id in vectors
+    })
+
+  def upsert(self, vectors, namespace):
+    for vector_id, values, metadata in vectors:
+      self.namespaces.setdefault(namespace, {})[vector_id] = (values, metadata)
+
+  def delete(self, ids, namespace):
+    for vector_id in ids:
+      self.namespaces[namespace].pop(vector_id)
+
+
+class MigrateVectorNamespacesCommandTest(SimpleTestCase):
+  def setUp(self):
+    self.index = FakeIndex({
+      "course-1-chunk-0": ([0.1], {"course_id": "1", "text": "a"}),
+      "course-1-chunk-1": ([0.2], {"course_id": "1", "text": "b"}),
+      "course-2-chunk-0": ([0.3], {"course_id": "2", "text": "c"}),
+      "orphan": ([0.4], {}),
+    })
+    store = PineconeVectorStore()
+    store._index = self.index
+    store_patch = patch('courses.management.commands.migrate_vector_namespaces.get_vector_store', return_value=store)
+    store_patch.start()
+    self.addCleanup(store_patch.stop)
+
+  def test_moves_vectors_into_course_namespaces(self):
+    stdout = StringIO()
+    call_command('migrate_vector_namespaces', '--batch-size', '3', stdout=stdout)
+    self.assertEqual(set(self.index.namespaces["course-1"]), {"course-1-chunk-0", "course-1-chunk-1"})
+    self.assertEqual(self.index.namespaces["course-2"]["course-2-chunk-0"], ([0.3], {"course_id": "2", "text": "c"}))
+    self.assertEqual(set(self.index.namespaces[""]), {"orphan"})
+    self.assertIn("Moved 3 vectors for 2 courses, skipped 1", stdout.getvalue())
+
+  def test_dry_run_changes_nothing(self):
+    call_command('migrate_vector_namespaces', '--dry-run', stdout=StringIO())
+    self.assertEqual(list(self.index.namespaces), [""])
+    self.assertEqual(len(self.index.namespaces[""]), 4)
+
+  @patch('courses.management.commands.migrate_vector_namespaces.get_vector_store')
+  def test_rejects_faiss_store(self, mock_store):
+    mock_store.return_value = FaissVectorStore(tempfile.gettempdir())
+    with self.assertRaises(CommandError):
+      call_command('migrate_vector_namespaces', stdout=StringIO())
+
+
+class EvaluateRetrievalCommandTest(SimpleTestCase):
+  @patch('courses.management.commands.evaluate_retrieval.get_model')
+  def test_reports_hit_rate_per_mode(self, mock_get_model):
+    from services.tests.test_vector_store import BagOfWordsModel
+    mock_get_model.return_value = BagOfWordsModel()
+    stdout = StringIO()
+    call_command('evaluate_retrieval', '--top-k', '3', '--json', stdout=stdout)
+    report = json.loads(stdout.getvalue())
+
+    self.assertEqual(report['questions'], 16)
+    self.assertEqual([result['mode'] for result in report['results']], ['dense', 'bm25', 'hybrid'])
+    for result in report['results']:
+      self.assertGreater(result['hit_rate'], 0.5)
+
+
+class BenchmarkRetrievalCommandTest(SimpleTestCase):
+  @patch('services.embedding.get_model')
+  def test_reports_recall_and_latency_per_backend(self, mock_get_model):
+    from services.tests.test_vector_store import BagOfWordsModel
+    mock_get_model.return_value = BagOfWordsModel()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      output = Path(tmp_dir) / 'results.json'
+      call_command('benchmark_retrieval', '--k', '1', '3', '--repeat', '1', '--output', str(output), stdout=StringIO())
+      report = json.loads(output.read_text())
+
+    self.assertEqual(report['questions'], 16)
+    self.assertEqual([result['backend'] for result in report['results']], ['faiss', 'pinecone'])
+    faiss_result, pinecone_result = report['results']
+    # both stores rank by cosine similarity over the same embeddings
+    self.assertEqual(faiss_result['recall'], pinecone_result['recall'])
+    self.assertLessEqual(faiss_result['recall']['1'], faiss_result['recall']['3'])
+    self.assertEqual(set(faiss_result['search_ms']), {'p50', 'p95'})
+    self.assertEqual(faiss_result['model'], 'all-MiniLM-L6-v2')
+
+
+class BenchmarkLlmParserCommandTest(SimpleTestCase):
+  def test_reports_recovery_per_case(self):
+    stdout = StringIO()
+    call_command('benchmark_llm_parser', '--sizes', '10', '--repeat', '1', '--json', stdout=stdout)
+    results = {result['case']: result for result in json.loads(stdout.getvalue())}
+
+    self.assertEqual(set(results), {'well_formed', 'trailing_commas', 'truncated'})
+    self.assertEqual(results['well_formed']['recovered'], 10)
+    self.assertEqual(results['well_formed']['legacy_recovered'], 10)
+    self.assertEqual(results['trailing_commas']['recovered'], 10)
+    self.assertEqual(results['trailing_commas']['legacy_recovered'], 0)
+    self.assertGreater(results['truncated']['recovered'], 0)
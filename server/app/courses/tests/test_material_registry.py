@@ -0,0 +1,117 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from user.models import User
+from courses.models import Course, CourseMaterial, ProcessedMaterial
+from courses.services.material_registry import (
+  clone_question_pool,
+  get_registered_chunks,
+  get_registered_embeddings,
+  register_chunks,
+  register_embeddings,
+)
+from courses.services.quiz_pregeneration import handle_quiz_pregeneration
+from quiz.models import QuizModel
+from utils.question_generator import create_questions_and_options
+
+CONTENT_HASH = "a" * 64
+CHUNK_OPTIONS = {"max_tokens": 750, "overlap_tokens": 0, "max_chunks": 4}
+CHUNKS = ["first chunk", "second chunk"]
+QUESTIONS = [
+  {"question": f"Question {i}?", "type": "MCQ", "answer": "A", "options": ["one", "two", "three", "four"]}
+  for i in range(15)
+] + [{"question": "Is this true?", "type": "TF", "answer": "True", "options": []}]
+
+
+class MaterialRegistryTest(TestCase):
+  def setUp(self):
+    self.first_user = User.objects.create_user(username='first', password='testpass')
+    self.second_user = User.objects.create_user(username='second', password='testpass')
+    self.first_course = Course.objects.create(user=self.first_user, course_name='First', course_code='CS101')
+    self.second_course = Course.objects.create(user=self.second_user, course_name='Second', course_code='CS101')
+
+  def create_material(self, course, content_hash=CONTENT_HASH):
+    return CourseMaterial.objects.create(
+      course=course, file_name='syllabus.pdf', file_size=2048, file_type='application/pdf',
+      material_file_url=f'{course.id}/syllabus.pdf', content_hash=content_hash,
+    )
+
+  def create_pool(self, material, questions=QUESTIONS):
+    quiz = QuizModel.objects.create(
+      quiz_title=f"pregenerated-quiz-{material.id}", course=material.course, is_generated=True, number_of_questions=20
+    )
+    quiz.material_list.add(material)
+    create_questions_and_options(quiz, questions)
+    return quiz
+
+  def test_register_chunks(self):
+    self.assertIsNone(get_registered_chunks(CONTENT_HASH, CHUNK_OPTIONS))
+    register_chunks(CONTENT_HASH, CHUNKS, CHUNK_OPTIONS)
+    self.assertEqual(get_registered_chunks(CONTENT_HASH, CHUNK_OPTIONS), CHUNKS)
+    self.assertIsNone(get_registered_chunks(CONTENT_HASH, {**CHUNK_OPTIONS, "max_tokens": 1000}))
+
+  def test_rechunking_drops_embeddings(self):
+    processed = register_chunks(CONTENT_HASH, CHUNKS, CHUNK_OPTIONS)
+    register_embeddings(processed, "model", [[0.1], [0.2]])
+    self.assertEqual(get_registered_embeddings(processed, "model", CHUNKS), [[0.1], [0.2]])
+    self.assertIsNone(get_registered_embeddings(processed, "other-model", CHUNKS))
+
+    processed = register_chunks(CONTENT_HASH, ["one chunk"], {**CHUNK_OPTIONS, "max_tokens": 1000})
+    self.assertIsNone(get_registered_embeddings(processed, "model", ["one chunk"]))
+
+  def test_clone_question_pool(self):
+    donor = self.create_pool(self.create_material(self.first_course))
+    processed = register_chunks(CONTENT_HASH, CHUNKS, CHUNK_OPTIONS)
+    material = self.create_material(self.second_course)
+    quiz = QuizModel.objects.create(quiz_title=f"pregenerated-quiz-{material.id}", course=self.second_course, is_generated=True)
+    quiz.material_list.add(material)
+
+    self.assertEqual(clone_question_pool(processed, quiz, 20), len(QUESTIONS))
+    self.assertEqual(
+      [question.question for question in quiz.questions.all()],
+      [item["question"] for item in QUESTIONS],
+    )
+    self.assertEqual(quiz.questions.first().get_options(), ["one", "two", "three", "four"])
+    # the donor keeps its own questions
+    self.assertEqual(donor.questions.count(), len(QUESTIONS))
+
+  def test_snapshot_outlives_drained_pool(self):
+    donor = self.create_pool(self.create_material(self.first_course))
+    processed = register_chunks(CONTENT_HASH, CHUNKS, CHUNK_OPTIONS)
+    material = self.create_material(self.second_course)
+    quiz = QuizModel.objects.create(quiz_title=f"pregenerated-quiz-{material.id}", course=self.second_course, is_generated=True)
+    clone_question_pool(processed, quiz, 5)
+
+    donor.questions.all().delete()
+    other_quiz = QuizModel.objects.create(quiz_title="pregenerated-quiz-other", course=self.second_course, is_generated=True)
+    self.assertEqual(clone_question_pool(processed, other_quiz, 20), len(QUESTIONS))
+
+  def test_pool_of_different_file_is_not_used(self):
+    self.create_pool(self.create_material(self.first_course, content_hash="b" * 64))
+    processed = register_chunks(CONTENT_HASH, CHUNKS, CHUNK_OPTIONS)
+    quiz = QuizModel.objects.create(quiz_title="pregenerated-quiz-other", course=self.second_course, is_generated=True)
+    self.assertEqual(clone_question_pool(processed, quiz, 20), 0)
+
+  @patch('courses.tasks.embed_and_upsert_chunks')
+  @patch('courses.services.quiz_pregeneration.generate_questions_by_chunks')
+  @patch('utils.helpers.get_material_chunks')
+  def test_pregeneration_reuses_processed_material(self, mock_get_material_chunks, mock_generate, mock_embed):
+    mock_get_material_chunks.return_value = CHUNKS
+    mock_embed.side_effect = lambda chunks, course_id, material_id, embeddings=None: embeddings or [[0.1], [0.2]]
+    mock_generate.side_effect = lambda chunks, quiz, count: create_questions_and_options(quiz, QUESTIONS[:count])
+
+    with patch('utils.helpers.get_chunk_options', return_value=CHUNK_OPTIONS):
+      first = self.create_material(self.first_course)
+      handle_quiz_pregeneration(material=first, course=self.first_course, course_id=str(self.first_course.id))
+      second = self.create_material(self.second_course)
+      handle_quiz_pregeneration(material=second, course=self.second_course, course_id=str(self.second_course.id))
+
+    # the second upload is neither extracted nor embedded again, and only tops up the pool
+    mock_get_material_chunks.assert_called_once()
+    self.assertEqual([call.args[2] for call in mock_generate.call_args_list], [20, 4])
+    self.assertIsNone(mock_embed.call_args_list[0].kwargs['embeddings'])
+    self.assertEqual(mock_embed.call_args_list[1].kwargs['embeddings'], [[0.1], [0.2]])
+    self.assertEqual(ProcessedMaterial.objects.get(content_hash=CONTENT_HASH).embeddings, [[0.1], [0.2]])
+    second_pool = QuizModel.objects.get(quiz_title=f"pregenerated-quiz-{second.id}")
+    self.assertEqual(second_pool.questions.count(), 20)
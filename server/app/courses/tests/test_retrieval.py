@@ -0,0 +1,55 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from user.models import User
+from courses.models import Course, CourseChunk, CourseMaterial
+from courses.services import retrieval
+from courses.services.retrieval import get_lexical_index, retrieve_course_chunks
+from services.query_cache import invalidate_course_results
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+CHUNKS = [
+  "TCP opens a connection with a SYN, SYN-ACK and ACK handshake.",
+  "UDP sends datagrams without a handshake.",
+  "The transport layer moves data between hosts.",
+  "Routers forward packets between networks.",
+]
+
+
+@override_settings(CACHES=LOCMEM_CACHE, CHAT_RETRIEVAL_MODE="hybrid", HYBRID_RETRIEVAL_CANDIDATES=10, HYBRID_RRF_K=60, LEXICAL_INDEX_CACHE_SIZE=10)
+class HybridRetrievalTest(TestCase):
+  def setUp(self):
+    cache.clear()
+    retrieval._lexical_indexes = None
+    user = User.objects.create_user(username='retrieval', password='testpass')
+    self.course = Course.objects.create(user=user, course_name='Networks', course_code='CS140')
+    self.material = CourseMaterial.objects.create(
+      course=self.course, file_name='notes.pdf', file_size=1, file_type='application/pdf', material_file_url='notes.pdf',
+    )
+    for i, text in enumerate(CHUNKS):
+      CourseChunk.objects.create(course=self.course, material=self.material, vector_id=f"v-{i}", text=text)
+
+  @patch('courses.services.retrieval.query_course')
+  def test_keyword_match_is_fused_into_dense_results(self, mock_query_course):
+    # the dense retriever misses the chunk that literally mentions the acronym
+    mock_query_course.return_value = [CHUNKS[2], CHUNKS[3], CHUNKS[1]]
+    results = retrieve_course_chunks("what is TCP SYN", str(self.course.id), top_k=3)
+    # the keyword chunk ties with the best dense chunk, the dense ranking breaks the tie
+    self.assertEqual(results, [CHUNKS[2], CHUNKS[0], CHUNKS[3]])
+    self.assertEqual(mock_query_course.call_args.kwargs['top_k'], 10)
+
+  @override_settings(CHAT_RETRIEVAL_MODE="dense")
+  @patch('courses.services.retrieval.query_course', return_value=[CHUNKS[2]])
+  def test_dense_mode(self, mock_query_course):
+    self.assertEqual(retrieve_course_chunks("what is TCP SYN", str(self.course.id), top_k=3), [CHUNKS[2]])
+    mock_query_course.assert_called_once_with("what is TCP SYN", str(self.course.id), top_k=3)
+
+  def test_lexical_index_is_rebuilt_when_vectors_change(self):
+    course_id = str(self.course.id)
+    index = get_lexical_index(course_id)
+    self.assertIs(get_lexical_index(course_id), index)
+    CourseChunk.objects.create(course=self.course, material=self.material, vector_id="v-9", text="BGP routes between autonomous systems.")
+    invalidate_course_results(course_id)
+    self.assertEqual(len(get_lexical_index(course_id).documents), 5)
@@ -12,7 +12,7 @@ from .models import Course, CourseMaterial, ChatHistory, Message
 from quiz.models import QuizModel
 from quiz.tasks import delete_material_and_quiz
 from .services.conversation import handle_llm_conversation
-from services.embedding import delete_course_chunks
+from services.embedding import delete_course_chunks, delete_material_chunks
 from .services.quiz_pregeneration import handle_quiz_pregeneration
 
 logger = logging.getLogger(__name__)
@@ -166,9 +166,11 @@ class CourseMaterialDetailView(generics.RetrieveUpdateDestroyAPIView):
     material = self.get_object()
     quiz_title = f"pregenerated-quiz-{material.id}"
     file_url = material.material_file_url
+    course_id, material_id = str(material.course_id), material.id
     QuizModel.objects.filter(quiz_title=quiz_title).delete()
     material.delete()
     delete_material_and_quiz.delay(file_url)
+    delete_material_chunks.delay(course_id, material_id)
     return Response(status=status.HTTP_204_NO_CONTENT)
 
 # Single instance view of a course, showing details
@@ -0,0 +1,15 @@
+# picked up by gunicorn from the working directory (/app in the image)
+
+# import the django app in the master, so the embedding model is loaded once and shared
+# copy-on-write by every worker instead of loaded by each one on its first chat message
+preload_app = True
+
+
+def on_starting(server):
+    from services.embedding import warm_up_model
+    warm_up_model(encode=False)
+
+
+def post_fork(server, worker):
+    from services.embedding import warm_up_model
+    warm_up_model()
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-17 16:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0017_remove_quizmodel_is_quick_create'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizmodel',
+            name='page_selection',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+    ]
@@ -33,6 +33,8 @@ class QuizModel(models.Model):
     ],
   )
   quiz_title = models.CharField(max_length=100, unique=False, null=False, blank=False)
+  # pages of the materials the questions are about, e.g. "1-5, 8", "chapter 3" or "spread" (see utils.page_selection)
+  page_selection = models.CharField(max_length=100, blank=True, default="")
   is_generated = models.BooleanField(default=False)
   uploaded_at = models.DateTimeField(auto_now_add=True)
 
@@ -1,16 +1,21 @@
 from rest_framework import serializers
 from .models import QuizModel, QuestionModel, QuestionOption
+from utils.page_selection import normalize_page_selection
 
 class QuizModelSerializer(serializers.ModelSerializer):
   current_number_of_questions = serializers.SerializerMethodField()
   
   class Meta:
     model = QuizModel
-    fields = ['id', 'material_list', 'number_of_questions', 'quiz_title', 'quiz_score', 'time_limit_minutes', 'last_taken', 'current_number_of_questions']
+    fields = ['id', 'material_list', 'number_of_questions', 'quiz_title', 'quiz_score', 'time_limit_minutes', 'last_taken', 'current_number_of_questions', 'page_selection']
     read_only_fields = ['course']
   
   def get_current_number_of_questions(self, obj):
     return obj.current_number_of_questions()
+
+  # only the syntax is checked here, the pages are matched against the pdf on extraction
+  def validate_page_selection(self, value):
+    return normalize_page_selection(value)
   
   # extract the materials from the POST request as user selected in the frontend
   def create(self, validated_data):
@@ -1,34 +1,58 @@
 from celery import shared_task, chain
 import logging
+from django.conf import settings
 from django.core.cache import cache
 from django.shortcuts import get_object_or_404
 
 from .models import QuizModel
-from services.openai_generator import get_completion
+from services.llm import retry_countdown
+from services.openai_generator import get_completion, stream_completion
 from utils.question_generator import create_questions_and_options
 from supabase_client import supabase
 
 logger = logging.getLogger(__name__)
 
 @shared_task(bind=True, max_retries=3, default_retry_delay=5)
-def generate_questions_task(self, pdf_content: str, quizId: int, number_of_questions: int):
+def generate_questions_task(self, pdf_content: str, quizId: int, number_of_questions: int, fresh: bool = False):
     # fetch quiz because celery serializes the arguments
     quiz = get_object_or_404(QuizModel, id=quizId)
 
+    created = 0
     try:
-        # call the function for generating the questions
-        # Use the Celery task directly now
-        questions: list[dict] = get_completion(
-            model="meta-llama/llama-4-scout-17b-16e-instruct",
-            items=number_of_questions,
-            pdf_content=pdf_content
-        )
-    except Exception as e:
-        logger.error(f"Error generating questions for quiz {quizId}: {str(e)}")
-        raise self.retry(exc=e)
+        if settings.LLM_STREAM_QUESTIONS:
+            # save each question as it arrives, the quiz is playable before the completion ends
+            logger.info(f"Streaming questions and options for quiz at generate_questions_task: {quiz}")
+            for question in stream_completion(
+                model=settings.LLM_QUIZ_MODEL,
+                items=number_of_questions,
+                pdf_content=pdf_content,
+                fresh=fresh
+            ):
+                create_questions_and_options(quiz, [question])
+                created += 1
+        else:
+            def save(questions: list[dict]) -> None:
+                logger.info(f"Creating questions and options for quiz at generate_questions_task: {quiz}")
+                create_questions_and_options(quiz, questions)
 
-    logger.info(f"Creating questions and options for quiz at generate_questions_task: {quiz}")
-    create_questions_and_options(quiz, questions)
+            # the response is only cached once its questions are saved
+            get_completion(
+                model=settings.LLM_QUIZ_MODEL,
+                items=number_of_questions,
+                pdf_content=pdf_content,
+                fresh=fresh,
+                accept=save
+            )
+    except Exception as e:
+        logger.error(f"Error generating questions for quiz {quizId} after {created} questions: {str(e)}")
+        if created >= number_of_questions:
+            return
+        # the questions saved before the stream broke stay, only ask again for the rest
+        raise self.retry(
+            exc=e,
+            args=(pdf_content, quizId, number_of_questions - created, fresh),
+            countdown=retry_countdown(e, self.request.retries)
+        )
 
 
 @shared_task(bind=True, max_retries=3, default_retry_delay=10)
@@ -0,0 +1,51 @@
+import json
+from types import SimpleNamespace
+from django.test import TestCase, override_settings
+from unittest.mock import patch
+from user.models import User
+from courses.models import Course
+from quiz.models import QuizModel
+from quiz.tasks import generate_questions_task
+
+QUESTIONS = [
+    {"question": f"Question {i}", "type": "TF", "answer": "true"}
+    for i in range(3)
+]
+
+
+@override_settings(LLM_STREAM_QUESTIONS=True)
+class GenerateQuestionsTaskTest(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='testuser', password='testpass123')
+        course = Course.objects.create(user=user, course_name='Test Course', course_code='TEST101')
+        self.quiz = QuizModel.objects.create(course=course, quiz_title='Test Quiz', number_of_questions=3)
+
+    @patch('quiz.tasks.retry_countdown', return_value=0)
+    @patch('quiz.tasks.stream_completion')
+    def test_broken_stream_keeps_saved_questions_and_retries_the_rest(self, stream_completion, _):
+        def broken(**kwargs):
+            yield QUESTIONS[0]
+            raise ConnectionError("stream reset")
+
+        stream_completion.side_effect = [broken(), iter(QUESTIONS[1:])]
+        generate_questions_task.apply(args=("material", self.quiz.id, 3))
+
+        self.assertEqual(
+            list(self.quiz.questions.order_by('id').values_list('question', flat=True)),
+            [question["question"] for question in QUESTIONS]
+        )
+        self.assertEqual([call.kwargs["items"] for call in stream_completion.call_args_list], [3, 2])
+
+    @override_settings(LLM_STREAM_QUESTIONS=False, CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    @patch('quiz.tasks.retry_countdown', return_value=0)
+    @patch('services.llm.get_groq_client')
+    def test_without_streaming_only_the_task_retries(self, get_groq_client, _):
+        completion = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(QUESTIONS)))])
+        create = get_groq_client.return_value.chat.completions.create
+        create.side_effect = [ConnectionError("reset"), completion]
+        generate_questions_task.apply(args=("material", self.quiz.id, 3))
+
+        # one request per task attempt, the completion is not retried on its own
+        self.assertEqual(create.call_count, 2)
+        self.assertEqual(self.quiz.questions.count(), 3)
+
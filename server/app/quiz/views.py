@@ -14,10 +14,10 @@ from django.db import transaction
 from quiz.serializers import QuizModelSerializer, QuestionModelSerializer
 from .models import QuizModel, QuestionModel
 from courses.models import Course
-from .tasks import generate_questions_task, delete_quiz_cache
+from .tasks import delete_quiz_cache
 from utils.validators import validate_quiz_question
 from utils.helpers import get_content_from_quizId, generate_questions_by_chunks, save_answers_of_best_score
-from utils.utils import get_data_from_request
+from utils.utils import get_data_from_request, is_fresh_request
 from .helpers import create_dummy_course, setup_quiz_and_material_object_for_quick_create
 
 logger = logging.getLogger(__name__)
@@ -90,6 +90,7 @@ class QuickCreateQuizView(APIView):
       number_of_questions = int(get_data_from_request(request, 'number_of_questions', 4))
       time_limit_minutes = int(get_data_from_request(request, 'time_limit_minutes', 10))
       file_name = get_data_from_request(request, 'file_name', 'Quick Create Material')
+      fresh = is_fresh_request(request)
 
       # Validate number of questions
       max_questions = 15
@@ -121,7 +122,7 @@ class QuickCreateQuizView(APIView):
           if not contents:
             raise ValidationError("No content extracted from the material file. Please check the file format or content.")
 
-          generate_questions_by_chunks(contents, quiz, quiz.number_of_questions - quiz.current_number_of_questions())
+          generate_questions_by_chunks(contents, quiz, quiz.number_of_questions - quiz.current_number_of_questions(), fresh)
 
           quiz.is_generated = True
           quiz.save()
@@ -305,7 +306,10 @@ class GenerateQuestionView(generics.GenericAPIView):
     
     try:
       # check if theres any quiz that is generated
-      generated_quiz = QuizModel.objects.filter(is_generated=True).exclude(id=quiz.id).first()
+      # pregenerated questions cover the whole document, quizzes over selected pages get their own
+      generated_quiz = None
+      if not quiz.page_selection:
+        generated_quiz = QuizModel.objects.filter(is_generated=True).exclude(id=quiz.id).first()
       if generated_quiz:
         # fetch questions from the generated_quiz and attach to the quiz object
         source_questions = generated_quiz.questions.all()
@@ -315,7 +319,8 @@ class GenerateQuestionView(generics.GenericAPIView):
         if quiz.number_of_questions > actual_count:
           # so if the number of questions is greater than the number of pregenerated questions,
           # just do another set of tasks to generate the questions for the user and let them wait
-          generate_questions_by_chunks(contents, generated_quiz, requested_count)
+          # the pool already holds the cached questions of these chunks, so ask for new ones
+          generate_questions_by_chunks(contents, generated_quiz, requested_count, fresh=True)
         else:
           # attach only the number of questions specified in the quiz object
           # basically, steal the questions from the generated_quiz
@@ -325,8 +330,9 @@ class GenerateQuestionView(generics.GenericAPIView):
           # decrease the number of questions count in the generated_quiz
           generated_quiz.number_of_questions = max(generated_quiz.number_of_questions - requested_count, 0)
           
-          # generate the amount of questions we just stole
-          generate_questions_by_chunks(contents, generated_quiz, requested_count)
+          # generate the amount of questions we just stole, fresh so the pool does not get the
+          # cached copies of the questions that were just handed out
+          generate_questions_by_chunks(contents, generated_quiz, requested_count, fresh=True)
 
         quiz.save()
         generated_quiz.save()
@@ -336,7 +342,7 @@ class GenerateQuestionView(generics.GenericAPIView):
         # generate the questions
         # load the quiz from request.data and attach the info to the quiz object
         try:
-          generate_questions_task.delay(quiz.id, quiz.number_of_questions)
+          generate_questions_by_chunks(contents, quiz, quiz.number_of_questions, is_fresh_request(request))
         except Exception as e:
           return Response({"error": "Unexpected error", "details": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -0,0 +1,64 @@
+"""
+Okapi BM25 over a small in-memory corpus, the lexical side of chat retrieval.
+
+Course corpora are a few dozen chunks, so the inverted index is rebuilt from the stored chunk
+texts whenever a course's materials change instead of being maintained incrementally.
+"""
+import math
+import re
+from collections import Counter, defaultdict
+
+# words, numbers and acronyms; "TCP/IP" gives "tcp" and "ip", "802.11" gives "802" and "11"
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: str) -> list[str]:
+  return TOKEN_PATTERN.findall(text.casefold())
+
+
+class BM25Index:
+  def __init__(self, documents: list[str], k1: float = 1.5, b: float = 0.75):
+    self.documents = documents
+    self.k1 = k1
+    self.b = b
+    # term -> [(document position, term frequency)]
+    self.postings: dict[str, list[tuple[int, int]]] = defaultdict(list)
+    self.lengths = []
+    for position, document in enumerate(documents):
+      terms = tokenize(document)
+      self.lengths.append(len(terms))
+      for term, frequency in Counter(terms).items():
+        self.postings[term].append((position, frequency))
+    self.average_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0
+
+  def _idf(self, term: str) -> float:
+    matches = len(self.postings.get(term, ()))
+    return math.log(1 + (len(self.documents) - matches + 0.5) / (matches + 0.5))
+
+  def search(self, query: str, top_k: int) -> list[tuple[int, float]]:
+    """
+    Returns (document position, score) of the top_k documents sharing a term with the query, best first.
+    """
+    scores = defaultdict(float)
+    for term in set(tokenize(query)):
+      idf = self._idf(term)
+      for position, frequency in self.postings.get(term, ()):
+        norm = self.k1 * (1 - self.b + self.b * self.lengths[position] / self.average_length)
+        scores[position] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = 60) -> list[str]:
+  """
+  Merges ranked lists of the same items, each item scoring sum(1 / (k + rank)) over the lists.
+  """
+  scores = defaultdict(float)
+  for ranking in rankings:
+    for rank, item in enumerate(ranking, start=1):
+      scores[item] += 1 / (k + rank)
+  # ties keep the order of the first ranking the items appear in
+  first_seen = {}
+  for ranking in rankings:
+    for item in ranking:
+      first_seen.setdefault(item, len(first_seen))
+  return sorted(scores, key=lambda item: (-scores[item], first_seen[item]))
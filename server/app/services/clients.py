@@ -1,29 +1,99 @@
+"""
+Groq clients, one pooled instance of each per process.
+
+Connections are kept alive between requests so quiz generation and chat skip the TLS handshake
+after the first call. Clients are built on first use and dropped in forked children (gunicorn
+and celery prefork workers), a connection pool copied across fork() would share its sockets
+with the parent.
+"""
 from dotenv import load_dotenv
 import os
 import logging
+import threading
 
-from openai import OpenAI
-from groq import Groq
+import httpx
+from django.conf import settings
+from openai import DefaultHttpxClient, OpenAI
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-try:
-  groq_client = OpenAI(
-    base_url="https://api.groq.com/openai/v1",
-    api_key=os.getenv("GROK_API_KEY",),
-  )
-except Exception as e:
-  logger.error(f"Error initializing Groq client: {e}")
-  groq_client = None
-  
-
-try:
-  groq_v2 = OpenAI(
-    base_url="https://api.groq.com/openai/v1",
-    api_key=os.getenv("GROQ_API_KEY",),
+GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+
+_clients: dict[str, OpenAI] = {}
+_lock = threading.Lock()
+
+
+def _reset_clients() -> None:
+  # the parent's pools stay open for the parent, the child only forgets them
+  global _lock
+  _clients.clear()
+  _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_clients)
+
+
+def _http2_available() -> bool:
+  try:
+    import h2  # noqa: F401
+  except ImportError:
+    return False
+  return True
+
+
+def _timeout() -> httpx.Timeout:
+  return httpx.Timeout(settings.LLM_HTTP_READ_TIMEOUT, connect=settings.LLM_HTTP_CONNECT_TIMEOUT)
+
+
+def build_http_client() -> httpx.Client:
+  """
+  Returns an http client with the pool limits and timeouts of the LLM_HTTP_* settings.
+  """
+  http2 = settings.LLM_HTTP2
+  if http2 and not _http2_available():
+    logger.warning("LLM_HTTP2 is set but h2 is not installed (install the http2 extra), using HTTP/1.1")
+    http2 = False
+  return DefaultHttpxClient(
+    http2=http2,
+    limits=httpx.Limits(
+      max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+      max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+      keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY,
+    ),
+    timeout=_timeout(),
   )
-except Exception as e:
-  logger.error(f"Error initializing OpenAI client: {e}")
\ No newline at end of file
+
+
+def _get_client(name: str, api_key_env: str) -> OpenAI:
+  client = _clients.get(name)
+  if client is None:
+    with _lock:
+      client = _clients.get(name)
+      if client is None:
+        client = OpenAI(
+          base_url=GROQ_BASE_URL,
+          api_key=os.getenv(api_key_env),
+          # passed to the client as well, it sets the timeout of every request it sends
+          timeout=_timeout(),
+          http_client=build_http_client(),
+        )
+        _clients[name] = client
+        logger.info(f"Created {name} client for process {os.getpid()}")
+  return client
+
+
+def get_groq_client() -> OpenAI:
+  """
+  Client for quiz generation.
+  """
+  return _get_client("groq_client", "GROK_API_KEY")
+
+
+def get_groq_v2() -> OpenAI:
+  """
+  Client for the course chat.
+  """
+  return _get_client("groq_v2", "GROQ_API_KEY")
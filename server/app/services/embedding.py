@@ -1,91 +1,146 @@
 from sentence_transformers import SentenceTransformer
-from pinecone import Pinecone, ServerlessSpec
-import os
 from dotenv import load_dotenv
 import logging
+import os
 from celery import shared_task
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from services.embedding_cache import get_cached_embeddings, set_cached_embeddings
+from services.query_cache import (
+  get_cached_results, get_query_embedding, get_results_version, invalidate_course_results, set_cached_results,
+)
+from services.vector_store import get_vector_store
 
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
 # TODO. refactor global variables to a better pattern
 _model = None
-_pc = None
-_index = None
+
+def get_embedding_model_id() -> str:
+  """
+  Identifies the weights producing the embeddings, the key of every stored embedding. The
+  quantized ONNX model is close to the torch one but not identical, so they are kept apart.
+  """
+  if settings.EMBEDDING_BACKEND == "onnx":
+    return f"{EMBEDDING_MODEL_NAME}:onnx:{settings.EMBEDDING_ONNX_FILE}"
+  return EMBEDDING_MODEL_NAME
+
 
 def get_model():
   global _model
   if _model is None:
-      _model = SentenceTransformer("all-MiniLM-L6-v2")
+    backend = settings.EMBEDDING_BACKEND
+    if backend == "torch":
+      _model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    elif backend == "onnx":
+      # int8 quantized export shipped in the model repo, same 384 dimensions. needs the onnx extra
+      _model = SentenceTransformer(
+        EMBEDDING_MODEL_NAME, backend="onnx", model_kwargs={"file_name": settings.EMBEDDING_ONNX_FILE}
+      )
+    else:
+      raise ImproperlyConfigured(f"Unknown EMBEDDING_BACKEND {backend!r}, use 'torch' or 'onnx'.")
   return _model
 
 
-def get_pinecone():
-  global _pc
-  if _pc is None:
-    _pc = Pinecone(
-      api_key=os.getenv("PINECONE_API_KEY"),
-    )
-  return _pc
-
-
-def get_index():
-  global _index
-  if _index is None:
-    # Create or connect to an index (if it doesn't exist, create it)
-    pc = get_pinecone()
-    index_name = "pamahres-shared-index"
-    if index_name not in pc.list_indexes().names():
-      pc.create_index(
-        name=index_name,
-        dimension=384,  # MiniLM embedding size
-        metric="cosine",
-        spec=ServerlessSpec(cloud="aws", region="us-east-1")
-      )
+def warm_up_model(*, encode: bool = True) -> None:
+  """
+  Loads the model ahead of the first request when EMBEDDING_PRELOAD is on.
+
+  Called without encode in a parent process before it forks (gunicorn master, celery main
+  process), so the workers share the weights copy-on-write. The forward pass that sets up
+  torch's thread pool runs in each worker after the fork, a pool created before fork()
+  does not survive into the children.
+  """
+  if not settings.EMBEDDING_PRELOAD:
+    return
+  model = get_model()
+  if encode:
+    model.encode(["warm up"], convert_to_numpy=True)
+  logger.info(f"Embedding model {get_embedding_model_id()} loaded in process {os.getpid()}")
 
-    _index = pc.Index(index_name)
-  return _index
 
+def encode_chunks(chunks: list[str]) -> list[list[float]]:
+  """
+  Embeds the chunks, only running the model on the ones missing from the embedding cache.
+  """
+  embeddings = get_cached_embeddings(get_embedding_model_id(), chunks)
+  missing = [chunk for chunk in dict.fromkeys(chunks) if chunk not in embeddings]
+  if missing:
+    encoded = dict(zip(missing, get_model().encode(missing, convert_to_numpy=True).tolist()))
+    set_cached_embeddings(get_embedding_model_id(), encoded)
+    embeddings.update(encoded)
+  return [embeddings[chunk] for chunk in chunks]
 
-# Function to embed and upsert chunks into Pinecone
-def embed_and_upsert_chunks(*, chunks: list[str], course_id: str):
-  model = get_model()
-  index = get_index()
-  embeddings = model.encode(chunks, convert_to_numpy=True).tolist()  # Convert to list for Pinecone
-  vectors = [
-    (f"course-{course_id}-chunk-{i}", embeddings[i], {"course_id": course_id, "text": chunks[i]})
-    for i in range(len(chunks))
-  ]
-  index.upsert(vectors)
-  print(f"Upserted {len(chunks)} chunks for course {course_id}")
+
+def material_vector_prefix(course_id: str, material_id: int | str) -> str:
+  # the trailing dash keeps material 1 from matching the vectors of material 12
+  return f"course-{course_id}-material-{material_id}-"
+
+
+def material_vector_ids(course_id: str, material_id: int | str, count: int) -> list[str]:
+  prefix = material_vector_prefix(course_id, material_id)
+  return [f"{prefix}chunk-{i}" for i in range(count)]
+
+
+# Function to embed and upsert chunks into the vector store (see VECTOR_STORE_BACKEND)
+# precomputed embeddings (e.g. from the material registry) skip the model entirely
+def embed_and_upsert_chunks(*, chunks: list[str], course_id: str, material_id: int | str, embeddings: list[list[float]] | None = None) -> list[list[float]]:
+  store = get_vector_store()
+  if embeddings is None:
+    embeddings = encode_chunks(chunks)
+  ids = material_vector_ids(course_id, material_id, len(chunks))
+  store.upsert(course_id, ids, embeddings, chunks)
+  invalidate_course_results(course_id)
+  logger.info(f"Upserted {len(chunks)} chunks of material {material_id} for course {course_id}")
+  return embeddings
 
 
 def query_course(question: str, course_id: str, top_k=3):
-  model = get_model()
-  index = get_index()
-
-  query_embedding = model.encode([question], convert_to_numpy=True).tolist()[0]
-  
-  results = index.query(
-    vector=query_embedding,
-    top_k=top_k,
-    include_metadata=True,
-    filter={"course_id": course_id} # filter by course_id
+  # repeated questions skip the vector store, and the model too when the question was seen recently
+  version = None
+  if settings.QUERY_RESULT_CACHE_TIMEOUT > 0:
+    version = get_results_version(course_id)
+    cached = get_cached_results(course_id, version, question, top_k)
+    if cached is not None:
+      return cached
+
+  store = get_vector_store()
+  query_embedding = get_query_embedding(
+    question, lambda text: get_model().encode([text], convert_to_numpy=True).tolist()[0]
   )
-  
-  # Extract the chunk texts from metadata
-  relevant_chunks = [match['metadata']['text'] for match in results['matches']]
+  relevant_chunks = store.query(course_id, query_embedding, top_k)
+  if version is not None:
+    set_cached_results(course_id, version, question, top_k, relevant_chunks)
   return relevant_chunks
 
 
 @shared_task(bind=True, max_retries=5, default_retry_delay=10)
 def delete_course_chunks(self, course_id: str):
-  index = get_index()
+  store = get_vector_store()
   try:
     # Delete all vectors associated with the course_id
-    index.delete(filter={"course_id": course_id})
+    store.delete_course(course_id)
+    invalidate_course_results(course_id)
   except Exception as e:
     logger.error(f"Error deleting course chunks for course {course_id}: {str(e)}")
     raise self.retry(exc=e)
-  return True
\ No newline at end of file
+  return True
+
+
+@shared_task(bind=True, max_retries=5, default_retry_delay=10)
+def delete_material_chunks(self, course_id: str, material_id: int):
+  store = get_vector_store()
+  try:
+    # only the material's own vectors, found by their id prefix
+    deleted = store.delete_prefix(course_id, material_vector_prefix(course_id, material_id))
+    invalidate_course_results(course_id)
+  except Exception as e:
+    logger.error(f"Error deleting chunks of material {material_id} for course {course_id}: {str(e)}")
+    raise self.retry(exc=e)
+  logger.info(f"Deleted {deleted} chunks of material {material_id} for course {course_id}")
+  return True
@@ -0,0 +1,48 @@
+"""
+Cache of chunk embeddings keyed by the embedding model and the sha256 of the chunk text.
+
+Embeddings are stored in the django cache (redis) as float16 bytes, 768 bytes for a MiniLM
+vector instead of a pickled list of floats, so re-uploads and shared materials only encode
+the chunks no upload has seen before.
+"""
+import hashlib
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from utils.metrics import incr, register_counter
+
+HITS = register_counter("embedding_cache_hits_total", "Chunk embeddings read from the embedding cache.")
+MISSES = register_counter("embedding_cache_misses_total", "Chunk embeddings not found in the embedding cache.")
+
+
+def _embedding_key(model_name: str, text: str) -> str:
+  return f"embedding:{model_name}:{hashlib.sha256(text.encode()).hexdigest()}"
+
+
+def get_cached_embeddings(model_name: str, texts: list[str]) -> dict[str, list[float]]:
+  """
+  Returns the cached embedding of every text that has one, as {text: embedding}.
+  """
+  keys = {_embedding_key(model_name, text): text for text in texts}
+  if not keys:
+    return {}
+  found = {
+    keys[key]: np.frombuffer(blob, dtype=np.float16).astype(np.float32).tolist()
+    for key, blob in cache.get_many(list(keys)).items()
+  }
+  if found:
+    incr(HITS, len(found))
+  if len(keys) > len(found):
+    incr(MISSES, len(keys) - len(found))
+  return found
+
+
+def set_cached_embeddings(model_name: str, embeddings: dict[str, list[float]]) -> None:
+  cache.set_many(
+    {
+      _embedding_key(model_name, text): np.asarray(embedding, dtype=np.float16).tobytes()
+      for text, embedding in embeddings.items()
+    },
+    timeout=settings.EMBEDDING_CACHE_TIMEOUT,
+  )
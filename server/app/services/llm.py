@@ -1,18 +1,25 @@
 from celery import shared_task
+from django.conf import settings
 from django.core.exceptions import ValidationError
 import logging
-from .clients import groq_client
+from typing import Callable, Iterator
+from openai import RateLimitError
+from .clients import get_groq_client
 
+from services.llm_cache import get_cached_response, set_cached_response
+from services.rate_limiter import llm_rate_limit
+from utils.json_stream import JsonArrayStreamParser
 from utils.utils import parse_llm_response
+from utils.tokens import count_tokens
 
 logger = logging.getLogger(__name__)
 
-@shared_task(bind=True, max_retries=3)
-def get_llm_completion(
-  self, 
-  *, model: str, material: str, items: int, 
-):
-  prompt = [
+# bump whenever the prompt below changes, cached responses of the previous prompt are then ignored
+PROMPT_VERSION = "1"
+
+
+def build_quiz_prompt(material: str, items: int) -> list[dict]:
+  return [
     {
       "role": "system",
       "content": "You are a helpful tutor that creates quizzes from key points from educational materials. You only respond in JSON format exactly as the user describes."
@@ -49,14 +56,125 @@ def get_llm_completion(
       }
     ]
 
+
+def estimate_request_tokens(model: str, prompt: list[dict], items: int) -> int:
+  """
+  Returns the prompt tokens plus the completion tokens expected for the questions.
+  """
+  # material is chunked to the model's token budget, so this should stay flat across requests
   try:
-    completion = groq_client.chat.completions.create(
+    prompt_tokens = sum(count_tokens(message["content"]) for message in prompt)
+    logger.info(f"Sending {prompt_tokens} prompt tokens to {model} for {items} questions")
+  except Exception as e:
+    logger.warning(f"Could not count prompt tokens: {str(e)}")
+    prompt_tokens = sum(len(message["content"]) for message in prompt) // 4
+  return prompt_tokens + items * settings.LLM_COMPLETION_TOKENS_PER_QUESTION
+
+
+def retry_countdown(e: Exception, retries: int) -> float:
+  """
+  Returns how long a failed completion waits before its retry.
+  """
+  if isinstance(e, RateLimitError):
+    # another client used up the quota, come back when groq says it has capacity again
+    retry_after = e.response.headers.get("retry-after")
+    countdown = float(retry_after) if retry_after else 2 ** retries * 10
+    logger.warning(f"Rate limited by groq, retrying in {countdown}s")
+    return countdown
+  return 2 ** retries
+
+
+def stream_quiz_questions(*, model: str, material: str, items: int, fresh: bool = False) -> Iterator[dict]:
+  """
+  Yields the questions generated from the material one at a time, each as soon as the model
+  finishes writing it, so they can be saved while the rest of the completion is still streaming.
+
+  Cached responses are yielded at once. Errors are raised to the caller, which knows how many
+  questions it already got. The response is cached once the caller has taken every question, and
+  only if the model finished on its own with all of them.
+  """
+  if not fresh:
+    cached = get_cached_response(model, PROMPT_VERSION, material, items)
+    if cached is not None:
+      logger.info(f"Using cached {model} response for {items} questions")
+      yield from cached
+      return
+
+  prompt = build_quiz_prompt(material, items)
+  parser = JsonArrayStreamParser()
+  questions: list[dict] = []
+  raw: list[str] = []
+  finish_reason = None
+  with llm_rate_limit(model, estimate_request_tokens(model, prompt, items)):
+    stream = get_groq_client().chat.completions.create(
+      model=model,
+      messages=prompt,
+      stream=True
+    )
+    for chunk in stream:
+      if not chunk.choices:
+        continue
+      finish_reason = getattr(chunk.choices[0], "finish_reason", None) or finish_reason
+      delta = chunk.choices[0].delta.content
+      if not delta:
+        continue
+      raw.append(delta)
+      for question in parser.feed(delta):
+        questions.append(question)
+        yield question
+
+  if not questions:
+    # not an array of objects after all, let the full parser have a go at the whole text
+    try:
+      questions = parse_llm_response("".join(raw))
+    except Exception as e:
+      logger.error(f"Raw response: {''.join(raw)}")
+      raise ValidationError(f"Error parsing LLM response: {str(e)}")
+    yield from questions
+
+  # a response cut off at the token limit parses to fewer questions, it must not stick for a week
+  if finish_reason == "stop":
+    cache_complete_response(model, material, items, questions)
+
+
+def cache_complete_response(model: str, material: str, items: int, questions: list[dict]) -> None:
+  """
+  Caches the questions of a response, unless it has fewer (or more) than were asked for, as a
+  response parsed from truncated or broken output does.
+  """
+  if len(questions) != items:
+    logger.info(f"Not caching a {model} response with {len(questions)} of {items} questions")
+    return
+  set_cached_response(model, PROMPT_VERSION, material, items, questions)
+
+
+def complete_quiz_questions(
+  *, model: str, material: str, items: int, fresh: bool = False, accept: Callable[[list[dict]], None] | None = None,
+) -> list[dict]:
+  """
+  Generates questions from the material in one request and returns them parsed. Errors are
+  raised to the caller, which owns the retries.
+
+  accept is called with the questions before they are cached, so a response the caller rejects
+  (it raises) is not cached and a retry asks the model again.
+  """
+  # identical requests are answered from the response cache, fresh asks the llm for new questions
+  if not fresh:
+    cached = get_cached_response(model, PROMPT_VERSION, material, items)
+    if cached is not None:
+      logger.info(f"Using cached {model} response for {items} questions")
+      if accept is not None:
+        accept(cached)
+      return cached
+
+  prompt = build_quiz_prompt(material, items)
+
+  # waits for the model's shared rate limit instead of sending a request groq would reject
+  with llm_rate_limit(model, estimate_request_tokens(model, prompt, items)):
+    completion = get_groq_client().chat.completions.create(
       model=model,
       messages=prompt
     )
-  except Exception as e:
-    logger.error(f"Error during LLM completion: {str(e)}")
-    raise self.retry(exc=e, countdown=2 ** self.request.retries)
 
   # parse to json
   try:
@@ -64,5 +182,22 @@ def get_llm_completion(
   except Exception as e:
     logger.error(f"Raw response: {completion.choices[0].message.content}")
     raise ValidationError(f"Error parsing LLM response: {str(e)}")
-    
-  return response
\ No newline at end of file
+
+  if accept is not None:
+    accept(response)
+  cache_complete_response(model, material, items, response)
+  return response
+
+
+@shared_task(bind=True, max_retries=3)
+def get_llm_completion(
+  self, 
+  *, model: str, material: str, items: int, fresh: bool = False,
+):
+  try:
+    return complete_quiz_questions(model=model, material=material, items=items, fresh=fresh)
+  except ValidationError:
+    raise
+  except Exception as e:
+    logger.error(f"Error during LLM completion: {str(e)}")
+    raise self.retry(exc=e, countdown=retry_countdown(e, self.request.retries))
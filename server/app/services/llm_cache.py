@@ -0,0 +1,44 @@
+"""
+Cache of parsed quiz generation responses.
+
+Entries are keyed by the model, the prompt template version, the sha256 of the material and the
+number of items, so the same chunk asked for the same number of questions (pool refills, repeat
+quick-creates of a file) is answered from redis without calling the llm. Callers that want new
+questions pass fresh=True, which skips the lookup and replaces the entry.
+"""
+import hashlib
+import json
+import logging
+from django.conf import settings
+from django.core.cache import cache
+
+from utils.metrics import incr, register_counter
+
+logger = logging.getLogger(__name__)
+
+HITS = register_counter("llm_response_cache_hits_total", "Quiz generations answered from the llm response cache.")
+MISSES = register_counter("llm_response_cache_misses_total", "Quiz generations sent to the llm.")
+
+
+def _response_key(model: str, prompt_version: str, material: str, items: int) -> str:
+  digest = hashlib.sha256(material.encode()).hexdigest()
+  return f"llm_response:{model}:{prompt_version}:{digest}:{items}"
+
+
+def get_cached_response(model: str, prompt_version: str, material: str, items: int) -> list[dict] | None:
+  if settings.LLM_RESPONSE_CACHE_TIMEOUT <= 0:
+    return None
+  response = cache.get(_response_key(model, prompt_version, material, items))
+  incr(HITS if response is not None else MISSES)
+  return response
+
+
+def set_cached_response(model: str, prompt_version: str, material: str, items: int, response: list[dict]) -> None:
+  if settings.LLM_RESPONSE_CACHE_TIMEOUT <= 0:
+    return
+  # a runaway response is not worth the memory, redis evicts the rest by its maxmemory policy
+  size = len(json.dumps(response))
+  if size > settings.LLM_RESPONSE_CACHE_MAX_BYTES:
+    logger.info(f"Not caching a {size} byte response of {model}")
+    return
+  cache.set(_response_key(model, prompt_version, material, items), response, timeout=settings.LLM_RESPONSE_CACHE_TIMEOUT)
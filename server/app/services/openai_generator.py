@@ -6,15 +6,16 @@ from django.utils import timezone
 from rest_framework.exceptions import ValidationError
 import logging
 import time
+from typing import Iterator
 
 from courses.services.chat_service import add_to_chat_history
 
-from .clients import groq_client, groq_v2
-from .llm import get_llm_completion
+from .clients import get_groq_v2
+from .llm import complete_quiz_questions, stream_quiz_questions
 
 logger = logging.getLogger(__name__)
 
-def get_completion(model="meta-llama/llama-4-scout-17b-16e-instruct", *, items: int=5, pdf_content="", max_retries: int=3) -> list:
+def get_completion(model="meta-llama/llama-4-scout-17b-16e-instruct", *, items: int=5, pdf_content="", max_retries: int=3, fresh: bool=False, accept=None) -> list:
   """
   This function generates a list of quiz questions from a given material.
   It takes in the number of items to generate and the material to generate the questions from.
@@ -24,6 +25,8 @@ def get_completion(model="meta-llama/llama-4-scout-17b-16e-instruct", *, items:
     items (int): The number of quiz questions to generate.
     pdf_content (str): The content of the PDF material to generate questions from. This expects the content to be <= 3000 characters as preprocessed by 
     max_retries (int): The maximum number of retries to get a valid response.
+    fresh (bool): Skip the response cache and ask the model for new questions.
+    accept (callable): Called with the questions before they are cached, a response it rejects is not cached.
   """
 
   material = pdf_content.strip()
@@ -31,15 +34,30 @@ def get_completion(model="meta-llama/llama-4-scout-17b-16e-instruct", *, items:
   if not material:
     raise ValidationError("Material content is empty. Please provide valid content to generate quiz questions.")
   
-  response = get_llm_completion.delay(
+  # no retries here, generate_questions_task retries with the backoff groq asks for
+  response = complete_quiz_questions(
     model=model,
     material=material,
-    items=items
+    items=items,
+    fresh=fresh,
+    accept=accept
   )
 
   return response
 
 
+def stream_completion(model="meta-llama/llama-4-scout-17b-16e-instruct", *, items: int=5, pdf_content="", fresh: bool=False) -> Iterator[dict]:
+  """
+  Same as get_completion, but yields each question as soon as the model finishes writing it.
+  """
+  material = pdf_content.strip()
+
+  if not material:
+    raise ValidationError("Material content is empty. Please provide valid content to generate quiz questions.")
+
+  return stream_quiz_questions(model=model, material=material, items=items, fresh=fresh)
+
+
 # function for handling the conversation with the LLM
 def get_conversational_completion(
     course, 
@@ -56,7 +74,7 @@ def get_conversational_completion(
   note that previous_messages is not the full conversation history, but only the last few messages
   """
 
-  completion = groq_v2.chat.completions.create(
+  completion = get_groq_v2().chat.completions.create(
     model=model,
     messages = [
       {
@@ -0,0 +1,120 @@
+"""
+Caches on the chat path of query_course.
+
+Query embeddings are kept in a bounded, expiring LRU inside each process, keyed by the
+normalized question, so a repeated question skips the model forward pass. The retrieved chunks
+of a (course, question) pair are kept in the django cache (redis) under the course's vector
+version, which every upsert and delete of the course's vectors replaces, so cached results
+never outlive a change to the course's materials.
+"""
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+
+from utils.metrics import incr, register_counter
+
+EMBEDDING_HITS = register_counter("query_embedding_cache_hits_total", "Chat questions whose embedding was found in the process cache.")
+EMBEDDING_MISSES = register_counter("query_embedding_cache_misses_total", "Chat questions encoded by the embedding model.")
+RESULT_HITS = register_counter("query_result_cache_hits_total", "Chat questions answered from cached retrieval results.")
+
+
+def normalize_query(question: str) -> str:
+  return " ".join(question.casefold().split())
+
+
+class ExpiringLRUCache:
+  def __init__(self, max_entries: int, ttl: float):
+    self.max_entries = max_entries
+    self.ttl = ttl
+    self._entries: OrderedDict[str, tuple[float, object]] = OrderedDict()
+    self._lock = threading.Lock()
+
+  def get(self, key: str):
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is None:
+        return None
+      if entry[0] < time.monotonic():
+        del self._entries[key]
+        return None
+      self._entries.move_to_end(key)
+      return entry[1]
+
+  def set(self, key: str, value) -> None:
+    if self.max_entries <= 0:
+      return
+    with self._lock:
+      self._entries[key] = (time.monotonic() + self.ttl, value)
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.max_entries:
+        self._entries.popitem(last=False)
+
+  def clear(self) -> None:
+    with self._lock:
+      self._entries.clear()
+
+
+_query_embeddings = None
+
+def get_query_embedding_cache() -> ExpiringLRUCache:
+  global _query_embeddings
+  if _query_embeddings is None:
+    _query_embeddings = ExpiringLRUCache(settings.QUERY_EMBEDDING_CACHE_SIZE, settings.QUERY_EMBEDDING_CACHE_TTL)
+  return _query_embeddings
+
+
+def get_query_embedding(question: str, encode) -> list[float]:
+  """
+  Returns the cached embedding of the question, calling encode(question) on a miss.
+  """
+  embeddings = get_query_embedding_cache()
+  key = normalize_query(question)
+  embedding = embeddings.get(key)
+  if embedding is not None:
+    incr(EMBEDDING_HITS)
+    return embedding
+  incr(EMBEDDING_MISSES)
+  embedding = encode(question)
+  embeddings.set(key, embedding)
+  return embedding
+
+
+def _version_key(course_id: str) -> str:
+  return f"course_vectors_version:{course_id}"
+
+
+def _results_key(course_id: str, version: str, question: str, top_k: int) -> str:
+  digest = hashlib.sha256(normalize_query(question).encode()).hexdigest()
+  return f"course_query:{course_id}:{version}:{top_k}:{digest}"
+
+
+def invalidate_course_results(course_id: str) -> None:
+  # a new version orphans every cached result of the course, they expire on their own
+  cache.set(_version_key(course_id), uuid.uuid4().hex, timeout=None)
+
+
+def get_results_version(course_id: str) -> str:
+  """
+  Returns the current vector version of the course. Read it before querying the vector store,
+  results retrieved before an invalidation then land under the old version.
+  """
+  version = cache.get(_version_key(course_id))
+  if version is None:
+    cache.add(_version_key(course_id), uuid.uuid4().hex, timeout=None)
+    version = cache.get(_version_key(course_id))
+  return version
+
+
+def get_cached_results(course_id: str, version: str, question: str, top_k: int) -> list[str] | None:
+  results = cache.get(_results_key(course_id, version, question, top_k))
+  if results is not None:
+    incr(RESULT_HITS)
+  return results
+
+
+def set_cached_results(course_id: str, version: str, question: str, top_k: int, results: list[str]) -> None:
+  cache.set(_results_key(course_id, version, question, top_k), results, timeout=settings.QUERY_RESULT_CACHE_TIMEOUT)
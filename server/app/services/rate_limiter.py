@@ -0,0 +1,187 @@
+"""
+Rate limiting of the quiz generation requests sent to Groq, shared by every celery worker.
+
+Each model gets a token bucket for its requests per minute and one for its tokens per minute.
+A bucket holds up to a minute's budget and refills continuously at the per minute rate, so
+there is no window edge to burst across. Both are updated together by one atomic Lua script on
+redis (a locked read and write on other cache backends). Requests in flight are capped too.
+Tasks wait until the buckets have refilled enough or a slot frees up instead of getting a 429
+back, and only give up (RateLimitTimeout) after LLM_RATE_LIMIT_MAX_WAIT seconds.
+"""
+import logging
+import random
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import cache, caches
+
+from utils.metrics import incr, register_counter
+
+logger = logging.getLogger(__name__)
+
+# an empty bucket is full again after this long
+REFILL_SECONDS = 60
+# in flight counts expire on their own, so a worker killed mid request does not hold its slot forever
+SLOT_TIMEOUT = 60 * 5
+# how long one worker may hold the bucket lock on caches without lua
+LOCK_TIMEOUT = 5
+
+WAITS = register_counter("llm_rate_limit_waits_total", "LLM requests that waited for rate limit capacity.")
+WAIT_MS = register_counter("llm_rate_limit_wait_ms_total", "Milliseconds LLM requests spent waiting for rate limit capacity.")
+TIMEOUTS = register_counter("llm_rate_limit_timeouts_total", "LLM requests that gave up waiting for rate limit capacity.")
+
+
+class RateLimitTimeout(Exception):
+  pass
+
+
+def get_rate_limits(model: str) -> dict:
+  return {**settings.LLM_DEFAULT_RATE_LIMITS, **settings.LLM_RATE_LIMITS.get(model, {})}
+
+
+# KEYS[1] bucket hash. ARGV requests per minute, tokens per minute, tokens wanted, refill seconds.
+# returns the seconds until both buckets hold enough, after taking from them if that is 0
+TAKE_SCRIPT = """
+-- writes after TIME need effects replication, the default from redis 5 on
+redis.replicate_commands()
+local rpm, tpm, wanted, refill = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'requests', 'tokens', 'updated')
+local elapsed = math.max(0, now - (tonumber(state[3]) or now))
+local requests = math.min(rpm, (tonumber(state[1]) or rpm) + elapsed * rpm / refill)
+local tokens = math.min(tpm, (tonumber(state[2]) or tpm) + elapsed * tpm / refill)
+local wait = math.max(0, (1 - requests) * refill / rpm, (wanted - tokens) * refill / tpm)
+if wait == 0 then
+  requests = requests - 1
+  tokens = tokens - wanted
+end
+redis.call('HSET', KEYS[1], 'requests', tostring(requests), 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], refill * 2)
+return tostring(wait)
+"""
+
+
+def _take(state: dict | None, now: float, tokens: int, limits: dict) -> tuple[dict, float]:
+  """
+  Refills the buckets in state for the time since their last update and takes one request and
+  the tokens from them if both hold enough. Returns the new state and the seconds until they
+  would have, 0 when they were taken. Same steps as TAKE_SCRIPT.
+  """
+  rpm, tpm = limits["requests_per_minute"], limits["tokens_per_minute"]
+  state = state or {"requests": rpm, "tokens": tpm, "updated": now}
+  elapsed = max(0, now - state["updated"])
+  requests = min(rpm, state["requests"] + elapsed * rpm / REFILL_SECONDS)
+  available = min(tpm, state["tokens"] + elapsed * tpm / REFILL_SECONDS)
+  wait = max(0, (1 - requests) * REFILL_SECONDS / rpm, (tokens - available) * REFILL_SECONDS / tpm)
+  if wait == 0:
+    requests -= 1
+    available -= tokens
+  return {"requests": requests, "tokens": available, "updated": now}, wait
+
+
+def _redis_connection():
+  try:
+    from django_redis import get_redis_connection
+    from django_redis.cache import RedisCache
+  except ImportError:
+    return None
+  if not isinstance(caches["default"], RedisCache):
+    return None
+  return get_redis_connection("default")
+
+
+def _take_from_buckets(model: str, tokens: int, limits: dict) -> float:
+  """
+  Returns 0 if the request was taken from the model's buckets, otherwise the seconds to wait.
+  """
+  key = f"llm_rate:{model}:bucket"
+  connection = _redis_connection()
+  if connection is not None:
+    script = connection.register_script(TAKE_SCRIPT)
+    wait = script(
+      keys=[cache.make_key(key)],
+      args=[limits["requests_per_minute"], limits["tokens_per_minute"], tokens, REFILL_SECONDS],
+    )
+    return float(wait)
+
+  lock_key = f"{key}:lock"
+  if not cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+    # another worker is updating the buckets, this is only held for a read and a write
+    return 0.05
+  try:
+    state, wait = _take(cache.get(key), time.time(), tokens, limits)
+    cache.set(key, state, timeout=REFILL_SECONDS * 2)
+  finally:
+    cache.delete(lock_key)
+  return wait
+
+
+def _take_slot(key: str, limit: int) -> bool:
+  cache.add(key, 0, timeout=SLOT_TIMEOUT)
+  try:
+    used = cache.incr(key)
+  except ValueError:
+    # expired between the add and the increment
+    cache.add(key, 0, timeout=SLOT_TIMEOUT)
+    used = cache.incr(key)
+  if used > limit:
+    _release_slot(key)
+    return False
+  # the timeout is only set when the key is created, under steady load it would otherwise run out
+  # while slots are held and the releases would push the count below the real one
+  cache.touch(key, SLOT_TIMEOUT)
+  return True
+
+
+def _release_slot(key: str) -> None:
+  try:
+    cache.decr(key)
+  except ValueError:
+    pass
+
+
+def _reserve(model: str, tokens: int, limits: dict) -> float:
+  """
+  Takes a concurrency slot and the request's share of the buckets. Returns 0 if both were
+  taken, otherwise the seconds to wait before trying again.
+  """
+  slots_key = f"llm_rate:{model}:in_flight"
+  # a prompt larger than the whole budget waits for a full bucket
+  tokens = min(tokens, limits["tokens_per_minute"])
+
+  if not _take_slot(slots_key, limits["max_concurrency"]):
+    return settings.LLM_RATE_LIMIT_POLL_SECONDS
+  wait = _take_from_buckets(model, tokens, limits)
+  if wait > 0:
+    _release_slot(slots_key)
+  return wait
+
+
+@contextmanager
+def llm_rate_limit(model: str, tokens: int):
+  """
+  Blocks until a request of about this many tokens (prompt and completion) fits the model's
+  limits, then holds one of its concurrency slots until the block exits.
+  """
+  limits = get_rate_limits(model)
+  start = time.monotonic()
+  waited = None
+  while (wait := _reserve(model, tokens, limits)) > 0:
+    waited = time.monotonic() - start
+    if waited >= settings.LLM_RATE_LIMIT_MAX_WAIT:
+      incr(TIMEOUTS)
+      raise RateLimitTimeout(f"No capacity for {model} after waiting {waited:.1f}s")
+    # sleep until the buckets have refilled at most, jittered so waiting workers do not retry in lockstep
+    time.sleep(min(wait, settings.LLM_RATE_LIMIT_POLL_SECONDS) * random.uniform(1, 1.2))
+
+  if waited is not None:
+    waited = time.monotonic() - start
+    incr(WAITS)
+    incr(WAIT_MS, int(waited * 1000))
+    logger.info(f"Waited {waited:.2f}s for {model} rate limit capacity")
+
+  try:
+    yield
+  finally:
+    _release_slot(f"llm_rate:{model}:in_flight")
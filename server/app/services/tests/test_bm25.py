@@ -0,0 +1,30 @@
+from django.test import SimpleTestCase
+
+from services.bm25 import BM25Index, reciprocal_rank_fusion, tokenize
+
+
+class BM25Test(SimpleTestCase):
+  def setUp(self):
+    self.index = BM25Index([
+      "TCP opens a connection with a SYN, SYN-ACK and ACK handshake.",
+      "UDP sends datagrams without a handshake.",
+      "Mitochondria produce ATP for the cell.",
+    ])
+
+  def test_tokenize_keeps_acronyms_and_numbers(self):
+    self.assertEqual(tokenize("TCP/IP on 802.11, SYN-ACK!"), ["tcp", "ip", "on", "802", "11", "syn", "ack"])
+
+  def test_rare_terms_rank_first(self):
+    self.assertEqual([position for position, _ in self.index.search("what is TCP SYN", 3)], [0])
+    self.assertEqual([position for position, _ in self.index.search("handshake", 3)], [1, 0])
+    self.assertEqual(self.index.search("photosynthesis", 3), [])
+
+  def test_empty_corpus(self):
+    self.assertEqual(BM25Index([]).search("anything", 3), [])
+
+  def test_reciprocal_rank_fusion(self):
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "d"]])
+    self.assertEqual(fused[0], "c")
+    self.assertEqual(set(fused), {"a", "b", "c", "d"})
+    # equal scores keep the order of the first ranking
+    self.assertEqual(reciprocal_rank_fusion([["a", "b"], ["b", "a"]]), ["a", "b"])
@@ -0,0 +1,39 @@
+import os
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, override_settings
+
+from services import clients
+
+
+class GroqClientTest(SimpleTestCase):
+  def setUp(self):
+    env_patch = patch.dict(os.environ, {"GROK_API_KEY": "x", "GROQ_API_KEY": "x"})
+    env_patch.start()
+    self.addCleanup(env_patch.stop)
+    clients._reset_clients()
+    self.addCleanup(clients._reset_clients)
+
+  def test_one_client_per_process(self):
+    self.assertIs(clients.get_groq_client(), clients.get_groq_client())
+    self.assertIsNot(clients.get_groq_client(), clients.get_groq_v2())
+
+  @override_settings(LLM_HTTP_CONNECT_TIMEOUT=3, LLM_HTTP_READ_TIMEOUT=30)
+  def test_timeouts(self):
+    timeout = clients.get_groq_v2().timeout
+    self.assertEqual(timeout.connect, 3)
+    self.assertEqual(timeout.read, 30)
+
+  def test_forked_children_build_their_own(self):
+    clients.get_groq_client()
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+      os.close(read_fd)
+      os.write(write_fd, b"empty" if not clients._clients else b"inherited")
+      os._exit(0)
+    os.close(write_fd)
+    os.waitpid(pid, 0)
+    with os.fdopen(read_fd, "rb") as pipe:
+      self.assertEqual(pipe.read(), b"empty")
+    self.assertIn("groq_client", clients._clients)
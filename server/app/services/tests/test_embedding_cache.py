@@ -0,0 +1,66 @@
+from unittest.mock import patch
+
+import numpy as np
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from services.embedding import encode_chunks, get_embedding_model_id, warm_up_model
+from services.embedding_cache import HITS, MISSES, _embedding_key, get_cached_embeddings
+from services.tests.test_vector_store import LOCMEM_CACHE, BagOfWordsModel
+from utils.metrics import get_metrics
+
+
+class CountingModel(BagOfWordsModel):
+  def __init__(self):
+    self.encoded = []
+
+  def encode(self, texts, convert_to_numpy=True):
+    self.encoded.extend(texts)
+    return super().encode(texts, convert_to_numpy)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class EmbeddingCacheTest(SimpleTestCase):
+  def setUp(self):
+    cache.clear()
+    self.model = CountingModel()
+    model_patch = patch('services.embedding.get_model', return_value=self.model)
+    model_patch.start()
+    self.addCleanup(model_patch.stop)
+
+  def test_only_misses_are_encoded(self):
+    first = encode_chunks(["cell walls", "plant roots", "cell walls"])
+    self.assertEqual(self.model.encoded, ["cell walls", "plant roots"])
+    self.assertEqual(first[0], first[2])
+
+    second = encode_chunks(["plant roots", "photosynthesis"])
+    self.assertEqual(self.model.encoded, ["cell walls", "plant roots", "photosynthesis"])
+    self.assertEqual(second[0], first[1])
+
+    metrics = get_metrics()
+    self.assertEqual(metrics[HITS], 1)
+    # the repeated chunk of the first call is only looked up once
+    self.assertEqual(metrics[MISSES], 3)
+
+  def test_entries_are_float16_and_keyed_by_model(self):
+    [embedding] = encode_chunks(["cell walls"])
+    blob = cache.get(_embedding_key(get_embedding_model_id(), "cell walls"))
+    self.assertEqual(len(blob), len(embedding) * 2)
+    cached = get_cached_embeddings(get_embedding_model_id(), ["cell walls"])["cell walls"]
+    np.testing.assert_allclose(cached, embedding, atol=1e-3)
+    self.assertEqual(get_cached_embeddings("other-model", ["cell walls"]), {})
+
+
+class WarmUpModelTest(SimpleTestCase):
+  @patch('services.embedding.get_model')
+  def test_loads_in_parent_and_encodes_in_workers(self, mock_get_model):
+    with override_settings(EMBEDDING_PRELOAD=True):
+      warm_up_model(encode=False)
+      mock_get_model.return_value.encode.assert_not_called()
+      warm_up_model()
+      mock_get_model.return_value.encode.assert_called_once()
+
+    mock_get_model.reset_mock()
+    with override_settings(EMBEDDING_PRELOAD=False):
+      warm_up_model()
+    mock_get_model.assert_not_called()
@@ -0,0 +1,158 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase, override_settings
+
+from services.llm import complete_quiz_questions, get_llm_completion, stream_quiz_questions
+from services.tests.test_vector_store import LOCMEM_CACHE
+
+MODEL = "test-model"
+QUESTIONS = [
+  {"question": "Plants make sugar from light.", "type": "TF", "answer": "true"},
+  {"question": "Where does photosynthesis happen?", "type": "MCQ", "options": ["Chloroplast", "Nucleus", "Ribosome", "Wall"], "answer": "a"},
+]
+
+
+def _completion(content: str):
+  return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class LlmResponseCacheTest(SimpleTestCase):
+  def setUp(self):
+    cache.clear()
+    client_patch = patch('services.llm.get_groq_client')
+    self.client = client_patch.start().return_value
+    self.addCleanup(client_patch.stop)
+    self.client.chat.completions.create.return_value = _completion(json.dumps(QUESTIONS))
+
+  def complete(self, **kwargs):
+    return get_llm_completion.apply(kwargs={"model": MODEL, "material": "photosynthesis", "items": 2, **kwargs}).get()
+
+  def test_repeat_request_is_served_from_cache(self):
+    self.assertEqual(self.complete(), QUESTIONS)
+    self.assertEqual(self.complete(), QUESTIONS)
+    self.assertEqual(self.client.chat.completions.create.call_count, 1)
+
+  def test_key_covers_material_and_items(self):
+    self.complete()
+    self.complete(material="cell division")
+    self.complete(items=3)
+    self.assertEqual(self.client.chat.completions.create.call_count, 3)
+
+  def test_fresh_bypasses_and_replaces_the_entry(self):
+    self.complete()
+    newer = QUESTIONS[::-1]
+    self.client.chat.completions.create.return_value = _completion(json.dumps(newer))
+    self.assertEqual(self.complete(fresh=True), newer)
+    self.assertEqual(self.complete(), newer)
+    self.assertEqual(self.client.chat.completions.create.call_count, 2)
+
+  @override_settings(LLM_RESPONSE_CACHE_MAX_BYTES=10)
+  def test_oversized_responses_are_not_cached(self):
+    self.complete()
+    self.complete()
+    self.assertEqual(self.client.chat.completions.create.call_count, 2)
+
+  @override_settings(LLM_RESPONSE_CACHE_TIMEOUT=0)
+  def test_disabled_cache(self):
+    self.complete()
+    self.complete()
+    self.assertEqual(self.client.chat.completions.create.call_count, 2)
+
+  def test_partial_response_is_not_cached(self):
+    self.client.chat.completions.create.return_value = _completion(json.dumps(QUESTIONS[:1]))
+    self.complete()
+    self.complete()
+    self.assertEqual(self.client.chat.completions.create.call_count, 2)
+
+  def test_rejected_response_is_not_cached(self):
+    def reject(questions):
+      raise ValueError("bad question")
+
+    with self.assertRaises(ValueError):
+      complete_quiz_questions(model=MODEL, material="photosynthesis", items=2, accept=reject)
+    self.complete()
+    self.assertEqual(self.client.chat.completions.create.call_count, 2)
+
+  def test_cached_response_is_accepted_too(self):
+    self.complete()
+    accepted = []
+    complete_quiz_questions(model=MODEL, material="photosynthesis", items=2, accept=accepted.append)
+    self.assertEqual(accepted, [QUESTIONS])
+    self.assertEqual(self.client.chat.completions.create.call_count, 1)
+
+
+def _stream(content: str, size: int = 5, finish_reason: str = "stop"):
+  # the last chunk says why the model stopped, as groq's do
+  starts = range(0, len(content), size)
+  return [
+    SimpleNamespace(choices=[SimpleNamespace(
+      delta=SimpleNamespace(content=content[i:i + size]),
+      finish_reason=finish_reason if i == starts[-1] else None,
+    )])
+    for i in starts
+  ]
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class StreamQuizQuestionsTest(SimpleTestCase):
+  def setUp(self):
+    cache.clear()
+    client_patch = patch('services.llm.get_groq_client')
+    self.client = client_patch.start().return_value
+    self.addCleanup(client_patch.stop)
+
+  def stream(self, **kwargs):
+    return stream_quiz_questions(model=MODEL, material="photosynthesis", items=2, **kwargs)
+
+  def test_questions_are_yielded_before_the_stream_ends(self):
+    chunks = _stream(json.dumps(QUESTIONS))
+    consumed = []
+
+    def tracked():
+      for chunk in chunks:
+        consumed.append(chunk)
+        yield chunk
+
+    self.client.chat.completions.create.return_value = tracked()
+    questions = self.stream()
+    self.assertEqual(next(questions), QUESTIONS[0])
+    self.assertLess(len(consumed), len(chunks))
+    self.assertEqual(list(questions), [QUESTIONS[1]])
+
+  def test_streamed_response_is_cached(self):
+    self.client.chat.completions.create.return_value = _stream(json.dumps(QUESTIONS))
+    self.assertEqual(list(self.stream()), QUESTIONS)
+    self.assertEqual(list(self.stream()), QUESTIONS)
+    self.assertEqual(get_llm_completion.apply(kwargs={"model": MODEL, "material": "photosynthesis", "items": 2}).get(), QUESTIONS)
+    self.assertEqual(self.client.chat.completions.create.call_count, 1)
+
+  def test_stream_cut_off_at_the_token_limit_is_not_cached(self):
+    self.client.chat.completions.create.return_value = _stream(json.dumps(QUESTIONS)[:-40], finish_reason="length")
+    self.assertEqual(list(self.stream()), [QUESTIONS[0]])
+    self.client.chat.completions.create.return_value = _stream(json.dumps(QUESTIONS))
+    self.assertEqual(list(self.stream()), QUESTIONS)
+    self.assertEqual(self.client.chat.completions.create.call_count, 2)
+
+  def test_stream_with_too_few_questions_is_not_cached(self):
+    self.client.chat.completions.create.side_effect = lambda **kwargs: _stream(json.dumps(QUESTIONS[:1]))
+    list(self.stream())
+    list(self.stream())
+    self.assertEqual(self.client.chat.completions.create.call_count, 2)
+
+  def test_stream_abandoned_by_the_caller_is_not_cached(self):
+    self.client.chat.completions.create.side_effect = lambda **kwargs: _stream(json.dumps(QUESTIONS))
+    questions = self.stream()
+    next(questions)
+    questions.close()
+    self.assertEqual(list(self.stream()), QUESTIONS)
+    self.assertEqual(self.client.chat.completions.create.call_count, 2)
+
+  def test_unparsable_stream_raises(self):
+    self.client.chat.completions.create.return_value = _stream("Sorry, I cannot help with that.")
+    with self.assertRaises(ValidationError):
+      list(self.stream())
@@ -0,0 +1,64 @@
+import importlib.util
+import os
+import unittest
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+
+from services import embedding
+
+SENTENCES = [
+  "Mitochondria are the powerhouse of the cell.",
+  "The French Revolution began in 1789 with the storming of the Bastille.",
+  "A derivative measures how a function changes as its input changes.",
+  "what is chapter 1 about",
+  "summarize this",
+  "Photosynthesis converts light energy into chemical energy stored in glucose.",
+]
+
+
+def _load(backend: str):
+  embedding._model = None
+  with override_settings(EMBEDDING_BACKEND=backend):
+    return embedding.get_model()
+
+
+# downloads both models, only runs where the onnx extra is installed or ONNX_PARITY_TESTS is set
+# (CI sets it, so a missing extra fails there instead of skipping). encode latency of the two is
+# compared by `manage.py benchmark_retrieval --models torch onnx`, not asserted here
+@unittest.skipUnless(
+  os.getenv("ONNX_PARITY_TESTS") == "true"
+  or (importlib.util.find_spec("onnxruntime") and importlib.util.find_spec("optimum")),
+  "the onnx extra is not installed",
+)
+class OnnxEmbeddingParityTest(SimpleTestCase):
+  @classmethod
+  def setUpClass(cls):
+    super().setUpClass()
+    cls.torch_model = _load("torch")
+    cls.onnx_model = _load("onnx")
+    embedding._model = None
+
+  def test_embeddings_match_the_torch_model(self):
+    expected = self.torch_model.encode(SENTENCES, convert_to_numpy=True, normalize_embeddings=True)
+    actual = self.onnx_model.encode(SENTENCES, convert_to_numpy=True, normalize_embeddings=True)
+    self.assertEqual(actual.shape, (len(SENTENCES), 384))
+    similarities = (expected * actual).sum(axis=1)
+    self.assertGreater(similarities.min(), 0.97)
+
+
+class EmbeddingBackendTest(SimpleTestCase):
+  def tearDown(self):
+    embedding._model = None
+
+  @override_settings(EMBEDDING_BACKEND="onnx", EMBEDDING_ONNX_FILE="onnx/model_quint8_avx2.onnx")
+  def test_onnx_embeddings_are_cached_apart(self):
+    self.assertEqual(embedding.get_embedding_model_id(), "all-MiniLM-L6-v2:onnx:onnx/model_quint8_avx2.onnx")
+    with override_settings(EMBEDDING_BACKEND="torch"):
+      self.assertEqual(embedding.get_embedding_model_id(), "all-MiniLM-L6-v2")
+
+  @override_settings(EMBEDDING_BACKEND="tensorrt")
+  def test_unknown_backend(self):
+    embedding._model = None
+    with self.assertRaises(ImproperlyConfigured):
+      embedding.get_model()
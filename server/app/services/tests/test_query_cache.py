@@ -0,0 +1,72 @@
+import tempfile
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from services import query_cache, vector_store
+from services.embedding import embed_and_upsert_chunks, query_course
+from services.query_cache import ExpiringLRUCache
+from services.tests.test_embedding_cache import CountingModel
+from services.tests.test_vector_store import LOCMEM_CACHE
+
+
+class ExpiringLRUCacheTest(SimpleTestCase):
+  def test_evicts_least_recently_used(self):
+    lru = ExpiringLRUCache(max_entries=2, ttl=60)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.get("a")
+    lru.set("c", 3)
+    self.assertEqual((lru.get("a"), lru.get("b"), lru.get("c")), (1, None, 3))
+
+  @patch('services.query_cache.time.monotonic')
+  def test_entries_expire(self, mock_monotonic):
+    mock_monotonic.return_value = 100
+    lru = ExpiringLRUCache(max_entries=2, ttl=60)
+    lru.set("a", 1)
+    mock_monotonic.return_value = 161
+    self.assertIsNone(lru.get("a"))
+
+
+class QueryCourseCacheTest(SimpleTestCase):
+  def setUp(self):
+    self.tmp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(self.tmp_dir.cleanup)
+    settings_override = override_settings(
+      VECTOR_STORE_BACKEND="faiss", FAISS_INDEX_DIR=self.tmp_dir.name, CACHES=LOCMEM_CACHE,
+      QUERY_EMBEDDING_CACHE_SIZE=10, QUERY_EMBEDDING_CACHE_TTL=60, QUERY_RESULT_CACHE_TIMEOUT=60,
+    )
+    settings_override.enable()
+    self.addCleanup(settings_override.disable)
+    cache.clear()
+    for reset in (vector_store._reset_vector_store, lambda: setattr(query_cache, "_query_embeddings", None)):
+      reset()
+      self.addCleanup(reset)
+    self.model = CountingModel()
+    model_patch = patch('services.embedding.get_model', return_value=self.model)
+    model_patch.start()
+    self.addCleanup(model_patch.stop)
+    embed_and_upsert_chunks(chunks=["Mitochondria produce energy.", "Rome was founded in 753 BC."], course_id="3", material_id=1)
+    self.model.encoded.clear()
+
+  def test_repeated_question_skips_model_and_store(self):
+    first = query_course("What produces energy?", "3", top_k=1)
+    with patch.object(vector_store.FaissVectorStore, 'query') as mock_query:
+      self.assertEqual(query_course("  what produces   ENERGY? ", "3", top_k=1), first)
+      mock_query.assert_not_called()
+    self.assertEqual(self.model.encoded, ["What produces energy?"])
+
+  def test_upsert_invalidates_results_but_keeps_embeddings(self):
+    self.assertEqual(query_course("energy", "3", top_k=1), ["Mitochondria produce energy."])
+    embed_and_upsert_chunks(chunks=["ATP is the energy currency."], course_id="3", material_id=1)
+    self.model.encoded.clear()
+    self.assertEqual(query_course("energy", "3", top_k=1), ["ATP is the energy currency."])
+    self.assertEqual(self.model.encoded, [])
+
+  @override_settings(QUERY_RESULT_CACHE_TIMEOUT=0)
+  def test_result_cache_can_be_disabled(self):
+    query_course("energy", "3", top_k=1)
+    with patch.object(vector_store.FaissVectorStore, 'query', return_value=[]) as mock_query:
+      query_course("energy", "3", top_k=1)
+      mock_query.assert_called_once()
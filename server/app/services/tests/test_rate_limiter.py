@@ -0,0 +1,124 @@
+from unittest.mock import MagicMock, patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from services.rate_limiter import SLOT_TIMEOUT, TIMEOUTS, WAIT_MS, WAITS, RateLimitTimeout, llm_rate_limit
+from services.tests.test_vector_store import LOCMEM_CACHE
+from utils.metrics import get_metrics
+
+MODEL = "test-model"
+
+
+class FakeClock:
+  """
+  Stands in for the time module, sleeping just moves the clock forward.
+  """
+  def __init__(self):
+    self.now = 6000.0
+
+  def time(self):
+    return self.now
+
+  def monotonic(self):
+    return self.now
+
+  def sleep(self, seconds):
+    self.now += seconds
+
+
+@override_settings(
+  CACHES=LOCMEM_CACHE,
+  LLM_DEFAULT_RATE_LIMITS={"requests_per_minute": 2, "tokens_per_minute": 100, "max_concurrency": 2},
+  LLM_RATE_LIMITS={},
+  LLM_RATE_LIMIT_MAX_WAIT=0,
+)
+class RateLimiterTest(SimpleTestCase):
+  def setUp(self):
+    cache.clear()
+    self.clock = FakeClock()
+    # the cache expires keys on the same clock
+    for target in ('services.rate_limiter.time', 'django.core.cache.backends.base.time', 'django.core.cache.backends.locmem.time'):
+      clock_patch = patch(target, self.clock)
+      clock_patch.start()
+      self.addCleanup(clock_patch.stop)
+
+  def acquire(self, tokens=10):
+    with llm_rate_limit(MODEL, tokens):
+      pass
+
+  def test_requests_per_minute(self):
+    self.acquire()
+    self.acquire()
+    with self.assertRaises(RateLimitTimeout):
+      self.acquire()
+    self.assertEqual(get_metrics()[TIMEOUTS], 1)
+
+  def test_tokens_per_minute(self):
+    self.acquire(80)
+    with self.assertRaises(RateLimitTimeout):
+      self.acquire(30)
+    # the rejected request did not use up the request budget
+    self.acquire(20)
+
+  def test_concurrency_slots(self):
+    with llm_rate_limit(MODEL, 10):
+      with llm_rate_limit(MODEL, 10):
+        with self.assertRaises(RateLimitTimeout):
+          self.acquire()
+
+  @override_settings(LLM_RATE_LIMIT_MAX_WAIT=120)
+  def test_waits_for_the_tokens_to_refill(self):
+    self.acquire(100)
+    start = self.clock.now
+    self.acquire(50)
+    # 50 of 100 tokens per minute come back in 30 seconds
+    self.assertGreaterEqual(self.clock.now, start + 30)
+    self.assertLess(self.clock.now, start + 40)
+    metrics = get_metrics()
+    self.assertEqual(metrics[WAITS], 1)
+    self.assertGreaterEqual(metrics[WAIT_MS], 30_000)
+
+  def test_no_burst_across_a_minute_boundary(self):
+    self.clock.now = 6059.9
+    self.acquire()
+    self.acquire()
+    self.clock.sleep(0.2)
+    with self.assertRaises(RateLimitTimeout):
+      self.acquire()
+
+  def test_requests_come_back_at_the_refill_rate(self):
+    self.acquire()
+    self.acquire()
+    self.clock.sleep(30)
+    self.acquire()
+    with self.assertRaises(RateLimitTimeout):
+      self.acquire()
+
+  def test_held_slots_do_not_expire_under_load(self):
+    with llm_rate_limit(MODEL, 10):
+      self.clock.sleep(SLOT_TIMEOUT - 10)
+      with llm_rate_limit(MODEL, 10):
+        # past the first slot's original timeout, the second acquire pushed it back
+        self.clock.sleep(20)
+        with self.assertRaises(RateLimitTimeout):
+          self.acquire()
+
+  def test_model_overrides(self):
+    with self.settings(LLM_RATE_LIMITS={MODEL: {"requests_per_minute": 3}}):
+      for _ in range(3):
+        self.acquire()
+    with self.assertRaises(RateLimitTimeout):
+      self.acquire()
+
+  def test_redis_takes_from_the_buckets_in_one_script(self):
+    connection = MagicMock()
+    script = connection.register_script.return_value
+    script.side_effect = [b"1.5", b"0"]
+    with patch('services.rate_limiter._redis_connection', return_value=connection), \
+        self.settings(LLM_RATE_LIMIT_MAX_WAIT=120):
+      self.acquire(40)
+    self.assertEqual(script.call_count, 2)
+    self.assertEqual(script.call_args.kwargs["keys"], [cache.make_key(f"llm_rate:{MODEL}:bucket")])
+    self.assertEqual(script.call_args.kwargs["args"], [2, 100, 40, 60])
+    self.assertGreaterEqual(get_metrics()[WAIT_MS], 1500)
@@ -0,0 +1,162 @@
+import tempfile
+import zlib
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+
+from services import vector_store
+from services.embedding import delete_course_chunks, delete_material_chunks, embed_and_upsert_chunks, query_course
+from services.vector_store import EMBEDDING_DIMENSION, FaissVectorStore, PineconeVectorStore, VectorStore, batch_vectors
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class BagOfWordsModel:
+  """
+  Offline stand-in for the sentence transformer: one hashed dimension per word.
+  """
+  def encode(self, texts, convert_to_numpy=True):
+    vectors = np.zeros((len(texts), EMBEDDING_DIMENSION), dtype=np.float32)
+    for row, text in enumerate(texts):
+      for word in text.lower().split():
+        vectors[row, zlib.crc32(word.strip(".,?").encode()) % EMBEDDING_DIMENSION] += 1
+    return vectors
+
+
+def embed(*texts):
+  return BagOfWordsModel().encode(list(texts)).tolist()
+
+
+class FaissVectorStoreTest(SimpleTestCase):
+  def setUp(self):
+    self.tmp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(self.tmp_dir.cleanup)
+    self.store = FaissVectorStore(self.tmp_dir.name)
+    self.texts = ["photosynthesis in plant cells", "the french revolution began in 1789", "plant roots absorb water"]
+    self.store.upsert("1", ["a", "b", "c"], embed(*self.texts), self.texts)
+
+  def test_query_returns_closest_chunks_first(self):
+    self.assertEqual(self.store.query("1", embed("how do plant cells make food")[0], 2), [self.texts[0], self.texts[2]])
+
+  def test_courses_are_separate(self):
+    self.store.upsert("2", ["a"], embed("medieval castles"), ["medieval castles"])
+    self.assertEqual(self.store.query("2", embed("plant")[0], 3), ["medieval castles"])
+    self.assertEqual(self.store.query("3", embed("plant")[0], 3), [])
+
+  def test_upsert_replaces_chunks_with_the_same_id(self):
+    self.store.upsert("1", ["b"], embed("cell membranes"), ["cell membranes"])
+    results = self.store.query("1", embed("revolution")[0], 5)
+    self.assertEqual(len(results), 3)
+    self.assertNotIn(self.texts[1], results)
+    self.assertIn("cell membranes", results)
+
+  def test_index_persists_and_other_writers_are_picked_up(self):
+    other = FaissVectorStore(self.tmp_dir.name)
+    self.assertEqual(other.query("1", embed("revolution 1789")[0], 1), [self.texts[1]])
+    other.upsert("1", ["d"], embed("the storming of the bastille"), ["the storming of the bastille"])
+    self.assertEqual(self.store.query("1", embed("bastille storming")[0], 1), ["the storming of the bastille"])
+
+  def test_delete_prefix(self):
+    self.store.upsert("1", ["m2-a"], embed("plant cells"), ["plant cells"])
+    self.assertEqual(self.store.delete_prefix("1", "m2-"), 1)
+    self.assertEqual(len(self.store.query("1", embed("plant")[0], 5)), 3)
+    self.assertEqual(self.store.delete_prefix("1", "m2-"), 0)
+    self.assertEqual(self.store.delete_prefix("9", "m2-"), 0)
+
+  def test_delete_ids(self):
+    self.store.delete_ids("1", ["a", "missing"])
+    self.assertNotIn(self.texts[0], self.store.query("1", embed("plant")[0], 5))
+    self.assertEqual(len(self.store.query("1", embed("plant")[0], 5)), 2)
+    self.store.delete_ids("9", ["a"])
+
+  def test_backend_missing_a_method_cannot_be_created(self):
+    class PartialStore(VectorStore):
+      def upsert(self, course_id, ids, embeddings, texts):
+        pass
+
+    with self.assertRaises(TypeError):
+      PartialStore()
+
+  def test_delete_course(self):
+    self.store.delete_course("1")
+    self.assertEqual(self.store.query("1", embed("plant")[0], 3), [])
+    self.store.delete_course("1")
+
+
+class PineconeVectorStoreTest(SimpleTestCase):
+  def setUp(self):
+    self.store = PineconeVectorStore()
+    self.store._index = MagicMock()
+
+  def test_each_course_uses_its_own_namespace(self):
+    self.store.upsert("4", ["a"], [[0.1]], ["text"])
+    self.store._index.upsert.assert_called_once_with([("a", [0.1], {"course_id": "4", "text": "text"})], namespace="course-4")
+
+    self.store._index.query.return_value = {"matches": [{"metadata": {"text": "text"}}]}
+    self.assertEqual(self.store.query("4", [0.1], 3), ["text"])
+    self.assertEqual(self.store._index.query.call_args.kwargs["namespace"], "course-4")
+    self.assertNotIn("filter", self.store._index.query.call_args.kwargs)
+
+    self.store.delete_course("4")
+    self.store._index.delete.assert_called_once_with(delete_all=True, namespace="course-4")
+
+  def test_delete_prefix_deletes_listed_ids(self):
+    self.store._index.list.return_value = iter([["m-1-chunk-0", "m-1-chunk-1"], ["m-1-chunk-2"]])
+    self.assertEqual(self.store.delete_prefix("4", "m-1-"), 3)
+    self.store._index.list.assert_called_once_with(prefix="m-1-", namespace="course-4")
+    self.store._index.delete.assert_called_once_with(ids=["m-1-chunk-0", "m-1-chunk-1", "m-1-chunk-2"], namespace="course-4")
+
+  def test_batches_are_bounded_by_count_and_size(self):
+    vectors = [(str(i), [0.1], {"text": "x" * (3000 if i == 2 else 10)}) for i in range(5)]
+    self.assertEqual([len(batch) for batch in batch_vectors(vectors, max_count=2, max_bytes=1_000_000)], [2, 2, 1])
+    self.assertEqual([len(batch) for batch in batch_vectors(vectors, max_count=10, max_bytes=10_000)], [2, 1, 2])
+
+  @patch('services.vector_store.time.sleep')
+  def test_failed_batches_are_retried(self, mock_sleep):
+    store = PineconeVectorStore(batch_size=2, concurrency=2, retries=2)
+    store._index = MagicMock()
+    store._index.upsert.side_effect = [ConnectionError("reset"), None, None, None]
+    store.upsert("4", ["a", "b", "c"], [[0.1]] * 3, ["x", "y", "z"])
+    # two batches, the first attempt of one of them failed
+    self.assertEqual(store._index.upsert.call_count, 3)
+    upserted = {vector[0] for call in store._index.upsert.call_args_list[1:] for vector in call.args[0]}
+    self.assertEqual(upserted, {"a", "b", "c"})
+
+    store._index.upsert.side_effect = ConnectionError("down")
+    with self.assertRaises(ConnectionError):
+      store.upsert("4", ["a"], [[0.1]], ["x"])
+
+
+class EmbeddingServiceTest(SimpleTestCase):
+  def setUp(self):
+    self.tmp_dir = tempfile.TemporaryDirectory()
+    self.addCleanup(self.tmp_dir.cleanup)
+    settings_override = override_settings(VECTOR_STORE_BACKEND="faiss", FAISS_INDEX_DIR=self.tmp_dir.name, CACHES=LOCMEM_CACHE)
+    settings_override.enable()
+    self.addCleanup(settings_override.disable)
+    vector_store._reset_vector_store()
+    self.addCleanup(vector_store._reset_vector_store)
+    model_patch = patch('services.embedding.get_model', return_value=BagOfWordsModel())
+    model_patch.start()
+    self.addCleanup(model_patch.stop)
+
+  def test_rag_path_runs_offline(self):
+    chunks = ["Mitochondria produce energy for the cell.", "Rome was not built in a day."]
+    embeddings = embed_and_upsert_chunks(chunks=chunks, course_id="7", material_id=1)
+    self.assertEqual(len(embeddings), 2)
+    self.assertEqual(query_course("what produce energy in the cell?", "7", top_k=1), [chunks[0]])
+
+    embed_and_upsert_chunks(chunks=["Energy flows through food chains."], course_id="7", material_id=2)
+    self.assertEqual(len(query_course("energy", "7", top_k=5)), 3)
+    delete_material_chunks.run("7", 1)
+    self.assertEqual(query_course("energy", "7", top_k=5), ["Energy flows through food chains."])
+
+    delete_course_chunks.run("7")
+    self.assertEqual(query_course("energy", "7"), [])
+
+  @override_settings(VECTOR_STORE_BACKEND="chroma")
+  def test_unknown_backend(self):
+    with self.assertRaises(ImproperlyConfigured):
+      vector_store.get_vector_store()
@@ -0,0 +1,333 @@
+"""
+Vector stores holding the embedded chunks of course materials.
+
+VECTOR_STORE_BACKEND picks the implementation:
+  "pinecone"  one shared serverless index, one namespace per course
+  "faiss"     one index file per course under FAISS_INDEX_DIR, searched in process
+
+Both use cosine similarity over the MiniLM embeddings.
+"""
+from abc import ABC, abstractmethod
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from pinecone import Pinecone, ServerlessSpec
+from pinecone.exceptions import NotFoundException
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIMENSION = 384  # MiniLM embedding size
+# rough size of one vector in an upsert request: the floats as JSON plus the ids and metadata keys
+VECTOR_REQUEST_OVERHEAD_BYTES = EMBEDDING_DIMENSION * 12 + 200
+
+
+class VectorStore(ABC):
+  @abstractmethod
+  def upsert(self, course_id: str, ids: list[str], embeddings: list[list[float]], texts: list[str]) -> None:
+    """
+    Stores the chunks of a course, replacing chunks with the same id.
+    """
+
+  @abstractmethod
+  def query(self, course_id: str, embedding: list[float], top_k: int) -> list[str]:
+    """
+    Returns the texts of the top_k chunks of the course closest to the embedding, best match first.
+    """
+
+  @abstractmethod
+  def delete_ids(self, course_id: str, ids: list[str]) -> None:
+    """
+    Deletes the chunks of a course with these ids, ids that are not stored are ignored.
+    """
+
+  @abstractmethod
+  def delete_prefix(self, course_id: str, prefix: str) -> int:
+    """
+    Deletes the chunks of a course whose id starts with prefix, returns how many were deleted.
+    """
+
+  @abstractmethod
+  def delete_course(self, course_id: str) -> None:
+    """
+    Deletes every chunk of a course.
+    """
+
+
+_pc = None
+
+def get_pinecone():
+  global _pc
+  if _pc is None:
+    _pc = Pinecone(
+      api_key=os.getenv("PINECONE_API_KEY"),
+    )
+  return _pc
+
+
+def batch_vectors(vectors: list[tuple], max_count: int, max_bytes: int) -> list[list[tuple]]:
+  """
+  Splits (id, embedding, metadata) vectors into batches of at most max_count vectors and roughly
+  max_bytes of request body. A single vector over max_bytes still gets a batch of its own.
+  """
+  batches, batch, batch_bytes = [], [], 0
+  for vector in vectors:
+    size = VECTOR_REQUEST_OVERHEAD_BYTES + len(vector[2].get("text", "").encode())
+    if batch and (len(batch) >= max_count or batch_bytes + size > max_bytes):
+      batches.append(batch)
+      batch, batch_bytes = [], 0
+    batch.append(vector)
+    batch_bytes += size
+  if batch:
+    batches.append(batch)
+  return batches
+
+
+def course_namespace(course_id: str) -> str:
+  return f"course-{course_id}"
+
+
+class PineconeVectorStore(VectorStore):
+  """
+  Partitions the shared index into one namespace per course, so queries and deletes only touch
+  that course's vectors. Vectors written before namespaces live in the default namespace ("")
+  with a course_id metadata field, see the migrate_vector_namespaces command.
+  """
+  index_name = "pamahres-shared-index"
+
+  def __init__(self, batch_size: int = 100, max_request_bytes: int = 1_500_000, concurrency: int = 4, retries: int = 3):
+    self._index = None
+    self.batch_size = batch_size
+    self.max_request_bytes = max_request_bytes
+    self.concurrency = concurrency
+    self.retries = retries
+
+  def get_index(self):
+    if self._index is None:
+      # Create or connect to an index (if it doesn't exist, create it)
+      pc = get_pinecone()
+      if self.index_name not in pc.list_indexes().names():
+        pc.create_index(
+          name=self.index_name,
+          dimension=EMBEDDING_DIMENSION,
+          metric="cosine",
+          spec=ServerlessSpec(cloud="aws", region="us-east-1")
+        )
+      self._index = pc.Index(self.index_name)
+    return self._index
+
+  def upsert(self, course_id, ids, embeddings, texts):
+    vectors = [
+      (vector_id, embedding, {"course_id": course_id, "text": text})
+      for vector_id, embedding, text in zip(ids, embeddings, texts)
+    ]
+    batches = batch_vectors(vectors, self.batch_size, self.max_request_bytes)
+    if len(batches) == 1:
+      self._upsert_batch(batches[0], course_namespace(course_id))
+      return
+    with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches))) as executor:
+      # list() re-raises the first batch that ran out of retries
+      list(executor.map(lambda batch: self._upsert_batch(batch, course_namespace(course_id)), batches))
+
+  def _upsert_batch(self, batch: list[tuple], namespace: str) -> None:
+    # ids are deterministic, so sending a batch again after a failure only overwrites the same vectors
+    for attempt in range(self.retries + 1):
+      try:
+        self.get_index().upsert(batch, namespace=namespace)
+        return
+      except Exception as e:
+        if attempt == self.retries:
+          raise
+        logger.warning(f"Upsert of {len(batch)} vectors to {namespace} failed (attempt {attempt + 1}): {str(e)}")
+        time.sleep(0.5 * 2 ** attempt)
+
+  def query(self, course_id, embedding, top_k):
+    results = self.get_index().query(
+      vector=embedding,
+      top_k=top_k,
+      include_metadata=True,
+      namespace=course_namespace(course_id),
+    )
+    # Extract the chunk texts from metadata
+    return [match['metadata']['text'] for match in results['matches']]
+
+  def delete_prefix(self, course_id, prefix):
+    index = self.get_index()
+    namespace = course_namespace(course_id)
+    # list every id up front, deleting while paginating would shift the pages
+    ids = [vector_id for page in index.list(prefix=prefix, namespace=namespace) for vector_id in page]
+    self.delete_ids(course_id, ids)
+    return len(ids)
+
+  def delete_ids(self, course_id, ids):
+    index = self.get_index()
+    for start in range(0, len(ids), 1000):  # the api deletes at most 1000 ids per request
+      index.delete(ids=ids[start:start + 1000], namespace=course_namespace(course_id))
+
+  def delete_course(self, course_id):
+    try:
+      self.get_index().delete(delete_all=True, namespace=course_namespace(course_id))
+    except NotFoundException:
+      # the course never had chunks upserted, its namespace was never created
+      pass
+
+
+class FaissVectorStore(VectorStore):
+  """
+  Keeps one flat inner product index per course on local disk, over normalized vectors (cosine).
+
+  Each course is a single file: a line of JSON metadata (chunk ids and texts) followed by the
+  serialized index, replaced atomically on every write so readers never see half of an update.
+  Loaded indexes stay in memory until the file changes, so a query is a stat and a search.
+  Writers from other processes (celery workers) are serialized with a lock file per course.
+  """
+  def __init__(self, directory: str, dimension: int = EMBEDDING_DIMENSION):
+    self.directory = directory
+    self.dimension = dimension
+    self._loaded: dict[str, tuple[int, faiss.Index, dict]] = {}
+    self._lock = threading.Lock()
+
+  def _path(self, course_id: str) -> str:
+    return os.path.join(self.directory, f"course-{course_id}.faiss")
+
+  def _load(self, course_id: str) -> tuple[faiss.Index, dict] | None:
+    path = self._path(course_id)
+    try:
+      mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+      self._loaded.pop(course_id, None)
+      return None
+    loaded = self._loaded.get(course_id)
+    if loaded is not None and loaded[0] == mtime:
+      return loaded[1], loaded[2]
+
+    with open(path, "rb") as f:
+      meta = json.loads(f.readline())
+      index = faiss.deserialize_index(np.frombuffer(f.read(), dtype=np.uint8))
+    self._loaded[course_id] = (mtime, index, meta)
+    return index, meta
+
+  def _save(self, course_id: str, index: faiss.Index, meta: dict) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+    try:
+      with os.fdopen(fd, "wb") as f:
+        f.write(json.dumps(meta).encode() + b"\n")
+        f.write(faiss.serialize_index(index).tobytes())
+      os.replace(tmp_path, self._path(course_id))
+    except BaseException:
+      os.unlink(tmp_path)
+      raise
+    self._loaded.pop(course_id, None)
+
+  def _normalized(self, embeddings: list[list[float]]) -> np.ndarray:
+    vectors = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dimension)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+  def _update(self, course_id: str, update) -> None:
+    """
+    Applies update(index, meta) to a copy of the course's index and saves it, under the course lock.
+    """
+    os.makedirs(self.directory, exist_ok=True)
+    with self._lock, open(self._path(course_id) + ".lock", "w") as lock_file:
+      fcntl.flock(lock_file, fcntl.LOCK_EX)
+      loaded = self._load(course_id)
+      if loaded is None:
+        index = faiss.IndexIDMap2(faiss.IndexFlatIP(self.dimension))
+        meta = {"next_id": 0, "ids": {}, "texts": {}}
+      else:
+        # work on a copy, queries in this process keep using the loaded one
+        index = faiss.clone_index(loaded[0])
+        meta = json.loads(json.dumps(loaded[1]))
+      if update(index, meta):
+        self._save(course_id, index, meta)
+
+  def _remove(self, index: faiss.Index, meta: dict, ids: list[str]) -> int:
+    removed = [meta["ids"].pop(vector_id) for vector_id in ids if vector_id in meta["ids"]]
+    if removed:
+      index.remove_ids(np.asarray(removed, dtype=np.int64))
+      for faiss_id in removed:
+        meta["texts"].pop(str(faiss_id), None)
+    return len(removed)
+
+  def upsert(self, course_id, ids, embeddings, texts):
+    def add(index, meta):
+      self._remove(index, meta, ids)
+      faiss_ids = np.arange(meta["next_id"], meta["next_id"] + len(ids), dtype=np.int64)
+      index.add_with_ids(self._normalized(embeddings), faiss_ids)
+      for vector_id, faiss_id, text in zip(ids, faiss_ids.tolist(), texts):
+        meta["ids"][vector_id] = faiss_id
+        meta["texts"][str(faiss_id)] = text
+      meta["next_id"] += len(ids)
+      return True
+    self._update(course_id, add)
+
+  def delete_ids(self, course_id, ids):
+    if not os.path.exists(self._path(course_id)):
+      return
+    self._update(course_id, lambda index, meta: self._remove(index, meta, ids) > 0)
+
+  def delete_prefix(self, course_id, prefix):
+    if not os.path.exists(self._path(course_id)):
+      return 0
+    deleted = 0
+    def remove(index, meta):
+      nonlocal deleted
+      deleted = self._remove(index, meta, [vector_id for vector_id in meta["ids"] if vector_id.startswith(prefix)])
+      return deleted > 0
+    self._update(course_id, remove)
+    return deleted
+
+  def query(self, course_id, embedding, top_k):
+    with self._lock:
+      loaded = self._load(course_id)
+    if loaded is None:
+      return []
+    index, meta = loaded
+    if index.ntotal == 0:
+      return []
+    _, faiss_ids = index.search(self._normalized([embedding]), min(top_k, index.ntotal))
+    return [meta["texts"][str(faiss_id)] for faiss_id in faiss_ids[0].tolist() if faiss_id != -1]
+
+  def delete_course(self, course_id):
+    with self._lock:
+      for path in (self._path(course_id), self._path(course_id) + ".lock"):
+        try:
+          os.unlink(path)
+        except FileNotFoundError:
+          pass
+      self._loaded.pop(course_id, None)
+
+
+_store = None
+
+def get_vector_store() -> VectorStore:
+  global _store
+  if _store is None:
+    backend = settings.VECTOR_STORE_BACKEND
+    if backend == "pinecone":
+      _store = PineconeVectorStore(
+        batch_size=settings.VECTOR_UPSERT_BATCH_SIZE,
+        max_request_bytes=settings.VECTOR_UPSERT_MAX_BYTES,
+        concurrency=settings.VECTOR_UPSERT_CONCURRENCY,
+        retries=settings.VECTOR_UPSERT_RETRIES,
+      )
+    elif backend == "faiss":
+      _store = FaissVectorStore(settings.FAISS_INDEX_DIR)
+    else:
+      raise ImproperlyConfigured(f"Unknown VECTOR_STORE_BACKEND {backend!r}, use 'pinecone' or 'faiss'.")
+    logger.info(f"Using the {backend} vector store")
+  return _store
+
+
+def _reset_vector_store() -> None:
+  global _store
+  _store = None
@@ -1,11 +1,17 @@
 # initialize supabase connection
 import os
 from dotenv import load_dotenv
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
 
 load_dotenv()
 
 supabase_url = os.getenv("SUPABASE_URL")
 supabase_key = os.getenv("SUPABASE_KEY")
 
-supabase: Client = create_client(supabase_url, supabase_key)
\ No newline at end of file
+# the storage client (and its keep-alive http session) is created once and shared by every
+# download thread, so the timeout here is the per-file download timeout
+supabase: Client = create_client(
+  supabase_url,
+  supabase_key,
+  options=ClientOptions(storage_client_timeout=int(os.getenv("PDF_FETCH_TIMEOUT", 30))),
+)
@@ -0,0 +1,50 @@
+"""
+Cache of the cleaned paragraphs and chunk lists extracted from course materials.
+
+Entries are keyed by the sha256 of the pdf bytes (CourseMaterial.content_hash), so every
+material with the same file shares them and a re-uploaded file with new bytes never
+reads stale paragraphs.
+"""
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+
+
+def compute_content_hash(data: bytes) -> str:
+  return hashlib.sha256(data).hexdigest()
+
+
+def _paragraphs_key(content_hash: str, **chunk_options) -> str:
+  options = ",".join(f"{name}={value}" for name, value in sorted(chunk_options.items()))
+  return f"extracted_paragraphs:{content_hash}:{options}"
+
+
+def _chunks_key(content_hashes: list[str], **chunk_options) -> str:
+  # the chunk list depends on every material (in order) and on how it was chunked
+  options = ",".join(f"{name}={value}" for name, value in sorted(chunk_options.items()))
+  digest = hashlib.sha256("|".join(content_hashes).encode()).hexdigest()
+  return f"extracted_chunks:{digest}:{options}"
+
+
+def get_cached_paragraphs(content_hashes: list[str], **chunk_options) -> dict[str, list[str]]:
+  """
+  Returns the cached paragraphs of every hash that has them, as {content_hash: paragraphs}.
+  """
+  keys = {_paragraphs_key(content_hash, **chunk_options): content_hash for content_hash in content_hashes if content_hash}
+  if not keys:
+    return {}
+  return {keys[key]: paragraphs for key, paragraphs in cache.get_many(list(keys)).items()}
+
+
+def set_cached_paragraphs(content_hash: str, paragraphs: list[str], **chunk_options) -> None:
+  cache.set(_paragraphs_key(content_hash, **chunk_options), paragraphs, timeout=settings.EXTRACTION_CACHE_TIMEOUT)
+
+
+def get_cached_chunks(content_hashes: list[str], **chunk_options) -> list[str] | None:
+  if not content_hashes or not all(content_hashes):
+    return None
+  return cache.get(_chunks_key(content_hashes, **chunk_options))
+
+
+def set_cached_chunks(content_hashes: list[str], chunks: list[str], **chunk_options) -> None:
+  cache.set(_chunks_key(content_hashes, **chunk_options), chunks, timeout=settings.EXTRACTION_CACHE_TIMEOUT)
@@ -1,8 +1,11 @@
 import logging
+from django.conf import settings
 from django.shortcuts import get_object_or_404
 from quiz.models import QuizModel
 from courses.models import CourseMaterial
-from utils.pdf_processor import extract_pdf_content, chunk_text
+from utils.pdf_processor import get_material_chunks
+from utils.tokens import get_chunk_options
+from courses.services.material_registry import get_registered_chunks, register_chunks
 from quiz.tasks import generate_questions_task
 from rest_framework.exceptions import ValidationError
 
@@ -40,19 +43,30 @@ def get_content_from_quizId(quiz_id: int) -> list[str]:
         invalid_ids = [material_id for material_id in material_ids if material_id not in material_list.values_list('id', flat=True)]
         raise ValidationError(f"Invalid material IDs: {invalid_ids}")
       
-    # process the pdf into text
-    pdf_content: str = extract_pdf_content(list(material_list))
-
-    if not pdf_content:
+    # process the pdf into text and divide it into (at most 4) chunks sized for the generation model,
+    # cached by the files' content hash
+    chunk_options: dict = get_chunk_options(settings.LLM_QUIZ_MODEL)
+    materials: list[CourseMaterial] = list(material_list)
+    pdf_content_chunks: list[str] | None = None
+    # single material quizzes over the whole document can reuse the chunks of any material with the same file
+    single_material: CourseMaterial | None = materials[0] if len(materials) == 1 and not quiz.page_selection else None
+    if single_material and single_material.content_hash:
+        pdf_content_chunks = get_registered_chunks(single_material.content_hash, chunk_options)
+
+    if pdf_content_chunks is None:
+        pdf_content_chunks = get_material_chunks(materials, quiz.page_selection, **chunk_options)
+        # content_hash is filled in by the extraction, a failed extraction gives no chunks to register
+        if single_material and single_material.content_hash and pdf_content_chunks:
+            register_chunks(single_material.content_hash, pdf_content_chunks, chunk_options)
+
+    if not pdf_content_chunks:
         raise ValueError("No valid content extracted from the provided materials.")
     
-    # divide content into 4 chunks and process
-    pdf_content_chunks: list[str] = chunk_text(pdf_content) # by default chunk size is 3000 characters
     logger.info(f"Extracted content from quiz {quiz_id} with {len(pdf_content_chunks)} chunks.")
     return pdf_content_chunks
 
 
-def generate_questions_by_chunks(pdf_content_chunks: list[str], quiz: QuizModel, requested_count: int) -> None:
+def generate_questions_by_chunks(pdf_content_chunks: list[str], quiz: QuizModel, requested_count: int, fresh: bool = False) -> None:
     """
     Generates questions for a quiz based on the provided content chunks.
 
@@ -60,6 +74,7 @@ def generate_questions_by_chunks(pdf_content_chunks: list[str], quiz: QuizModel,
         pdf_content_chunks (list[str]): List of content chunks extracted from the quiz materials.
         quiz (QuizModel): The quiz model instance to which the questions will be added.
         number_of_questions (int): The number of questions to generate.
+        fresh (bool): Skip the llm response cache so the chunks get new questions.
 
     Returns:
         None
@@ -84,7 +99,7 @@ def generate_questions_by_chunks(pdf_content_chunks: list[str], quiz: QuizModel,
         # generate questions for each chunk
         logger.info(f"Generating {questions_per_completion[i]} questions for chunk {i+1}/{number_of_chunks}.")
         try:
-            generate_questions_task.delay(chunk, quiz.id, questions_per_completion[i])
+            generate_questions_task.delay(chunk, quiz.id, questions_per_completion[i], fresh)
         except Exception as e:
             logger.error(f"Error generating questions for chunk {i+1}: {str(e)}")
             raise ValidationError(f"Error generating questions: {str(e)}")
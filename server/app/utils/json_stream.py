@@ -0,0 +1,104 @@
+"""
+Incremental parsing of a JSON array of objects arriving in pieces, as a streamed LLM completion.
+"""
+import logging
+import re
+
+import jiter
+
+logger = logging.getLogger(__name__)
+
+# a comma right before a closing brace or bracket, which json does not allow but models write.
+# strings are matched too so commas inside them are left alone
+TRAILING_COMMA = re.compile(r'"(?:[^"\\]|\\.)*"|,(\s*[}\]])', re.DOTALL)
+STRUCTURAL = re.compile(r'[\[\]{}"]')
+STRING_SPECIAL = re.compile(r'["\\]')
+
+
+def strip_trailing_commas(text: str) -> str:
+  return TRAILING_COMMA.sub(lambda match: match.group(1) if match.group(1) is not None else match.group(0), text)
+
+
+def loads_object(text: str) -> dict | None:
+  """
+  Parses one JSON object, dropping trailing commas if it does not parse as is. Returns None if
+  the text is not an object or still does not parse.
+  """
+  try:
+    parsed = jiter.from_json(text.encode())
+  except ValueError:
+    try:
+      parsed = jiter.from_json(strip_trailing_commas(text).encode())
+    except ValueError as e:
+      logger.warning(f"Skipping unparsable object: {str(e)}")
+      return None
+  return parsed if isinstance(parsed, dict) else None
+
+
+class JsonArrayStreamParser:
+  """
+  Returns the objects of the first JSON array in the text fed to it, each one as soon as its
+  closing brace arrives. Text before the array (prose, a markdown fence) is skipped, as is
+  everything after it. An object that does not parse is logged and dropped, the rest still come
+  through.
+  """
+  def __init__(self):
+    self.started = False
+    self.done = False
+    self.found = 0
+    self.depth = 0
+    self.in_string = False
+    self.escaped = False
+    self.current: list[str] = []
+
+  def feed(self, text: str) -> list[dict]:
+    objects = []
+    # jump between the characters that change the state instead of looking at every one
+    pos, start = 0, 0
+    while pos < len(text) and not self.done:
+      if self.in_string:
+        if self.escaped:
+          self.escaped = False
+          pos += 1
+          continue
+        match = STRING_SPECIAL.search(text, pos)
+        if not match:
+          break
+        pos = match.end()
+        if match.group() == "\\":
+          self.escaped = True
+        else:
+          self.in_string = False
+        continue
+
+      match = STRUCTURAL.search(text, pos)
+      if not match:
+        break
+      char, pos = match.group(), match.end()
+      if not self.started:
+        self.started = char == "["
+      elif self.depth > 0:
+        if char == '"':
+          self.in_string = True
+        elif char in "{[":
+          self.depth += 1
+        else:
+          self.depth -= 1
+          if self.depth == 0:
+            self.current.append(text[start:pos])
+            parsed = loads_object("".join(self.current))
+            self.current = []
+            if parsed is not None:
+              self.found += 1
+              objects.append(parsed)
+      elif char == "{":
+        self.depth = 1
+        start = match.start()
+      elif char == "]":
+        # an array without objects ("[5] questions"), keep looking for the real one
+        self.done = self.found > 0
+        self.started = self.done
+
+    if self.depth > 0:
+      self.current.append(text[start:])
+    return objects
@@ -0,0 +1,125 @@
+"""
+Size bounded, on-disk LRU cache of material files downloaded from supabase storage.
+
+Entries are keyed by the storage path (material_file_url). Paths are never overwritten (uploads
+are timestamped), so an entry is only checked against the size recorded on the CourseMaterial.
+Hits are memory mapped and returned as a memoryview that pymupdf opens without copying.
+"""
+import hashlib
+import logging
+import mmap
+import os
+import tempfile
+from django.conf import settings
+
+from utils.metrics import incr, register_counter, register_gauge, set_gauge
+
+logger = logging.getLogger(__name__)
+
+HITS = register_counter("material_file_cache_hits_total", "Material downloads served from the local disk cache.")
+MISSES = register_counter("material_file_cache_misses_total", "Material downloads not found in the local disk cache.")
+INVALIDATIONS = register_counter("material_file_cache_invalidations_total", "Cached material files dropped because their size did not match.")
+EVICTIONS = register_counter("material_file_cache_evictions_total", "Cached material files evicted to stay under the size limit.")
+EVICTED_BYTES = register_counter("material_file_cache_evicted_bytes_total", "Bytes evicted from the material disk cache.")
+SIZE_BYTES = register_gauge("material_file_cache_size_bytes", "Bytes held by the material disk cache after the last write.")
+
+
+class MaterialFileCache:
+  def __init__(self, directory: str, max_bytes: int):
+    self.directory = directory
+    self.max_bytes = max_bytes
+
+  @property
+  def enabled(self) -> bool:
+    return self.max_bytes > 0
+
+  def _entry_path(self, material_path: str) -> str:
+    return os.path.join(self.directory, hashlib.sha256(material_path.encode()).hexdigest() + ".pdf")
+
+  def get(self, material_path: str, expected_size: int = 0) -> memoryview | None:
+    """
+    Returns a read-only, memory mapped view of the cached file, or None on a miss.
+
+    Args:
+      material_path (str): The storage path of the material.
+      expected_size (int): The file size recorded on the material, 0 if unknown.
+    """
+    if not self.enabled:
+      return None
+
+    entry_path = self._entry_path(material_path)
+    try:
+      with open(entry_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0 or (expected_size and size != expected_size):
+          logger.info(f"Dropping cached {material_path}, expected {expected_size} bytes but found {size}")
+          self._remove(entry_path)
+          incr(INVALIDATIONS)
+          incr(MISSES)
+          return None
+        # the mapping outlives the file descriptor
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except FileNotFoundError:
+      incr(MISSES)
+      return None
+
+    # mark as recently used for eviction
+    try:
+      os.utime(entry_path)
+    except OSError:
+      pass
+    incr(HITS)
+    return memoryview(mapped)
+
+  def put(self, material_path: str, data: bytes) -> None:
+    if not self.enabled or len(data) > self.max_bytes:
+      return
+
+    os.makedirs(self.directory, exist_ok=True)
+    # write to a temporary file first so readers never see a partial entry
+    fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+    try:
+      with os.fdopen(fd, "wb") as f:
+        f.write(data)
+      os.replace(tmp_path, self._entry_path(material_path))
+    except OSError as e:
+      logger.warning(f"Could not cache {material_path}: {str(e)}")
+      self._remove(tmp_path)
+      return
+    self.evict()
+
+  def evict(self) -> None:
+    """
+    Removes the least recently used entries until the cache fits in max_bytes.
+    """
+    entries = []
+    for entry in os.scandir(self.directory):
+      if not entry.name.endswith(".pdf"):
+        continue
+      try:
+        stat = entry.stat()
+      except FileNotFoundError:
+        # evicted by another process
+        continue
+      entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, entry_path in sorted(entries):
+      if total <= self.max_bytes:
+        break
+      # files that are still mapped by a reader stay readable after unlink
+      self._remove(entry_path)
+      total -= size
+      incr(EVICTIONS)
+      incr(EVICTED_BYTES, size)
+    set_gauge(SIZE_BYTES, total)
+
+  def _remove(self, path: str) -> None:
+    try:
+      os.remove(path)
+    except FileNotFoundError:
+      pass
+
+
+def get_material_file_cache() -> MaterialFileCache:
+  return MaterialFileCache(settings.MATERIAL_FILE_CACHE_DIR, settings.MATERIAL_FILE_CACHE_MAX_BYTES)
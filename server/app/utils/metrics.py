@@ -0,0 +1,63 @@
+"""
+Counters and gauges shared by every web and celery process through the django cache (redis),
+rendered in the prometheus text format by app.views.MetricsView.
+
+Metrics are best effort: a cache outage is logged and never fails the code being measured.
+"""
+import logging
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+METRIC_KEY_PREFIX = "metrics:"
+
+# name -> (type, help), filled in by the modules that record the metric
+_registry: dict[str, tuple[str, str]] = {}
+
+
+def register_counter(name: str, help_text: str) -> str:
+  _registry[name] = ("counter", help_text)
+  return name
+
+
+def register_gauge(name: str, help_text: str) -> str:
+  _registry[name] = ("gauge", help_text)
+  return name
+
+
+def incr(name: str, amount: int | float = 1) -> None:
+  key = f"{METRIC_KEY_PREFIX}{name}"
+  try:
+    try:
+      cache.incr(key, amount)
+    except ValueError:
+      # first increment, counters never expire
+      cache.add(key, 0, timeout=None)
+      cache.incr(key, amount)
+  except Exception as e:
+    logger.warning(f"Could not record metric {name}: {str(e)}")
+
+
+def set_gauge(name: str, value: int | float) -> None:
+  try:
+    cache.set(f"{METRIC_KEY_PREFIX}{name}", value, timeout=None)
+  except Exception as e:
+    logger.warning(f"Could not record metric {name}: {str(e)}")
+
+
+def get_metrics() -> dict[str, int | float]:
+  """
+  Returns the current value of every registered metric.
+  """
+  values = cache.get_many([f"{METRIC_KEY_PREFIX}{name}" for name in _registry])
+  return {name: values.get(f"{METRIC_KEY_PREFIX}{name}", 0) for name in sorted(_registry)}
+
+
+def render_prometheus(metrics: dict[str, int | float]) -> str:
+  lines = []
+  for name, value in metrics.items():
+    metric_type, help_text = _registry.get(name, ("untyped", ""))
+    lines.append(f"# HELP pamahres_{name} {help_text}")
+    lines.append(f"# TYPE pamahres_{name} {metric_type}")
+    lines.append(f"pamahres_{name} {value}")
+  return "\n".join(lines) + "\n"
@@ -0,0 +1,108 @@
+"""
+Selects which pages of a pdf are extracted for a quiz.
+
+A page selection is one of (case insensitive):
+  ""                   every page in order, extraction stops once the chunk budget is filled
+  "1-5, 8"             pages and inclusive page ranges, counted from 1
+  "chapter 3"          an outline entry titled "Chapter 3 ...", else the 3rd top-level entry
+  "chapter <title>"    the first outline entry whose title contains the text
+  "spread"             PDF_SPREAD_PAGES pages spread evenly over the document
+
+Only the page count and the outline are read to resolve a selection, and it never
+resolves to more than PDF_MAX_PAGES pages.
+"""
+import re
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+
+SPREAD = "spread"
+
+_RANGE_RE = re.compile(r"^(\d+)(?:-(\d+))?$")
+# "chapter" or "ch." then the chapter, a bare "ch" needs a space so titles like "challenge" are not read as one
+_CHAPTER_RE = re.compile(r"^(?:chapter(?=[\s\d])|ch\.|ch(?=\s))\s*(.+)$")
+
+
+def normalize_page_selection(selection: str | None) -> str:
+  """
+  Lowercases and collapses whitespace, so equal selections share cache entries.
+
+  Raises:
+    ValidationError: If the selection is not in one of the supported forms.
+  """
+  selection = " ".join((selection or "").lower().split())
+  if not selection or selection == SPREAD or _CHAPTER_RE.match(selection):
+    return selection
+  ranges = _parse_ranges(selection)
+  if ranges is None:
+    raise ValidationError(f"Invalid page selection: {selection!r}. Use pages like '1-5, 8', 'chapter 3' or 'spread'.")
+  return ", ".join(str(start) if start == stop else f"{start}-{stop}" for start, stop in ranges)
+
+
+def _parse_ranges(selection: str) -> list[tuple[int, int]] | None:
+  ranges = []
+  for part in selection.replace(" ", "").split(","):
+    match = _RANGE_RE.match(part)
+    if not match:
+      return None
+    start = int(match.group(1))
+    stop = int(match.group(2) or start)
+    if start < 1 or stop < start:
+      return None
+    ranges.append((start, stop))
+  return ranges
+
+
+def _spread_pages(page_count: int, count: int) -> list[int]:
+  count = min(page_count, count)
+  return [i * page_count // count for i in range(count)]
+
+
+def _chapter_pages(toc: list, page_count: int, chapter: str) -> list[int]:
+  # toc entries are [level, title, page], pages counted from 1 (-1 when the entry has no target)
+  entries = [(level, title, page) for level, title, page in toc if 1 <= page <= page_count]
+  selected = None
+  if chapter.isdigit():
+    title_re = re.compile(rf"\b(?:chapter|ch\.?)\s*{int(chapter)}\b", re.IGNORECASE)
+    selected = next((i for i, entry in enumerate(entries) if title_re.search(entry[1])), None)
+    if selected is None:
+      top_level = [i for i, entry in enumerate(entries) if entry[0] == 1]
+      if 1 <= int(chapter) <= len(top_level):
+        selected = top_level[int(chapter) - 1]
+  else:
+    selected = next((i for i, entry in enumerate(entries) if chapter in entry[1].lower()), None)
+  if selected is None:
+    raise ValidationError(f"No chapter {chapter!r} in the document outline.")
+
+  level, _, page = entries[selected]
+  # the chapter runs until the next entry at the same or a higher level
+  next_page = next((entry[2] for entry in entries[selected + 1:] if entry[0] <= level), page_count + 1)
+  return list(range(page - 1, max(page, next_page - 1)))
+
+
+def select_pages(doc, selection: str) -> list[int]:
+  """
+  Resolves a page selection against an open pymupdf document.
+
+  Returns:
+    list[int]: Page numbers (counted from 0) to extract, in order.
+  Raises:
+    ValidationError: If the selection does not match the document.
+  """
+  page_count = doc.page_count
+  selection = normalize_page_selection(selection)
+  if not selection:
+    pages = range(page_count)
+  elif selection == SPREAD:
+    pages = _spread_pages(page_count, min(settings.PDF_SPREAD_PAGES, settings.PDF_MAX_PAGES))
+  elif match := _CHAPTER_RE.match(selection):
+    toc = doc.get_toc(simple=True)
+    if not toc:
+      raise ValidationError("The document has no outline to select a chapter from.")
+    pages = _chapter_pages(toc, page_count, match.group(1))
+  else:
+    ranges = _parse_ranges(selection)
+    if any(stop > page_count for _, stop in ranges):
+      raise ValidationError(f"Page selection {selection!r} is out of range, the document has {page_count} pages.")
+    # overlapping ranges read each page once
+    pages = dict.fromkeys(page for start, stop in ranges for page in range(start - 1, stop))
+  return list(pages)[:settings.PDF_MAX_PAGES]
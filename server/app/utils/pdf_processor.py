@@ -1,84 +1,458 @@
+from collections import deque
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from contextlib import closing
+from itertools import chain, islice
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
 from rest_framework.exceptions import ValidationError
 from supabase_client import supabase
+from utils.extraction_cache import (
+  compute_content_hash, get_cached_paragraphs, set_cached_paragraphs, get_cached_chunks, set_cached_chunks,
+)
+from utils.material_file_cache import get_material_file_cache
+from utils.page_selection import SPREAD, normalize_page_selection, select_pages
+from utils.tokens import get_encoding
 import pymupdf
 import logging
+import math
+import multiprocessing
+import tempfile
 
 logger = logging.getLogger(__name__)
 
-# Use supabase here, initialize the client, fetch the pdf as a list,
-# the return as a list of pdfs
+def _download_material(material_path: str) -> bytes:
+  # Supabase download returns bytes directly
+  pdf_data = supabase.storage.from_('materials-all').download(material_path)
+  if not pdf_data:
+    raise ValidationError(f"Failed to download {material_path}")
+  return pdf_data
+
+
+# Use supabase here, fetch the pdfs concurrently and return them as a list,
+# in the same order as material_list.
 # It will be returned to extract_pdf_content and will be processed
 def fetch_pdf(material_list: list) -> list:
+  """
+  Returns the file of every material, from the local disk cache or from supabase storage.
+
+  Cached files come back as memory mapped memoryviews, downloaded files as bytes. Downloads run
+  on a bounded thread pool (PDF_FETCH_MAX_WORKERS) sharing the supabase storage client, so
+  fetching N files takes about as long as the slowest one. Every download is limited to
+  PDF_FETCH_TIMEOUT seconds.
+
+  Raises:
+    ValidationError: If any file fails or times out, listing every failed file and the reason.
+  """
+  file_cache = get_material_file_cache()
+  pdf_files: list = [
+    file_cache.get(material.material_file_url, expected_size=material.file_size or 0)
+    for material in material_list
+  ]
+  missing: list[int] = [idx for idx, pdf_data in enumerate(pdf_files) if pdf_data is None]
+  if not missing:
+    return pdf_files
+
+  material_paths: list[str] = [material_list[idx].material_file_url for idx in missing]
+  workers = max(1, min(settings.PDF_FETCH_MAX_WORKERS, len(material_paths)))
+  executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pdf-fetch")
   try:
-    pdf_files = []
-    for material in material_list:
-      material_path: str = material.material_file_url
-      try:
-        # Supabase download returns bytes directly
-        pdf_data = supabase.storage.from_('materials-all').download(material_path)
-        if pdf_data:  # If we got the data successfully
-          pdf_files.append(pdf_data)
-        else:
-          raise ValidationError(f"Failed to download {material_path}")
-      except Exception as e:
-        raise ValidationError(f"Failed to download {material_path}: {str(e)}")
-  except Exception as e:
-    raise ValidationError(f"Error fetching PDF: {str(e)}")
+    futures = [executor.submit(_download_material, material_path) for material_path in material_paths]
+    # downloads queued behind a full pool get their own timeout window
+    deadline = settings.PDF_FETCH_TIMEOUT * math.ceil(len(material_paths) / workers)
+    wait(futures, timeout=deadline)
+  finally:
+    # do not block on downloads that are still hanging
+    executor.shutdown(wait=False, cancel_futures=True)
+
+  failures = []
+  for idx, material_path, future in zip(missing, material_paths, futures):
+    if not future.done():
+      failures.append(f"{material_path}: timed out")
+    elif future.exception() is not None:
+      failures.append(f"{material_path}: {str(future.exception())}")
+    else:
+      pdf_files[idx] = future.result()
+      file_cache.put(material_path, pdf_files[idx])
+
+  if failures:
+    logger.error(f"Failed to download {len(failures)} of {len(material_paths)} materials: {failures}")
+    raise ValidationError(f"Error fetching PDF: failed to download {'; '.join(failures)}")
   return pdf_files
 
 import unicodedata
-import re
+
+# control characters (except the newline) and DEL, dropped once the text is plain ascii
+_CONTROL_BYTES = bytes(c for c in range(0x20) if c != 0x0A) + b"\x7f"
 
 def clean_text(text: str) -> str:
   """
   Cleans the extracted text by normalizing unicode, removing non-printable characters,
   and collapsing excessive whitespace while preserving paragraph breaks.
+
+  Equivalent to NFKC normalization, keeping only printable ascii and newlines, collapsing blank
+  lines into one paragraph break, collapsing runs of spaces and stripping every line, but done
+  in a single pass over the lines instead of one full copy of the text per step.
   """
   if not text:
       return ""
-  # Normalize unicode
-  text = unicodedata.normalize("NFKC", text)
+  # Normalize unicode, ascii text is already NFKC
+  if not text.isascii() and not unicodedata.is_normalized("NFKC", text):
+    text = unicodedata.normalize("NFKC", text)
   # Remove non-printable/control characters except newlines
-  text = re.sub(r"[^\x20-\x7E\n]", "", text)
-  # Replace multiple newlines with double newline (paragraph)
-  text = re.sub(r"\n\s*\n+", "\n\n", text)
-  # Collapse multiple spaces/tabs
-  text = re.sub(r"[ \t]+", " ", text)
-  # Strip leading/trailing whitespace on each line
-  text = "\n".join(line.strip() for line in text.splitlines())
-  return text.strip()
+  data = text.encode("ascii", "ignore").translate(None, _CONTROL_BYTES)
 
+  parts: list[bytes] = []
+  blank_line = False
+  for line in data.split(b"\n"):
+    # strip the line and collapse runs of spaces (only spaces are left at this point)
+    line = b" ".join(line.split())
+    if not line:
+      blank_line = True
+      continue
+    # one or more blank lines between two lines become a single paragraph break
+    if parts:
+      parts.append(b"\n\n" if blank_line else b"\n")
+    parts.append(line)
+    blank_line = False
+  return b"".join(parts).decode("ascii")
 
-def extract_pdf_content(material_list: list) -> str:
+
+# blocks with this many characters or fewer are dropped (page numbers, headers, stray labels)
+MIN_BLOCK_CHARS = 20
+
+def _extract_page_text(page) -> str:
+    """
+    Extracts the text of a single page, keeping blocks in reading order and
+    dropping short blocks (page numbers, headers, stray labels).
+    """
+    blocks = page.get_text("blocks")
+    blocks.sort(key=lambda b: (b[1], b[0]))  # vertical, then horizontal
+    page_text = "\n".join(b[4] for b in blocks if len(b[4].strip()) > MIN_BLOCK_CHARS)
+    return page_text.strip()
+
+
+def _extract_page_range(pdf_path: str, start: int, stop: int) -> list[str]:
     """
-    Extracts and cleans text content from a list of PDF materials.
+    Extracts pages [start, stop) of a pdf. Runs inside the extraction pool, every worker
+    opens the document from disk instead of receiving a copy of it with each range.
     """
-    pdf_files = fetch_pdf(material_list)
-    if not pdf_files:
-        raise ValidationError("No PDF files found in the provided materials.")
+    with pymupdf.open(pdf_path) as doc:
+        return [_extract_page_text(doc[page_number]) for page_number in range(start, stop)]
+
+
+def _page_batches(page_numbers: Sequence[int], batch_size: int) -> list[tuple[int, int]]:
+    """
+    Splits ordered page numbers into (start, stop) ranges of consecutive pages, at most batch_size pages each.
+    """
+    batch_size = max(1, batch_size)
+    batches: list[tuple[int, int]] = []
+    for page_number in page_numbers:
+        if batches and batches[-1][1] == page_number and page_number - batches[-1][0] < batch_size:
+            batches[-1] = (batches[-1][0], page_number + 1)
+        else:
+            batches.append((page_number, page_number + 1))
+    return batches
+
 
-    content_parts = []
-    for idx, material in enumerate(pdf_files):
+# the pool is created on first use and kept for the life of the process
+_extraction_executor = None
+
+def get_extraction_executor() -> ProcessPoolExecutor:
+    global _extraction_executor
+    if _extraction_executor is None:
+        _extraction_executor = ProcessPoolExecutor(max_workers=settings.PDF_EXTRACTION_WORKERS)
+    return _extraction_executor
+
+
+def _reset_extraction_executor() -> None:
+    global _extraction_executor
+    if _extraction_executor is not None:
+        _extraction_executor.shutdown(wait=False, cancel_futures=True)
+    _extraction_executor = None
+
+
+def _iter_pages_serial(pdf_path: str, page_numbers: list[int]) -> Iterator[str]:
+    with pymupdf.open(pdf_path) as doc:
+        for page_number in page_numbers:
+            yield _extract_page_text(doc[page_number])
+
+
+def _iter_pages_parallel(pdf_data: bytes | memoryview, page_numbers: list[int], workers: int) -> Iterator[str]:
+    batches = iter(_page_batches(page_numbers, settings.PDF_EXTRACTION_BATCH_PAGES))
+    pending: deque = deque()
+    yielded = 0
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as pdf_file:
+        pdf_file.write(pdf_data)
+        pdf_file.flush()
         try:
-            with pymupdf.open(stream=material, filetype="pdf") as doc:
-                for page in doc:
-                  blocks = page.get_text("blocks")
-                  blocks.sort(key=lambda b: (b[1], b[0]))  # vertical, then horizontal
-                  page_text = "\n".join(b[4] for b in blocks if len(b[4].strip()) > 20)
-                  content_parts.append(page_text.strip())
+            executor = get_extraction_executor()
+            # keep one batch in flight per worker, so a consumer that stops early wastes at most that much work
+            for start, stop in islice(batches, workers):
+                pending.append(executor.submit(_extract_page_range, pdf_file.name, start, stop))
         except Exception as e:
-            # Optionally log the error and continue
-            # print(f"Error extracting text from PDF {idx}: {str(e)}")
-            logger.error(f"Error extracting text from PDF {idx}: {str(e)}")
-            continue
-    content = "\n\n".join(content_parts)
-    return clean_text(content)
+            # the pool could not start its workers (not allowed to fork here, out of processes)
+            logger.warning(f"Extraction pool failed to start, falling back to serial extraction: {str(e)}")
+            for future in pending:
+                future.cancel()
+            _reset_extraction_executor()
+            yield from _iter_pages_serial(pdf_file.name, page_numbers)
+            return
 
-def chunk_text(text: str, chunk_size: int = 3000, max_chunks: int = 4) -> list[str]:
+        try:
+            while pending:
+                pages = pending.popleft().result()
+                for start, stop in islice(batches, 1):
+                    pending.append(executor.submit(_extract_page_range, pdf_file.name, start, stop))
+                for page_text in pages:
+                    yielded += 1
+                    yield page_text
+        except BrokenProcessPool as e:
+            # a worker died (oom, killed), drop the pool so the next call starts a fresh one
+            logger.warning(f"Extraction pool broke, falling back to serial extraction: {str(e)}")
+            _reset_extraction_executor()
+            yield from _iter_pages_serial(pdf_file.name, page_numbers[yielded:])
+        finally:
+            # the consumer stopped early (or failed), skip the batches nobody will read
+            for future in pending:
+                future.cancel()
+
+
+def iter_pdf_pages(pdf_data: bytes | memoryview, workers: int | None = None, page_selection: str = "") -> Iterator[str]:
     """
-    Splits the text into chunks of up to chunk_size characters, trying to split at paragraph boundaries.
+    Lazily yields the text of the selected pages of a pdf, in page order.
+
+    Selections with at least PDF_PARALLEL_MIN_PAGES pages are extracted in batches of
+    PDF_EXTRACTION_BATCH_PAGES pages across the process pool, smaller ones serially in the
+    current process. Either way, pages are only extracted as far ahead as the consumer reads.
+
+    Args:
+        pdf_data (bytes | memoryview): The raw pdf file.
+        workers (int | None): Batches to keep in flight. Defaults to PDF_EXTRACTION_WORKERS.
+        page_selection (str): Pages to read, see utils.page_selection. Defaults to every page
+            (up to PDF_MAX_PAGES).
+    Raises:
+        ValidationError: If the page selection does not match the document.
+    """
+    workers = settings.PDF_EXTRACTION_WORKERS if workers is None else workers
+    with pymupdf.open(stream=pdf_data, filetype="pdf") as doc:
+        # only the page count and outline are read here
+        page_numbers = select_pages(doc, page_selection)
+        # celery prefork workers are daemon processes, which may not start a pool of their own
+        if workers <= 1 or len(page_numbers) < settings.PDF_PARALLEL_MIN_PAGES or multiprocessing.current_process().daemon:
+            for page_number in page_numbers:
+                yield _extract_page_text(doc[page_number])
+            return
+    yield from _iter_pages_parallel(pdf_data, page_numbers, workers)
+
+
+def extract_pages(pdf_data: bytes | memoryview, workers: int | None = None, page_selection: str = "") -> list[str]:
+    """
+    Extracts the text of the selected pages of a pdf, in page order.
     """
-    paragraphs = text.split('\n\n')
+    return list(iter_pdf_pages(pdf_data, workers, page_selection))
+
+
+def iter_paragraphs(pages: Iterable[str]) -> Iterator[str]:
+    """
+    Cleans each page as it arrives and yields its paragraphs. Joining the result with blank lines
+    gives the same text as cleaning the whole document at once.
+    """
+    for page_text in pages:
+        cleaned = clean_text(page_text)
+        if cleaned:
+            yield from cleaned.split("\n\n")
+
+
+def extract_pdf_text(pdf_data: bytes | memoryview) -> str:
+    """
+    Extracts and cleans the full text content of a single pdf.
+    """
+    return "\n\n".join(iter_paragraphs(iter_pdf_pages(pdf_data)))
+
+
+def _spread_budgeted_paragraphs(pdf_data: bytes | memoryview, **chunk_options) -> list[str]:
+    # every sampled page gets a share of the budget: the chunker is fed the pages' paragraphs
+    # round robin, and the ones it took are handed back in page order
+    pages = [list(iter_paragraphs([page_text])) for page_text in iter_pdf_pages(pdf_data, page_selection=SPREAD)]
+    order = sorted(
+        ((para_idx, page_idx) for page_idx, paragraphs in enumerate(pages) for para_idx in range(len(paragraphs))),
+    )
+    consumed: list[tuple[int, int]] = []
+
+    def record() -> Iterator[str]:
+        for para_idx, page_idx in order:
+            consumed.append((page_idx, para_idx))
+            yield pages[page_idx][para_idx]
+
+    chunk_paragraphs(record(), **chunk_options)
+    return [pages[page_idx][para_idx] for page_idx, para_idx in sorted(consumed)]
+
+
+def extract_budgeted_paragraphs(pdf_data: bytes | memoryview, page_selection: str = "", **chunk_options) -> list[str]:
+    """
+    Extracts the paragraphs of the selected pages of a pdf until they fill the chunk budget
+    (see chunk_paragraphs for the options) and stops reading the document there.
+
+    The result is every paragraph the chunker looked at, which is all that can ever be kept
+    from this file, whether it is chunked alone or after other materials. A "spread" selection
+    reads all of its sampled pages and keeps the leading paragraphs of each.
+    """
+    if normalize_page_selection(page_selection) == SPREAD:
+        return _spread_budgeted_paragraphs(pdf_data, **chunk_options)
+
+    consumed: list[str] = []
+
+    def record(paragraphs: Iterable[str]) -> Iterator[str]:
+        for paragraph in paragraphs:
+            consumed.append(paragraph)
+            yield paragraph
+
+    with closing(iter_pdf_pages(pdf_data, page_selection=page_selection)) as pages:
+        chunk_paragraphs(record(iter_paragraphs(pages)), **chunk_options)
+    return consumed
+
+
+def _cache_options(page_selection: str, chunk_options: dict) -> dict:
+    # whole-document entries keep the keys they had before page selections existed
+    if not page_selection:
+        return chunk_options
+    return {**chunk_options, "page_selection": page_selection}
+
+
+def extract_material_paragraphs(material_list: list, page_selection: str = "", **chunk_options) -> list[list[str] | None]:
+    """
+    Returns the budgeted paragraphs of the selected pages of every material, in the order of material_list.
+    Materials whose extraction failed get None instead of their paragraphs.
+
+    The paragraphs of each file are cached by its content hash and the page selection, so materials
+    whose content_hash is already known and cached are neither downloaded nor parsed again.
+    """
+    page_selection = normalize_page_selection(page_selection)
+    cache_options = _cache_options(page_selection, chunk_options)
+    paragraphs: dict[int, list[str]] = {}
+    cached = get_cached_paragraphs([material.content_hash for material in material_list], **cache_options)
+    for material in material_list:
+        if material.content_hash in cached:
+            paragraphs[material.id] = cached[material.content_hash]
+
+    missing = [material for material in material_list if material.id not in paragraphs]
+    if missing:
+        pdf_files = fetch_pdf(missing)
+        if not pdf_files:
+            raise ValidationError("No PDF files found in the provided materials.")
+
+        for idx, (material, pdf_data) in enumerate(zip(missing, pdf_files)):
+            content_hash = compute_content_hash(pdf_data)
+            if material.content_hash != content_hash:
+                material.content_hash = content_hash
+                material.save(update_fields=['content_hash'])
+
+            # another material may have the same file
+            material_paragraphs = get_cached_paragraphs([content_hash], **cache_options).get(content_hash)
+            if material_paragraphs is None:
+                try:
+                    material_paragraphs = extract_budgeted_paragraphs(pdf_data, page_selection, **chunk_options)
+                except ValidationError:
+                    # the page selection does not fit this file, the user has to fix it
+                    raise
+                except Exception as e:
+                    logger.error(f"Error extracting text from PDF {idx}: {str(e)}")
+                    continue
+                set_cached_paragraphs(content_hash, material_paragraphs, **cache_options)
+            paragraphs[material.id] = material_paragraphs
+
+    return [paragraphs.get(material.id) for material in material_list]
+
+
+def get_material_chunks(material_list: list, page_selection: str = "", **chunk_options) -> list[str]:
+    """
+    Extracts the selected pages of the materials and splits their combined content into chunks,
+    reusing the cached chunk list when every material's file has been seen before with the same
+    page selection. See chunk_paragraphs for the options and utils.page_selection for the selections.
+    """
+    page_selection = normalize_page_selection(page_selection)
+    cache_options = _cache_options(page_selection, chunk_options)
+    content_hashes = [material.content_hash for material in material_list]
+    chunks = get_cached_chunks(content_hashes, **cache_options)
+    if chunks is not None:
+        logger.info(f"Using cached chunks for materials {[material.id for material in material_list]}")
+        return chunks
+
+    material_paragraphs = extract_material_paragraphs(material_list, page_selection, **chunk_options)
+    chunks = chunk_paragraphs(chain.from_iterable(filter(None, material_paragraphs)), **chunk_options)
+    if not chunks:
+        return []
+    if None in material_paragraphs:
+        # a file failed to extract, the next request retries it instead of reading a quiz without it for a week
+        logger.warning(f"Not caching chunks of materials {[material.id for material in material_list]}, some failed to extract")
+        return chunks
+    # hashes are filled in by extract_material_paragraphs
+    set_cached_chunks([material.content_hash for material in material_list], chunks, **cache_options)
+    return chunks
+
+
+def _chunk_paragraphs_by_tokens(paragraphs: Iterable[str], max_tokens: int, max_chunks: int, overlap_tokens: int) -> list[str]:
+    encoding = get_encoding()
+    separator = encoding.encode("\n\n")
+    # the overlap must leave room for new content in every chunk
+    overlap_tokens = max(0, min(overlap_tokens, (max_tokens - len(separator)) // 2))
+    chunks: list[str] = []
+    current: list[int] = []
+    has_new_content = False
+
+    def close_chunk() -> None:
+        nonlocal current, has_new_content
+        chunks.append(encoding.decode(current).strip())
+        current = current[-overlap_tokens:] if overlap_tokens else []
+        has_new_content = False
+
+    for para in paragraphs:
+        tokens = encoding.encode(para, disallowed_special=())
+        while tokens:
+            joiner = separator if current else []
+            room = max_tokens - len(current) - len(joiner)
+            if len(tokens) <= room:
+                current += joiner + tokens
+                has_new_content = True
+                tokens = []
+            elif has_new_content:
+                # does not fit, close the chunk and retry on a fresh one
+                close_chunk()
+            else:
+                # longer than a whole chunk, split the paragraph at the budget instead of truncating it
+                current += joiner + tokens[:room]
+                tokens = tokens[room:]
+                close_chunk()
+            if len(chunks) >= max_chunks:
+                return chunks
+    if has_new_content:
+        chunks.append(encoding.decode(current).strip())
+    return chunks
+
+
+def chunk_paragraphs(
+    paragraphs: Iterable[str], chunk_size: int = 3000, max_chunks: int = 4,
+    max_tokens: int | None = None, overlap_tokens: int = 0,
+) -> list[str]:
+    """
+    Packs paragraphs into chunks. Paragraphs are pulled lazily and nothing past the last kept
+    chunk is read.
+
+    Args:
+        paragraphs (Iterable[str]): Cleaned paragraphs, in document order.
+        chunk_size (int): Maximum characters per chunk, used when max_tokens is not given.
+        max_chunks (int): Maximum number of chunks returned.
+        max_tokens (int | None): Maximum tokens per chunk. Paragraphs longer than this are
+            split across chunks instead of producing an oversized chunk.
+        overlap_tokens (int): Tokens from the end of each chunk repeated at the start of the next,
+            only with max_tokens.
+    Returns:
+        list[str]: At most max_chunks chunks.
+    """
+    if max_tokens is not None:
+        return _chunk_paragraphs_by_tokens(paragraphs, max_tokens, max_chunks, overlap_tokens)
+
     chunks = []
     current_chunk = ""
     for para in paragraphs:
@@ -97,4 +471,11 @@ def chunk_text(text: str, chunk_size: int = 3000, max_chunks: int = 4) -> list[s
     # Add the last chunk if it exists and we haven't reached the max chunks
     if current_chunk and len(chunks) < max_chunks:
         chunks.append(current_chunk.strip())
-    return chunks[:max_chunks]
\ No newline at end of file
+    return chunks[:max_chunks]
+
+
+def chunk_text(text: str, chunk_size: int = 3000, max_chunks: int = 4) -> list[str]:
+    """
+    Splits the text into chunks of up to chunk_size characters, trying to split at paragraph boundaries.
+    """
+    return chunk_paragraphs(text.split('\n\n'), chunk_size=chunk_size, max_chunks=max_chunks)
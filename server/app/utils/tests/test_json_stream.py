@@ -0,0 +1,41 @@
+import json
+
+from django.test import SimpleTestCase
+
+from utils.json_stream import JsonArrayStreamParser
+
+QUESTIONS = [
+    {"question": "Is {this} a \"brace\" in a string?", "type": "TF", "answer": "true"},
+    {"question": "Pick one", "type": "MCQ", "options": ["[a]", "b\\\\", "c", "d"], "answer": "a"},
+]
+
+
+def feed_in_pieces(text: str, size: int) -> list[list[dict]]:
+    parser = JsonArrayStreamParser()
+    return [parser.feed(text[i:i + size]) for i in range(0, len(text), size)]
+
+
+class JsonArrayStreamParserTest(SimpleTestCase):
+    def test_objects_come_out_as_they_close(self):
+        text = json.dumps(QUESTIONS)
+        first_end = text.index("}, {") + 1
+        parser = JsonArrayStreamParser()
+        self.assertEqual(parser.feed(text[:first_end - 1]), [])
+        self.assertEqual(parser.feed(text[first_end - 1:first_end + 10]), [QUESTIONS[0]])
+        self.assertEqual(parser.feed(text[first_end + 10:]), [QUESTIONS[1]])
+
+    def test_any_split_gives_the_same_objects(self):
+        text = json.dumps(QUESTIONS, indent=2)
+        for size in (1, 3, 7, len(text)):
+            parsed = [obj for piece in feed_in_pieces(text, size) for obj in piece]
+            self.assertEqual(parsed, QUESTIONS)
+
+    def test_prose_and_fences_are_skipped(self):
+        text = "Here are your questions:\n```json\n" + json.dumps(QUESTIONS) + "\n```\nGood luck! [{\"x\": 1}]"
+        parser = JsonArrayStreamParser()
+        self.assertEqual(parser.feed(text), QUESTIONS)
+        self.assertTrue(parser.done)
+
+    def test_broken_object_is_dropped(self):
+        text = '[{"question": "a", "type": "TF" "answer": "true"}, ' + json.dumps(QUESTIONS[0]) + "]"
+        self.assertEqual(JsonArrayStreamParser().feed(text), [QUESTIONS[0]])
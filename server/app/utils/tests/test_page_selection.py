@@ -0,0 +1,133 @@
+from django.test import SimpleTestCase, override_settings
+from unittest.mock import patch
+from rest_framework.exceptions import ValidationError
+import pymupdf
+
+from utils import pdf_processor
+from utils.page_selection import normalize_page_selection, select_pages
+from utils.pdf_processor import extract_budgeted_paragraphs, extract_pages
+
+
+def make_book(page_count: int, toc: list | None = None) -> pymupdf.Document:
+    doc = pymupdf.open()
+    for i in range(page_count):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Page {i} opens with a sentence long enough to be kept.")
+        page.insert_text((72, 300), f"Page {i} has a second block further down the page.")
+    if toc:
+        doc.set_toc(toc)
+    return doc
+
+
+BOOK_TOC = [
+    [1, "Preface", 1],
+    [1, "Chapter 1: Basics", 2],
+    [2, "1.1 Definitions", 3],
+    [1, "Chapter 2: Thermodynamics", 6],
+    [1, "Chapter 3: Entropy", 10],
+    [2, "3.1 Disorder", 12],
+    [1, "Index", 18],
+]
+
+
+class NormalizePageSelectionTest(SimpleTestCase):
+    def test_normalizes_supported_selections(self):
+        self.assertEqual(normalize_page_selection(None), "")
+        self.assertEqual(normalize_page_selection("  Spread "), "spread")
+        self.assertEqual(normalize_page_selection("Chapter   3"), "chapter 3")
+        self.assertEqual(normalize_page_selection("1 - 5,8, 8-8"), "1-5, 8, 8")
+
+    def test_rejects_invalid_selections(self):
+        for selection in ["0", "5-2", "pages 1 to 3", "1-", "a-b", "challenge", "chemistry basics", "chapters"]:
+            with self.subTest(selection=selection), self.assertRaises(ValidationError):
+                normalize_page_selection(selection)
+
+
+class SelectPagesTest(SimpleTestCase):
+    def setUp(self):
+        self.doc = make_book(20, BOOK_TOC)
+        self.addCleanup(self.doc.close)
+
+    def test_every_page_by_default(self):
+        self.assertEqual(select_pages(self.doc, ""), list(range(20)))
+
+    def test_page_ranges(self):
+        self.assertEqual(select_pages(self.doc, "3-5, 1, 4"), [2, 3, 4, 0])
+
+    def test_page_range_out_of_the_document(self):
+        with self.assertRaises(ValidationError):
+            select_pages(self.doc, "15-25")
+
+    def test_chapter_by_number_in_title(self):
+        # "chapter 3" runs to the next top-level entry, its subsection included
+        self.assertEqual(select_pages(self.doc, "chapter 3"), list(range(9, 17)))
+
+    def test_chapter_by_position(self):
+        doc = make_book(6, [[1, "Intro", 1], [1, "Motion", 3], [1, "Energy", 5]])
+        self.addCleanup(doc.close)
+        self.assertEqual(select_pages(doc, "chapter 2"), [2, 3])
+        self.assertEqual(select_pages(doc, "chapter 3"), [4, 5])
+
+    def test_chapter_by_title(self):
+        self.assertEqual(select_pages(self.doc, "chapter thermodynamics"), [5, 6, 7, 8])
+        self.assertEqual(select_pages(self.doc, "ch definitions"), [2, 3, 4])
+
+    def test_chapter_prefixes(self):
+        for selection in ["ch 2", "ch. 2", "ch.2", "chapter2"]:
+            with self.subTest(selection=selection):
+                self.assertEqual(select_pages(self.doc, selection), [5, 6, 7, 8])
+
+    def test_title_starting_with_ch_is_matched_whole(self):
+        doc = make_book(6, [[1, "Intro", 1], [1, "Challenge problems", 3], [1, "Chemistry basics", 5]])
+        self.addCleanup(doc.close)
+        self.assertEqual(select_pages(doc, "chapter challenge"), [2, 3])
+        self.assertEqual(select_pages(doc, "ch chemistry"), [4, 5])
+
+    def test_unknown_chapter(self):
+        with self.assertRaises(ValidationError):
+            select_pages(self.doc, "chapter 9")
+
+    def test_chapter_without_outline(self):
+        doc = make_book(3)
+        self.addCleanup(doc.close)
+        with self.assertRaises(ValidationError):
+            select_pages(doc, "chapter 1")
+
+    @override_settings(PDF_SPREAD_PAGES=4)
+    def test_spread(self):
+        self.assertEqual(select_pages(self.doc, "spread"), [0, 5, 10, 15])
+
+    @override_settings(PDF_MAX_PAGES=5)
+    def test_max_pages(self):
+        self.assertEqual(select_pages(self.doc, ""), list(range(5)))
+        self.assertEqual(select_pages(self.doc, "chapter 3"), list(range(9, 14)))
+
+
+class SelectedExtractionTest(SimpleTestCase):
+    def setUp(self):
+        doc = make_book(40, BOOK_TOC)
+        self.pdf_data = doc.tobytes()
+        doc.close()
+
+    @override_settings(PDF_PARALLEL_MIN_PAGES=4, PDF_EXTRACTION_BATCH_PAGES=3)
+    def test_parallel_selection_matches_serial(self):
+        parallel = extract_pages(self.pdf_data, workers=2, page_selection="2-8, 30-33")
+        serial = extract_pages(self.pdf_data, workers=1, page_selection="2-8, 30-33")
+        self.assertEqual(parallel, serial)
+        self.assertTrue(serial[0].startswith("Page 1 opens"))
+        self.assertTrue(serial[-1].startswith("Page 32 opens"))
+
+    def test_chapter_only_parses_its_pages(self):
+        with patch('utils.pdf_processor._extract_page_text', wraps=pdf_processor._extract_page_text) as mock_extract:
+            paragraphs = extract_budgeted_paragraphs(self.pdf_data, "chapter 2", chunk_size=10000, max_chunks=4)
+        self.assertEqual(mock_extract.call_count, 4)
+        self.assertTrue(paragraphs[0].startswith("Page 5 opens"))
+
+    @override_settings(PDF_SPREAD_PAGES=8)
+    def test_spread_shares_the_budget_across_pages(self):
+        paragraphs = extract_budgeted_paragraphs(self.pdf_data, "spread", chunk_size=300, max_chunks=2)
+        # the budget fits about one paragraph per sampled page, in page order
+        opening = [paragraph for paragraph in paragraphs if "opens" in paragraph]
+        self.assertEqual(opening[0].split()[1], "0")
+        self.assertEqual(opening[-1].split()[1], "35")
+        self.assertLess(len(paragraphs), 16)
@@ -0,0 +1,76 @@
+import json
+import random
+
+from django.test import SimpleTestCase
+
+from utils.utils import parse_llm_response
+
+ALPHABET = 'abc {}[]",:\\\n'
+
+
+def make_questions(rng: random.Random, count: int) -> list[dict]:
+    questions = []
+    for i in range(count):
+        text = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 20)))
+        if rng.random() < 0.5:
+            questions.append({"question": f"{i} {text}", "type": "TF", "answer": rng.choice(["true", "false"])})
+        else:
+            options = ["".join(rng.choice(ALPHABET) for _ in range(5)) for _ in range(4)]
+            questions.append({"question": f"{i} {text}", "type": "MCQ", "options": options, "answer": rng.choice("abcd")})
+    return questions
+
+
+def render(questions: list[dict], indent: int | None) -> tuple[str, list[int]]:
+    """
+    Returns the array and the offset right after each object's closing brace.
+    """
+    text, ends = "[", []
+    for i, question in enumerate(questions):
+        text += ("\n" if indent else "") + ("," if i else "") + json.dumps(question, indent=indent)
+        ends.append(len(text))
+    return text + "\n]", ends
+
+
+class ParseLlmResponseTest(SimpleTestCase):
+    def test_well_formed(self):
+        questions = make_questions(random.Random(0), 3)
+        self.assertEqual(parse_llm_response(json.dumps(questions)), questions)
+
+    def test_prose_fences_and_brackets_around_the_array(self):
+        questions = make_questions(random.Random(1), 2)
+        raw = f"Here are [2] questions:\n```json\n{json.dumps(questions)}\n```\nSee [1]."
+        self.assertEqual(parse_llm_response(raw), questions)
+
+    def test_trailing_commas(self):
+        raw = '[{"question": "a", "type": "TF", "answer": "true",}, {"question": "b", "type": "MCQ", "options": ["x", "y",], "answer": "a"},]'
+        self.assertEqual([question["question"] for question in parse_llm_response(raw)], ["a", "b"])
+
+    def test_no_array(self):
+        for raw in ["", "Sorry, I cannot help with that.", "[1, 2, 3]", '[{"question": "cut off']:
+            with self.assertRaises(ValueError):
+                parse_llm_response(raw)
+
+    def test_fuzz_truncated_responses_keep_every_complete_object(self):
+        rng = random.Random(42)
+        for _ in range(300):
+            questions = make_questions(rng, rng.randint(1, 8))
+            text, ends = render(questions, rng.choice([None, 2]))
+            raw = rng.choice(["", "Sure!\n", "```json\n"]) + text
+            offset = len(raw) - len(text)
+            cut = rng.randint(offset + ends[0], len(raw))
+            expected = [question for question, end in zip(questions, ends) if offset + end <= cut]
+            self.assertEqual(parse_llm_response(raw[:cut]), expected)
+
+    def test_fuzz_garbage_only_raises_value_error(self):
+        rng = random.Random(7)
+        for _ in range(500):
+            raw = "".join(rng.choice(ALPHABET + "0123456789") for _ in range(rng.randint(0, 80)))
+            try:
+                result = parse_llm_response(raw)
+            except ValueError:
+                continue
+            self.assertTrue(all(isinstance(item, dict) for item in result))
+
+    def test_commas_inside_strings_are_kept(self):
+        raw = '[{"question": "Is [a,] or {b,} valid?", "type": "TF", "answer": "false",},]'
+        self.assertEqual(parse_llm_response(raw)[0]["question"], "Is [a,] or {b,} valid?")
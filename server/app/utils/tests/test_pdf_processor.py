@@ -0,0 +1,307 @@
+from django.test import SimpleTestCase, TestCase, override_settings
+from unittest.mock import patch
+from rest_framework.exceptions import ValidationError
+from types import SimpleNamespace
+import os
+import pymupdf
+import random
+import tempfile
+import tiktoken
+import time
+
+from courses.management.commands.benchmark_clean_text import legacy_clean_text
+from courses.models import Course, CourseMaterial
+from user.models import User
+from utils.extraction_cache import compute_content_hash
+from utils.material_file_cache import MaterialFileCache
+from utils.tokens import get_chunk_options
+from utils import pdf_processor
+from utils.pdf_processor import (
+    chunk_text, clean_text, extract_budgeted_paragraphs, extract_pages, fetch_pdf, get_material_chunks, _page_batches,
+)
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+# one token per byte, so tests do not need to download the real bpe ranks
+BYTE_ENCODING = tiktoken.Encoding(
+    name='bytes', pat_str=r"\S+|\s+", mergeable_ranks={bytes([i]): i for i in range(256)}, special_tokens={}
+)
+
+
+def make_pdf(page_count: int) -> bytes:
+    doc = pymupdf.open()
+    for i in range(page_count):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Page {i} opens with a sentence long enough to be kept.")
+        page.insert_text((72, 300), f"Page {i} has a second block further down the page.")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+class CleanTextTest(SimpleTestCase):
+    def test_matches_the_regex_pipeline(self):
+        samples = [
+            "",
+            "  Title\t\twith   tabs  \n\n\n  body line one\nbody line two  \n \n\n",
+            "\ufb01rst ligature, full\u3000width \uff21, caf\u00e9 and e\u0301\r\nwindows lines",
+            "\x00control\x07 chars\x7f and \u2028separators\u0085 \x0c\x0b\n \n \nend",
+        ]
+        alphabet = ["a", "b", " ", "  ", "\n", "\n\n", "\t", "\r", "\x0b", "\x0c", "\x00", "\x7f",
+                    "\u00a0", "\ufb01", "\u00e9", "\u0301", "\uff21", "\u3000", "\u00bd", "\u0085"]
+        rng = random.Random(7)
+        samples += ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 40))) for _ in range(2000)]
+        for sample in samples:
+            self.assertEqual(clean_text(sample), legacy_clean_text(sample), repr(sample))
+
+
+class PageBatchesTest(SimpleTestCase):
+    def test_batches_cover_every_page_in_order(self):
+        self.assertEqual(_page_batches(range(10), 4), [(0, 4), (4, 8), (8, 10)])
+
+    def test_batch_larger_than_document(self):
+        self.assertEqual(_page_batches(range(2), 8), [(0, 2)])
+
+    def test_gaps_start_a_new_batch(self):
+        self.assertEqual(_page_batches([0, 1, 2, 5, 6, 9], 2), [(0, 2), (2, 3), (5, 7), (9, 10)])
+
+
+class ExtractPagesTest(SimpleTestCase):
+    @override_settings(PDF_PARALLEL_MIN_PAGES=4, PDF_EXTRACTION_BATCH_PAGES=5)
+    def test_parallel_matches_serial(self):
+        data = make_pdf(12)
+        serial = extract_pages(data, workers=1)
+        parallel = extract_pages(data, workers=3)
+        self.assertEqual(len(serial), 12)
+        self.assertEqual(serial, parallel)
+        self.assertTrue(parallel[5].startswith("Page 5 opens"))
+
+    @override_settings(PDF_PARALLEL_MIN_PAGES=50, PDF_EXTRACTION_WORKERS=4)
+    @patch('utils.pdf_processor.get_extraction_executor')
+    def test_small_documents_are_extracted_serially(self, mock_executor):
+        pages = extract_pages(make_pdf(3))
+        self.assertEqual(len(pages), 3)
+        mock_executor.assert_not_called()
+
+    @override_settings(PDF_PARALLEL_MIN_PAGES=4, PDF_EXTRACTION_WORKERS=4)
+    @patch('utils.pdf_processor.get_extraction_executor')
+    def test_daemon_processes_extract_serially(self, mock_executor):
+        with patch('utils.pdf_processor.multiprocessing.current_process', return_value=SimpleNamespace(daemon=True)):
+            pages = extract_pages(make_pdf(6))
+        self.assertEqual(len(pages), 6)
+        mock_executor.assert_not_called()
+
+    @override_settings(PDF_PARALLEL_MIN_PAGES=4, PDF_EXTRACTION_WORKERS=4)
+    @patch('utils.pdf_processor.get_extraction_executor')
+    def test_pool_that_cannot_start_falls_back_to_serial(self, mock_executor):
+        mock_executor.return_value.submit.side_effect = AssertionError("daemonic processes are not allowed to have children")
+        data = make_pdf(6)
+        self.assertEqual(extract_pages(data), extract_pages(data, workers=1))
+
+
+@override_settings(PDF_EXTRACTION_WORKERS=1)
+class StreamingExtractionTest(SimpleTestCase):
+    def test_matches_cleaning_the_whole_document(self):
+        pdf_data = make_pdf(30)
+        whole_document = clean_text("\n\n".join(extract_pages(pdf_data)))
+        expected = chunk_text(whole_document, chunk_size=400, max_chunks=3)
+
+        paragraphs = extract_budgeted_paragraphs(pdf_data, chunk_size=400, max_chunks=3)
+        self.assertEqual(pdf_processor.chunk_paragraphs(paragraphs, chunk_size=400, max_chunks=3), expected)
+
+    def test_stops_reading_once_the_budget_is_filled(self):
+        pdf_data = make_pdf(40)
+        with patch('utils.pdf_processor._extract_page_text', wraps=pdf_processor._extract_page_text) as mock_extract:
+            extract_budgeted_paragraphs(pdf_data, chunk_size=200, max_chunks=2)
+        self.assertLess(mock_extract.call_count, 10)
+
+    @override_settings(PDF_EXTRACTION_WORKERS=2, PDF_PARALLEL_MIN_PAGES=4, PDF_EXTRACTION_BATCH_PAGES=4)
+    def test_parallel_stream_matches_serial(self):
+        pdf_data = make_pdf(40)
+        parallel = extract_budgeted_paragraphs(pdf_data, chunk_size=500, max_chunks=2)
+        with self.settings(PDF_EXTRACTION_WORKERS=1):
+            serial = extract_budgeted_paragraphs(pdf_data, chunk_size=500, max_chunks=2)
+        self.assertEqual(parallel, serial)
+
+
+@patch('utils.pdf_processor.get_encoding', return_value=BYTE_ENCODING)
+class TokenChunkingTest(SimpleTestCase):
+    paragraphs = [f"Paragraph {i} " + "word " * 10 for i in range(20)]
+
+    def test_chunks_fit_the_token_budget(self, mock_encoding):
+        chunks = pdf_processor.chunk_paragraphs(self.paragraphs, max_tokens=150, max_chunks=10)
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertLessEqual(len(BYTE_ENCODING.encode(chunk)), 150)
+        self.assertIn("Paragraph 0 ", chunks[0])
+
+    def test_long_paragraphs_are_split_not_truncated(self, mock_encoding):
+        long_paragraph = "x" * 250
+        chunks = pdf_processor.chunk_paragraphs([long_paragraph, "tail paragraph"], max_tokens=100, max_chunks=10)
+        self.assertEqual(chunks, ["x" * 100, "x" * 100, "x" * 50 + "\n\ntail paragraph"])
+
+    def test_overlap_repeats_the_end_of_the_previous_chunk(self, mock_encoding):
+        chunks = pdf_processor.chunk_paragraphs(self.paragraphs, max_tokens=150, max_chunks=3, overlap_tokens=20)
+        self.assertEqual(len(chunks), 3)
+        for previous, chunk in zip(chunks, chunks[1:]):
+            self.assertTrue(chunk.startswith(previous[-20:].strip()))
+
+    def test_stops_at_max_chunks(self, mock_encoding):
+        chunks = pdf_processor.chunk_paragraphs(iter(self.paragraphs), max_tokens=60, max_chunks=2)
+        self.assertEqual(len(chunks), 2)
+
+    def test_falls_back_to_characters_without_an_encoding(self, mock_encoding):
+        with patch('utils.tokens.get_encoding', side_effect=ConnectionError('offline')):
+            options = get_chunk_options('some-model')
+        self.assertNotIn('max_tokens', options)
+        self.assertEqual(options['chunk_size'], 750 * 4)
+
+
+@override_settings(CACHES=LOCMEM_CACHE, MATERIAL_FILE_CACHE_MAX_BYTES=0)
+class FetchPdfTest(SimpleTestCase):
+    def materials(self, *paths):
+        return [SimpleNamespace(material_file_url=path, file_size=0) for path in paths]
+
+    @override_settings(PDF_FETCH_MAX_WORKERS=4)
+    @patch('utils.pdf_processor._download_material')
+    def test_downloads_run_concurrently_and_keep_order(self, mock_download):
+        def slow_download(path):
+            time.sleep(0.2)
+            return path.encode()
+        mock_download.side_effect = slow_download
+
+        start = time.monotonic()
+        pdf_files = fetch_pdf(self.materials('a.pdf', 'b.pdf', 'c.pdf', 'd.pdf'))
+        self.assertLess(time.monotonic() - start, 0.6)
+        self.assertEqual(pdf_files, [b'a.pdf', b'b.pdf', b'c.pdf', b'd.pdf'])
+
+    @patch('utils.pdf_processor._download_material')
+    def test_reports_every_failed_download(self, mock_download):
+        def download(path):
+            if path != 'ok.pdf':
+                raise ConnectionError('connection reset')
+            return b'data'
+        mock_download.side_effect = download
+
+        with self.assertRaises(ValidationError) as context:
+            fetch_pdf(self.materials('ok.pdf', 'bad.pdf', 'worse.pdf'))
+        message = str(context.exception)
+        self.assertIn('bad.pdf: connection reset', message)
+        self.assertIn('worse.pdf: connection reset', message)
+        self.assertNotIn('ok.pdf', message)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class MaterialFileCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def test_hit_is_a_memory_mapped_view_pymupdf_can_open(self):
+        file_cache = MaterialFileCache(self.tmp_dir.name, max_bytes=10_000_000)
+        pdf_data = make_pdf(2)
+        file_cache.put('lecture.pdf', pdf_data)
+
+        cached = file_cache.get('lecture.pdf', expected_size=len(pdf_data))
+        self.assertIsInstance(cached, memoryview)
+        self.assertEqual(bytes(cached), pdf_data)
+        self.assertEqual(len(extract_pages(cached)), 2)
+
+    def test_size_mismatch_is_a_miss(self):
+        file_cache = MaterialFileCache(self.tmp_dir.name, max_bytes=10_000_000)
+        file_cache.put('lecture.pdf', b'partial')
+        self.assertIsNone(file_cache.get('lecture.pdf', expected_size=2048))
+        self.assertIsNone(file_cache.get('lecture.pdf'))
+
+    def test_least_recently_used_files_are_evicted(self):
+        file_cache = MaterialFileCache(self.tmp_dir.name, max_bytes=25)
+        file_cache.put('old.pdf', b'o' * 10)
+        file_cache.put('used.pdf', b'u' * 10)
+        # make old.pdf the least recently used, then touch used.pdf
+        old_path = file_cache._entry_path('old.pdf')
+        os.utime(old_path, (time.time() - 60, time.time() - 60))
+        self.assertIsNotNone(file_cache.get('used.pdf'))
+
+        file_cache.put('new.pdf', b'n' * 10)
+        self.assertIsNone(file_cache.get('old.pdf'))
+        self.assertIsNotNone(file_cache.get('used.pdf'))
+        self.assertIsNotNone(file_cache.get('new.pdf'))
+
+    @patch('utils.pdf_processor._download_material')
+    def test_fetch_pdf_reads_cached_files(self, mock_download):
+        mock_download.return_value = b'%PDF-data'
+        material = SimpleNamespace(material_file_url='lecture.pdf', file_size=9)
+        with self.settings(MATERIAL_FILE_CACHE_DIR=self.tmp_dir.name, MATERIAL_FILE_CACHE_MAX_BYTES=1000):
+            self.assertEqual(fetch_pdf([material]), [b'%PDF-data'])
+            self.assertEqual(bytes(fetch_pdf([material])[0]), b'%PDF-data')
+        mock_download.assert_called_once_with('lecture.pdf')
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class MaterialChunkCacheTest(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(username='cacheuser', password='testpass')
+        self.course = Course.objects.create(user=self.user, course_name='Cache Course', course_code='CACHE1')
+        self.pdf_data = make_pdf(3)
+
+    def create_material(self, file_name):
+        return CourseMaterial.objects.create(
+            course=self.course, file_name=file_name, file_size=len(self.pdf_data),
+            file_type='application/pdf', material_file_url=f'materials/{file_name}.pdf'
+        )
+
+    @patch('utils.pdf_processor.fetch_pdf')
+    def test_repeat_extraction_skips_download(self, mock_fetch_pdf):
+        mock_fetch_pdf.side_effect = lambda materials: [self.pdf_data for _ in materials]
+        material = self.create_material('lecture')
+
+        first = get_material_chunks([material])
+        material.refresh_from_db()
+        self.assertEqual(material.content_hash, compute_content_hash(self.pdf_data))
+
+        second = get_material_chunks([material])
+        self.assertEqual(first, second)
+        self.assertEqual(mock_fetch_pdf.call_count, 1)
+
+    @patch('utils.pdf_processor.extract_budgeted_paragraphs')
+    @patch('utils.pdf_processor.fetch_pdf')
+    def test_identical_files_are_parsed_once(self, mock_fetch_pdf, mock_extract):
+        mock_fetch_pdf.side_effect = lambda materials: [self.pdf_data for _ in materials]
+        mock_extract.return_value = ["Some extracted text"]
+
+        get_material_chunks([self.create_material('first')])
+        get_material_chunks([self.create_material('second')])
+        self.assertEqual(mock_extract.call_count, 1)
+
+    @patch('utils.pdf_processor.fetch_pdf')
+    def test_page_selections_are_cached_separately(self, mock_fetch_pdf):
+        mock_fetch_pdf.side_effect = lambda materials: [self.pdf_data for _ in materials]
+        material = self.create_material('lecture')
+
+        whole = get_material_chunks([material])
+        selected = get_material_chunks([material], page_selection=" 2 ")
+        self.assertNotEqual(whole, selected)
+        self.assertIn("Page 1 opens", selected[0])
+        self.assertNotIn("Page 0", selected[0])
+        self.assertEqual(get_material_chunks([material], page_selection="2"), selected)
+        self.assertEqual(mock_fetch_pdf.call_count, 2)
+
+    @patch('utils.pdf_processor.fetch_pdf')
+    def test_partial_extraction_is_not_cached(self, mock_fetch_pdf):
+        other_pdf = make_pdf(2) + b"%other"
+        mock_fetch_pdf.side_effect = lambda materials: [self.pdf_data if m.file_name == 'good' else other_pdf for m in materials]
+        materials = [self.create_material('good'), self.create_material('broken')]
+        real_extract = pdf_processor.extract_budgeted_paragraphs
+
+        def flaky(pdf_data, *args, **kwargs):
+            if pdf_data == other_pdf:
+                raise RuntimeError("transient failure")
+            return real_extract(pdf_data, *args, **kwargs)
+
+        with patch('utils.pdf_processor.extract_budgeted_paragraphs', side_effect=flaky):
+            partial = get_material_chunks(materials)
+        full = get_material_chunks(materials)
+        self.assertNotEqual(partial, full)
+        self.assertEqual(mock_fetch_pdf.call_count, 2)
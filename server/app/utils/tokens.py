@@ -0,0 +1,53 @@
+"""
+Token counting for prompts sent to the LLM.
+
+Groq's llama models do not ship a tiktoken encoding, LLM_TOKENIZER_ENCODING is the closest
+public one. Budgets in LLM_CHUNK_TOKEN_BUDGETS leave room for that difference.
+"""
+import logging
+from functools import lru_cache
+import tiktoken
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def _load_encoding(name: str) -> tiktoken.Encoding:
+  # loading parses (and on first use downloads) the bpe ranks, keep one instance per process
+  return tiktoken.get_encoding(name)
+
+
+def get_encoding() -> tiktoken.Encoding:
+  return _load_encoding(settings.LLM_TOKENIZER_ENCODING)
+
+
+def count_tokens(text: str) -> int:
+  return len(get_encoding().encode(text, disallowed_special=()))
+
+
+def get_chunk_token_budget(model: str) -> int:
+  """
+  Returns how many tokens of material go into one prompt for the given model.
+  """
+  return settings.LLM_CHUNK_TOKEN_BUDGETS.get(model, settings.LLM_DEFAULT_CHUNK_TOKENS)
+
+
+def get_chunk_options(model: str) -> dict:
+  """
+  Returns the chunking options for prompts sent to the given model.
+
+  Falls back to character budgets (about 4 characters per token) if the encoding cannot be
+  loaded, so quiz generation keeps working without it.
+  """
+  max_tokens = get_chunk_token_budget(model)
+  try:
+    get_encoding()
+  except Exception as e:
+    logger.error(f"Could not load tokenizer {settings.LLM_TOKENIZER_ENCODING}, chunking by characters: {str(e)}")
+    return {"chunk_size": max_tokens * 4, "max_chunks": settings.LLM_MAX_CHUNKS}
+  return {
+    "max_tokens": max_tokens,
+    "overlap_tokens": settings.LLM_CHUNK_OVERLAP_TOKENS,
+    "max_chunks": settings.LLM_MAX_CHUNKS,
+  }
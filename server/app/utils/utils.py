@@ -1,7 +1,13 @@
-import json
+import logging
 import re
 from typing import Any
 
+import jiter
+
+from utils.json_stream import JsonArrayStreamParser, strip_trailing_commas
+
+logger = logging.getLogger(__name__)
+
 
 def get_data_from_request(request, key: str, default: Any = None) -> Any:
     data = request.data.get(key, default)
@@ -9,13 +15,37 @@ def get_data_from_request(request, key: str, default: Any = None) -> Any:
         raise ValueError(f"Missing required parameter: {key}")
     return data
 
-def parse_llm_response(raw_text: str):
-  # Use regex to find the first JSON array in the text
-  match = re.search(r"\[\s*{.*?}\s*]", raw_text, re.DOTALL)
-  if match:
+def is_fresh_request(request) -> bool:
+    # fresh=true asks for new questions instead of the cached ones of the same material
+    return str(request.data.get('fresh', '')).lower() in ('1', 'true', 'yes')
+
+# start of the first array of objects, anything before it is prose or a markdown fence
+ARRAY_START = re.compile(r"\[\s*\{")
+
+def parse_llm_response(raw_text: str) -> list[dict]:
+  """
+  Returns the objects of the first JSON array of objects in an LLM response.
+
+  A well formed array is parsed in one go. Otherwise every complete object is recovered on its
+  own, so trailing commas, a broken object or a response cut off mid object only cost the
+  objects affected instead of the whole completion.
+  """
+  match = ARRAY_START.search(raw_text)
+  if not match:
+    raise ValueError("No JSON array found in response.")
+  text = raw_text[match.start():]
+
+  array = text[:text.rfind("]") + 1]
+  for repair in (None, strip_trailing_commas):
     try:
-      return json.loads(match.group(0))
-    except json.JSONDecodeError as e:
-      raise ValueError(f"Failed to parse extracted JSON: {e}")
-  else:
-    raise ValueError("No JSON array found in response.")
\ No newline at end of file
+      parsed = jiter.from_json((repair(array) if repair else array).encode())
+    except ValueError:
+      continue
+    if isinstance(parsed, list):
+      return [item for item in parsed if isinstance(item, dict)]
+
+  objects = JsonArrayStreamParser().feed(text)
+  if not objects:
+    raise ValueError("Failed to parse extracted JSON: no complete object in the array")
+  logger.warning(f"Recovered {len(objects)} objects from a malformed LLM response")
+  return objects